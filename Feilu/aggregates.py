@@ -0,0 +1,116 @@
+class AggregateDelta:
+    """
+    一个批次对仪表盘汇总表的增量
+
+    书籍写入前后的作者、评分和新增的标签关联分别记入，最后由DashboardAggregates一次性应用
+    """
+    def __init__(self):
+        self.tags = {}
+        self.buckets = {}
+        # 作者 -> [书籍数, 评分和, 有评分的书籍数]
+        self.authors = {}
+
+    def add_book(self, author, rating, sign=1):
+        if rating is not None:
+            bucket = DashboardAggregates.rating_bucket(rating)
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + sign
+        if author:
+            totals = self.authors.setdefault(author, [0, 0.0, 0])
+            totals[0] += sign
+            if rating is not None:
+                totals[1] += sign * float(rating)
+                totals[2] += sign
+
+    def remove_book(self, author, rating):
+        self.add_book(author, rating, sign=-1)
+
+    def add_tag_links(self, tag_ids):
+        for tag_id in tag_ids:
+            self.tags[tag_id] = self.tags.get(tag_id, 0) + 1
+
+
+class DashboardAggregates:
+    """
+    仪表盘汇总表的维护：标签书籍数、评分分布、作者书籍数和评分和
+
+    数据库管道写入书籍时在同一个事务中应用增量，仪表盘接口直接读取汇总表，
+    查询耗时只与结果行数有关，与书籍总数无关。rebuild()根据明细表全量重建。
+    """
+    TABLES = ('tag_stats', 'rating_buckets', 'author_stats')
+    # 单条SQL中IN (...) 参数的最大数量
+    CHUNK_SIZE = 500
+
+    def __init__(self, placeholder='?', dialect='sqlite'):
+        self.placeholder = placeholder
+        self.dialect = dialect
+
+    @staticmethod
+    def rating_bucket(rating):
+        # 按评分的整数部分分组，满分10分归入9-10
+        return min(int(rating), 9)
+
+    def _increment_sql(self, table, key, columns):
+        # 按主键累加的upsert语句
+        placeholders = ', '.join([self.placeholder] * (len(columns) + 1))
+        names = ', '.join((key,) + columns)
+        if self.dialect == 'mysql':
+            updates = ', '.join(f'{column} = {column} + VALUES({column})' for column in columns)
+            return f'INSERT INTO {table} ({names}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {updates}'
+        updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in columns)
+        return f'INSERT INTO {table} ({names}) VALUES ({placeholders}) ON CONFLICT ({key}) DO UPDATE SET {updates}'
+
+    def apply(self, cursor, delta):
+        # 按主键顺序写入，减少并发事务之间的死锁
+        tags = [(tag_id, count) for tag_id, count in sorted(delta.tags.items()) if count]
+        if tags:
+            cursor.executemany(self._increment_sql('tag_stats', 'tag_id', ('book_count',)), tags)
+
+        buckets = [(bucket, count) for bucket, count in sorted(delta.buckets.items()) if count]
+        if buckets:
+            cursor.executemany(self._increment_sql('rating_buckets', 'bucket', ('book_count',)), buckets)
+
+        authors = [
+            (author, count, round(rating_sum, 2), rating_count)
+            for author, (count, rating_sum, rating_count) in sorted(delta.authors.items())
+            if count or rating_count or round(rating_sum, 2)
+        ]
+        if authors:
+            cursor.executemany(
+                self._increment_sql('author_stats', 'author', ('book_count', 'rating_sum', 'rating_count')),
+                authors
+            )
+            # 书籍全部改到其他作者名下后，删除该作者的汇总行；只按主键检查本批减少了书籍数的作者，
+            # 不扫描整张表，MySQL上也不会锁住其他作者的行
+            decremented = [author for author, count, _, _ in authors if count < 0]
+            for i in range(0, len(decremented), self.CHUNK_SIZE):
+                chunk = decremented[i:i + self.CHUNK_SIZE]
+                cursor.execute(
+                    f"DELETE FROM author_stats WHERE author IN ({', '.join([self.placeholder] * len(chunk))}) "
+                    f"AND book_count <= 0",
+                    chunk
+                )
+
+    def rebuild(self, cursor):
+        # 根据books和book_tags全量重建汇总表
+        if self.dialect == 'mysql':
+            bucket = 'LEAST(FLOOR(rating_num), 9)'
+        else:
+            bucket = 'MIN(CAST(rating_num AS INTEGER), 9)'
+
+        for table in self.TABLES:
+            cursor.execute(f'DELETE FROM {table}')
+        cursor.execute('''
+        INSERT INTO tag_stats (tag_id, book_count)
+        SELECT tag_id, COUNT(*) FROM book_tags GROUP BY tag_id
+        ''')
+        cursor.execute(f'''
+        INSERT INTO rating_buckets (bucket, book_count)
+        SELECT {bucket}, COUNT(*) FROM books WHERE rating_num IS NOT NULL GROUP BY {bucket}
+        ''')
+        cursor.execute('''
+        INSERT INTO author_stats (author, book_count, rating_sum, rating_count)
+        SELECT author, COUNT(*), COALESCE(SUM(rating_num), 0), COUNT(rating_num)
+        FROM books
+        WHERE author IS NOT NULL AND author != ''
+        GROUP BY author
+        ''')
@@ -0,0 +1,34 @@
+"""
+数据版本
+
+data_version表只有一行，每次爬取结束或维护操作修改数据后版本号加一，
+Web应用比较版本号决定是否刷新内存中的筛选索引。
+"""
+
+TABLES = {
+    'sqlite': '''
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'mysql': '''
+    CREATE TABLE IF NOT EXISTS `data_version` (
+        `id` TINYINT PRIMARY KEY,
+        `version` BIGINT NOT NULL DEFAULT 0,
+        `updated_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    ''',
+}
+INSERT_IGNORE = {'sqlite': 'INSERT OR IGNORE', 'mysql': 'INSERT IGNORE'}
+
+
+def create_table(cursor, dialect='sqlite'):
+    cursor.execute(TABLES[dialect])
+    cursor.execute(f'{INSERT_IGNORE[dialect]} INTO data_version (id, version) VALUES (1, 0)')
+
+
+def bump(cursor):
+    # 数据已修改，版本号加一
+    cursor.execute('UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1')
@@ -1,166 +1,356 @@
-import sqlite3
-import os
-import json
-from itemadapter import ItemAdapter
-
-class FeiluDatabasePipeline:
-    """
-    将爬取的小说数据保存到SQLite数据库中
-    """
-    def __init__(self, db_path):
-        self.db_path = db_path
-        self.conn = None
-        self.cursor = None
-        self.success_count = 0
-        self.failed_count = 0
-        
-    @classmethod
-    def from_crawler(cls, crawler):
-        # 从设置中获取数据库路径，如果没有设置则使用默认路径
-        db_path = crawler.settings.get('DATABASE_PATH', 
-                  os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'feilu_books.db'))
-        return cls(db_path)
-    
-    def open_spider(self, spider):
-        # 爬虫启动时连接数据库
-        try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.cursor = self.conn.cursor()
-            spider.logger.info(f"数据库连接成功: {self.db_path}")
-            
-            # 创建表结构
-            self.create_tables()
-            spider.logger.info("数据库表结构初始化完成")
-        except Exception as e:
-            spider.logger.error(f"数据库连接失败: {str(e)}")
-            raise e
-    
-    def create_tables(self):
-        # 创建小说信息表
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT,
-            monthly_clicks TEXT,
-            word_count TEXT,
-            summary TEXT,
-            book_url TEXT UNIQUE,
-            flowers TEXT,
-            rating TEXT,
-            rewards TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # 创建标签表
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS tags (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE
-        )
-        ''')
-        
-        # 创建小说-标签关联表
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS book_tags (
-            book_id INTEGER,
-            tag_id INTEGER,
-            PRIMARY KEY (book_id, tag_id),
-            FOREIGN KEY (book_id) REFERENCES books (id),
-            FOREIGN KEY (tag_id) REFERENCES tags (id)
-        )
-        ''')
-        
-        # 创建图片表
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS images (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            book_id INTEGER,
-            image_url TEXT,
-            image_path TEXT,
-            FOREIGN KEY (book_id) REFERENCES books (id)
-        )
-        ''')
-        
-        self.conn.commit()
-    
-    def process_item(self, item, spider):
-        try:
-            adapter = ItemAdapter(item)
-            
-            # 1. 插入小说基本信息
-            self.cursor.execute('''
-            INSERT OR IGNORE INTO books 
-            (title, author, monthly_clicks, word_count, summary, book_url, flowers, rating, rewards)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                adapter.get('title', ''),
-                adapter.get('author', ''),
-                adapter.get('monthly_clicks', ''),
-                adapter.get('word_count', ''),
-                adapter.get('summary', ''),
-                adapter.get('book_url', ''),
-                adapter.get('flowers', ''),
-                adapter.get('rating', ''),
-                adapter.get('rewards', '')
-            ))
-            
-            # 获取插入的书籍ID
-            if self.cursor.rowcount > 0:
-                book_id = self.cursor.lastrowid
-            else:
-                # 如果书籍已存在，获取其ID
-                self.cursor.execute('SELECT id FROM books WHERE book_url = ?', (adapter.get('book_url', ''),))
-                book_id = self.cursor.fetchone()[0]
-            
-            # 2. 处理标签
-            tags = adapter.get('tags', [])
-            if tags:
-                for tag in tags:
-                    # 插入标签（如果不存在）
-                    self.cursor.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (tag,))
-                    
-                    # 获取标签ID
-                    self.cursor.execute('SELECT id FROM tags WHERE name = ?', (tag,))
-                    tag_id = self.cursor.fetchone()[0]
-                    
-                    # 建立书籍和标签的关联
-                    self.cursor.execute('INSERT OR IGNORE INTO book_tags (book_id, tag_id) VALUES (?, ?)', 
-                                       (book_id, tag_id))
-            
-            # 3. 处理图片
-            image_urls = adapter.get('image_urls', [])
-            images = adapter.get('images', [])
-            
-            if image_urls and images:
-                for i, image_info in enumerate(images):
-                    image_url = image_urls[i] if i < len(image_urls) else ''
-                    image_path = image_info.get('path', '') if isinstance(image_info, dict) else ''
-                    
-                    self.cursor.execute('''
-                    INSERT INTO images (book_id, image_url, image_path) VALUES (?, ?, ?)
-                    ''', (book_id, image_url, image_path))
-            
-            self.conn.commit()
-            self.success_count += 1
-            spider.logger.info(f"成功保存到数据库: {adapter.get('title', '')}")
-            
-        except Exception as e:
-            self.failed_count += 1
-            spider.logger.error(f"保存到数据库失败: {str(e)}, item: {item}")
-            # 回滚事务
-            self.conn.rollback()
-        
-        return item
-    
-    def close_spider(self, spider):
-        # 爬虫关闭时关闭数据库连接
-        if self.conn:
-            spider.logger.info("========== 数据库存储统计 ==========")
-            spider.logger.info(f"成功存储记录: {self.success_count}")
-            spider.logger.info(f"存储失败记录: {self.failed_count}")
-            spider.logger.info("====================================")
-            
-            self.conn.close()
-            spider.logger.info("数据库连接已关闭")
\ No newline at end of file
+import sqlite3
+import os
+from twisted.internet import reactor, threads
+from twisted.python.threadpool import ThreadPool
+
+from Feilu import data_version
+from Feilu.aggregates import DashboardAggregates
+from Feilu.normalize import NUMERIC_COLUMNS, numeric_values
+from Feilu.search import SearchIndex
+from Feilu.storage import SQLITE, StorageBackend
+
+class FeiluDatabasePipeline(StorageBackend):
+    """
+    将爬取的小说数据保存到SQLite数据库中
+
+    作为存储后端由FeiluStoragePipeline调用（STORAGE_BACKENDS中的sqlite），写入逻辑见storage.py。
+    写入在一个专用线程中按批次依次执行，不阻塞reactor；全文检索索引在同一个事务中更新。
+    """
+    dialect = SQLITE
+    # 连接参数：WAL日志模式，NORMAL同步级别，64MB页缓存
+    PRAGMAS = (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', -64000),
+        ('temp_store', 'MEMORY'),
+    )
+    # 数据库被其他连接（如Web应用、维护脚本）锁定时可以重试
+    TRANSIENT_ERRORS = (sqlite3.OperationalError,)
+    # 数值列的类型，原始文本列保留不变
+    NUMERIC_TYPES = {
+        'monthly_clicks_num': 'INTEGER',
+        'word_count_num': 'INTEGER',
+        'flowers_num': 'INTEGER',
+        'rating_num': 'REAL',
+        'rewards_num': 'INTEGER',
+    }
+    # 旧版本books表中没有、需要迁移时补充的列
+    ADDED_COLUMNS = dict(NUMERIC_TYPES, content_hash='TEXT')
+    # 仪表盘查询使用的索引（见dashboard_queries.py）: 索引名 -> (表名, 列)
+    INDEXES = {
+        'idx_books_rating': ('books', 'rating_num'),
+        'idx_books_author_rating': ('books', 'author, rating_num'),
+        'idx_books_clicks_rating': ('books', 'monthly_clicks_num, rating_num'),
+        'idx_books_clicks': ('books', 'monthly_clicks_num'),
+        'idx_books_words': ('books', 'word_count_num'),
+        'idx_book_tags_tag': ('book_tags', 'tag_id, book_id'),
+        'idx_tag_stats_count': ('tag_stats', 'book_count'),
+        'idx_author_stats_count': ('author_stats', 'book_count'),
+        'idx_book_metrics_crawl': ('book_metrics', 'crawl_id'),
+        'idx_tag_metric_deltas_crawl': ('tag_metric_deltas', 'crawl_id'),
+    }
+
+    def __init__(self, db_path, batch_size=500, flush_interval=5, max_inflight=2):
+        super().__init__()
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # SQLite同一时间只有一个写事务，多出的批次在写入线程前排队
+        self.max_inflight = max_inflight
+        self.threadpool = None
+        self.search_index = SearchIndex()
+
+    @classmethod
+    def from_settings(cls, settings):
+        # 从设置中获取数据库路径，如果没有设置则使用默认路径
+        db_path = settings.get('DATABASE_PATH',
+                  os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'feilu_books.db'))
+        return cls(
+            db_path,
+            batch_size=settings.getint('DATABASE_BATCH_SIZE', 500),
+            flush_interval=cls.flush_interval_setting(settings, 'DATABASE_FLUSH_INTERVAL', 5),
+            max_inflight=settings.getint('DATABASE_MAX_INFLIGHT', 2)
+        )
+
+    def open(self, spider):
+        # 爬虫启动时连接数据库，之后的写入在写入线程中使用同一个连接
+        try:
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.cursor = self.conn.cursor()
+            for name, value in self.PRAGMAS:
+                self.cursor.execute(f"PRAGMA {name} = {value}")
+            spider.logger.info(f"数据库连接成功: {self.db_path}")
+            
+            # 创建表结构
+            self.create_tables()
+            added = self.migrate_tables()
+            if added:
+                spider.logger.info(f"已升级表结构: {', '.join(added)}，旧数据请运行 python manage_db.py migrate 回填")
+            spider.logger.info("数据库表结构初始化完成")
+
+            # 加载标签缓存
+            self.tag_cache.load(self.cursor)
+            spider.logger.info(f"已加载标签缓存: {len(self.tag_cache)} 个")
+
+            # 本次爬取作为指标历史的一个分区
+            self.crawl_id = self.metrics.start_crawl(self.cursor)
+            self.conn.commit()
+
+            self.threadpool = ThreadPool(minthreads=1, maxthreads=1, name='sqlite-writer')
+            self.threadpool.start()
+        except Exception as e:
+            spider.logger.error(f"数据库连接失败: {str(e)}")
+            raise e
+
+    def run(self, fn, *args):
+        # 在写入线程中执行，一次只执行一个事务
+        return threads.deferToThreadPool(reactor, self.threadpool, self._transaction, fn, *args)
+
+    def _transaction(self, fn, *args):
+        try:
+            result = fn(self.cursor, *args)
+            self.conn.commit()
+            self.tag_cache.commit()
+            return result
+        except Exception:
+            self.conn.rollback()
+            self.tag_cache.rollback()
+            raise
+
+    def shutdown(self):
+        if self.threadpool:
+            self.threadpool.stop()
+            self.threadpool = None
+        super().shutdown()
+
+    def create_tables(self):
+        # 创建小说信息表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT,
+            monthly_clicks TEXT,
+            word_count TEXT,
+            summary TEXT,
+            book_url TEXT UNIQUE,
+            flowers TEXT,
+            rating TEXT,
+            rewards TEXT,
+            monthly_clicks_num INTEGER,
+            word_count_num INTEGER,
+            flowers_num INTEGER,
+            rating_num REAL,
+            rewards_num INTEGER,
+            content_hash TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+        
+        # 创建标签表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE
+        )
+        ''')
+        
+        # 创建小说-标签关联表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS book_tags (
+            book_id INTEGER,
+            tag_id INTEGER,
+            PRIMARY KEY (book_id, tag_id),
+            FOREIGN KEY (book_id) REFERENCES books (id),
+            FOREIGN KEY (tag_id) REFERENCES tags (id)
+        )
+        ''')
+        
+        # 创建图片表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER,
+            image_url TEXT,
+            image_path TEXT,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+        ''')
+        
+        self.conn.commit()
+
+    def migrate_tables(self):
+        # 为旧版本创建的表补充数值列和索引，返回新添加的列名和索引名
+        self.cursor.execute("PRAGMA table_info(books)")
+        existing = {row[1] for row in self.cursor.fetchall()}
+        added = []
+        for column, column_type in self.ADDED_COLUMNS.items():
+            if column not in existing:
+                self.cursor.execute(f"ALTER TABLE books ADD COLUMN {column} {column_type}")
+                added.append(column)
+
+        # 仪表盘汇总表，新建时根据已有数据全量生成
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {row[0] for row in self.cursor.fetchall()}
+        if not set(DashboardAggregates.TABLES) <= tables:
+            self.create_aggregate_tables()
+            self.aggregates.rebuild(self.cursor)
+            added.extend(DashboardAggregates.TABLES)
+
+        # 指标历史表，新建时把已有书籍的当前值记为基准分区
+        if 'book_metrics' not in tables:
+            self.create_metrics_tables()
+            self.metrics.seed_baseline(self.cursor)
+            added.extend(('crawls', 'book_metrics', 'tag_metric_deltas'))
+
+        if 'data_version' not in tables:
+            data_version.create_table(self.cursor, 'sqlite')
+            added.append('data_version')
+
+        # 相似书籍表，由 python manage_db.py similar 计算填充
+        if 'similar_books' not in tables:
+            self.create_similarity_tables()
+            added.extend(('similar_books', 'similar_book_state'))
+
+        # 全文检索表，新建时为已有书籍建立索引
+        if 'books_fts' not in tables:
+            self.search_index.create_table(self.cursor)
+            self.search_index.rebuild(self.cursor)
+            added.append('books_fts')
+
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        existing = {row[0] for row in self.cursor.fetchall()}
+        for name, (table, columns) in self.INDEXES.items():
+            if name not in existing:
+                self.cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+                added.append(name)
+
+        # 每本书的每个封面只保留一条images记录
+        if 'uq_images_book_url' not in existing:
+            self.dedupe_images()
+            self.cursor.execute("CREATE UNIQUE INDEX uq_images_book_url ON images (book_id, image_url)")
+            added.append('uq_images_book_url')
+        self.conn.commit()
+        return added
+
+    def create_aggregate_tables(self):
+        # 标签书籍数
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tag_stats (
+            tag_id INTEGER PRIMARY KEY,
+            book_count INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+
+        # 评分分布，bucket为评分的整数部分（0-9）
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rating_buckets (
+            bucket INTEGER PRIMARY KEY,
+            book_count INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+
+        # 作者书籍数和评分和，平均评分 = rating_sum / rating_count
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS author_stats (
+            author TEXT PRIMARY KEY,
+            book_count INTEGER NOT NULL DEFAULT 0,
+            rating_sum REAL NOT NULL DEFAULT 0,
+            rating_count INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+
+    def create_metrics_tables(self):
+        # 爬取记录，每次爬取是指标历史的一个分区
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP
+        )
+        ''')
+
+        # 书籍指标快照，只在指标变化时记录，评分乘以100后按整数保存
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS book_metrics (
+            book_id INTEGER NOT NULL,
+            crawl_id INTEGER NOT NULL,
+            monthly_clicks INTEGER,
+            word_count INTEGER,
+            flowers INTEGER,
+            rating INTEGER,
+            rewards INTEGER,
+            PRIMARY KEY (book_id, crawl_id)
+        ) WITHOUT ROWID
+        ''')
+
+        # 标签下所有书籍指标之和在每次爬取中的增量
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tag_metric_deltas (
+            tag_id INTEGER NOT NULL,
+            crawl_id INTEGER NOT NULL,
+            monthly_clicks INTEGER NOT NULL DEFAULT 0,
+            flowers INTEGER NOT NULL DEFAULT 0,
+            rewards INTEGER NOT NULL DEFAULT 0,
+            book_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tag_id, crawl_id)
+        ) WITHOUT ROWID
+        ''')
+
+    def create_similarity_tables(self):
+        # 每本书最相似的k本书
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS similar_books (
+            book_id INTEGER NOT NULL,
+            similar_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (book_id, similar_id)
+        ) WITHOUT ROWID
+        ''')
+
+        # 已计算过相似书籍的书，min_score为第k名的相似度，新书超过它才会进入该书的列表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS similar_book_state (
+            book_id INTEGER PRIMARY KEY,
+            min_score REAL NOT NULL DEFAULT 0,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+    def rebuild_aggregates(self):
+        # 根据明细表全量重建仪表盘汇总表
+        self.aggregates.rebuild(self.cursor)
+        self.conn.commit()
+
+    def rebuild_search_index(self):
+        # 根据books表全量重建全文检索索引，返回书籍数量
+        count = self.search_index.rebuild(self.cursor)
+        self.conn.commit()
+        return count
+
+    def dedupe_images(self):
+        # 删除重复爬取产生的重复images记录，优先保留已下载（image_path不为空）的最新一条
+        self.cursor.execute('''
+        DELETE FROM images WHERE id NOT IN (
+            SELECT COALESCE(MAX(CASE WHEN image_path IS NOT NULL AND image_path != '' THEN id END), MAX(id))
+            FROM images
+            GROUP BY book_id, image_url
+        )
+        ''')
+        return self.cursor.rowcount
+
+    def backfill_numeric(self):
+        # 根据原始文本重新计算所有书籍的数值列，返回更新的行数
+        raw_columns = list(NUMERIC_COLUMNS)
+        self.cursor.execute(f"SELECT id, {', '.join(raw_columns)} FROM books")
+        rows = self.cursor.fetchall()
+        updates = []
+        for row in rows:
+            adapter = dict(zip(raw_columns, row[1:]))
+            updates.append(numeric_values(adapter) + (row[0],))
+
+        assignments = ', '.join(f"{column} = ?" for column, _ in NUMERIC_COLUMNS.values())
+        for i in range(0, len(updates), self.CHUNK_SIZE):
+            self.cursor.executemany(f"UPDATE books SET {assignments} WHERE id = ?", updates[i:i + self.CHUNK_SIZE])
+        self.conn.commit()
+        return len(updates)
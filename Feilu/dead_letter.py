@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+import time
+
+from itemadapter import ItemAdapter
+
+from Feilu.items import FeiluCoverItem, FeiluItem
+
+
+class DeadLetterStore:
+    """
+    写入数据库失败的item
+
+    每条失败记录追加为JSON文件的一行：{"t": 时间, "backend": 数据库, "crawl": 爬取分区ID,
+    "error": 异常类名, "message": 异常信息, "cover": 是否为封面item, "item": item的字段}。
+    python manage_db.py replay 按数据库读取后重新批量写入，仍然失败的保留在文件中。
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, item, backend, error, crawl_id=None):
+        entry = {
+            't': round(time.time(), 3),
+            'backend': backend,
+            'crawl': crawl_id,
+            'error': type(error).__name__,
+            'message': str(error),
+            'cover': isinstance(item, FeiluCoverItem),
+            'item': ItemAdapter(item).asdict(),
+        }
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+            self.count += 1
+
+    def read(self):
+        # 返回文件中的全部记录，不完整的行（写入中断）跳过
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        return entries
+
+    def rewrite(self, entries):
+        # 用entries整体替换文件内容，没有剩余记录时删除文件
+        with self.lock:
+            if not entries:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            path = self.path + '.tmp'
+            with open(path, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str) + '\n')
+            os.replace(path, self.path)
+
+    @staticmethod
+    def to_item(entry):
+        # 还原为item，item中没有定义的字段丢弃
+        cls = FeiluCoverItem if entry.get('cover') else FeiluItem
+        return cls({key: value for key, value in entry['item'].items() if key in cls.fields})
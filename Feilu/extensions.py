@@ -0,0 +1,183 @@
+# Define here your extensions
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import time
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet import task
+
+from Feilu.progress import ProgressPublisher
+
+
+class FeiluLaneStats:
+    """
+    定时采样下载器槽位，统计HTML通道和图片通道各自的利用率
+    """
+    def __init__(self, crawler, interval, image_slot):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.interval = interval
+        self.image_slot = image_slot
+        self.task = None
+        # 每个通道的采样累计值
+        self.lanes = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        interval = crawler.settings.getfloat('LANE_STATS_INTERVAL', 5)
+        if not interval:
+            raise NotConfigured
+        ext = cls(crawler, interval, crawler.settings.get('IMAGES_LANE_SLOT', 'images'))
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_opened(self, spider):
+        self.task = task.LoopingCall(self.sample)
+        self.task.start(self.interval, now=False)
+
+    def lane_of(self, slot_key):
+        return 'images' if slot_key == self.image_slot else 'html'
+
+    def sample(self):
+        engine = self.crawler.engine
+        if not engine or not engine.downloader:
+            return
+
+        # 按通道汇总当前所有下载槽位的状态
+        current = {}
+        for key, slot in list(engine.downloader.slots.items()):
+            lane = current.setdefault(self.lane_of(key), {'concurrency': 0, 'transferring': 0, 'queued': 0})
+            lane['concurrency'] += slot.concurrency
+            lane['transferring'] += len(slot.transferring)
+            lane['queued'] += len(slot.queue)
+
+        for name in ('html', 'images'):
+            lane = current.get(name, {'concurrency': 0, 'transferring': 0, 'queued': 0})
+            totals = self.lanes.setdefault(name, {'samples': 0, 'busy': 0.0, 'active_max': 0, 'queued_max': 0})
+            totals['samples'] += 1
+            if lane['concurrency']:
+                totals['busy'] += lane['transferring'] / lane['concurrency']
+            totals['active_max'] = max(totals['active_max'], lane['transferring'])
+            totals['queued_max'] = max(totals['queued_max'], lane['queued'])
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+
+        spider.logger.info("========== 下载通道利用率 ==========")
+        for name, totals in self.lanes.items():
+            utilisation = (totals['busy'] / totals['samples'] * 100) if totals['samples'] else 0
+            self.stats.set_value(f'lanes/{name}/utilisation', round(utilisation, 2))
+            self.stats.set_value(f'lanes/{name}/active_max', totals['active_max'])
+            self.stats.set_value(f'lanes/{name}/queued_max', totals['queued_max'])
+            spider.logger.info(
+                f"{name}: 平均利用率 {utilisation:.2f}%, 最大并发 {totals['active_max']}, "
+                f"下载器最大排队 {totals['queued_max']}"
+            )
+        spider.logger.info("====================================")
+
+
+class FeiluProgressStats:
+    """
+    每隔interval秒把爬取进度发布到本机的进度通道，Web应用转发给打开的仪表盘
+
+    进度包括已完成的HTML页面数、最近一个间隔的item速度、封面下载成功率，
+    以及每个数据库最近一个间隔的平均写入延迟（item进入写入队列到提交的时间）。
+    """
+    def __init__(self, crawler, interval, publisher, image_slot):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.interval = interval
+        self.publisher = publisher
+        self.image_slot = image_slot
+        self.task = None
+        self.pages = 0
+        self.started = None
+        # 上一次发布时的累计值，用于计算最近一个间隔的速度和延迟
+        self.last = {'time': None, 'items': 0, 'lag': {}}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        interval = crawler.settings.getfloat('PROGRESS_INTERVAL', 1)
+        if not interval:
+            raise NotConfigured
+        publisher = ProgressPublisher(
+            crawler.settings.get('PROGRESS_HOST', '127.0.0.1'),
+            crawler.settings.getint('PROGRESS_PORT', 5590)
+        )
+        ext = cls(crawler, interval, publisher, crawler.settings.get('IMAGES_LANE_SLOT', 'images'))
+        crawler.signals.connect(ext.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(ext.response_received, signal=signals.response_received)
+        return ext
+
+    def spider_opened(self, spider):
+        self.started = self.last['time'] = time.time()
+        self.task = task.LoopingCall(self.publish, spider, 'running')
+        self.task.start(self.interval, now=True)
+
+    def response_received(self, response, request, spider):
+        # 只统计列表页和详情页：封面请求走图片通道，封面爬虫的 data:, 起始请求等不是HTTP(S)请求
+        if urlparse_cached(request).scheme not in ('http', 'https'):
+            return
+        if request.meta.get('download_slot') != self.image_slot:
+            self.pages += 1
+
+    def storage_lag(self):
+        # 每个数据库最近一个间隔的平均写入延迟和当前排队的批次数
+        storage = {}
+        for key, value in self.stats.get_stats().items():
+            if not (key.startswith('storage/') and key.endswith('/lag_count')):
+                continue
+            name = key.split('/')[1]
+            lag_sum = self.stats.get_value(f'storage/{name}/lag_sum', 0)
+            last_sum, last_count = self.last['lag'].get(name, (0, 0))
+            self.last['lag'][name] = (lag_sum, value)
+            storage[name] = {
+                'lag': round((lag_sum - last_sum) / (value - last_count), 3) if value > last_count else None,
+                'lag_max': self.stats.get_value(f'storage/{name}/lag_max'),
+                'inflight': self.stats.get_value(f'storage/{name}/inflight', 0),
+                'written': value,
+            }
+        return storage
+
+    def event(self, spider, state):
+        now = time.time()
+        elapsed = now - self.last['time']
+        items = self.stats.get_value('item_scraped_count', 0)
+        downloaded = self.stats.get_value('images/downloaded', 0)
+        failed = self.stats.get_value('images/failed', 0)
+        event = {
+            'spider': spider.name,
+            'state': state,
+            'time': round(now, 3),
+            'elapsed': round(now - self.started, 1),
+            'pages': self.pages,
+            'items': items,
+            'items_per_sec': round((items - self.last['items']) / elapsed, 2) if elapsed > 0 else 0,
+            'images': {
+                'downloaded': downloaded,
+                'failed': failed,
+                'success_rate': round(downloaded / (downloaded + failed), 4) if downloaded + failed else None,
+            },
+            'storage': self.storage_lag(),
+        }
+        self.last['time'] = now
+        self.last['items'] = items
+        return event
+
+    def publish(self, spider, state):
+        self.publisher.publish(self.event(spider, state))
+
+    def spider_closed(self, spider, reason):
+        if self.task and self.task.running:
+            self.task.stop()
+        event = self.event(spider, 'finished')
+        event['reason'] = reason
+        self.publisher.publish(event)
+        self.publisher.close()
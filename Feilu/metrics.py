@@ -0,0 +1,193 @@
+from datetime import datetime
+
+from Feilu.normalize import NUMERIC_COLUMNS
+
+# 记录历史的指标，顺序与NUMERIC_COLUMNS一致；评分乘以100后按整数保存
+METRICS = tuple(NUMERIC_COLUMNS)
+# 按标签汇总的指标
+TAG_METRICS = ('monthly_clicks', 'flowers', 'rewards')
+
+
+def encode_metrics(values):
+    """
+    把numeric_values()返回的数值（或books表中的*_num列）编码为整数元组
+    """
+    encoded = []
+    for metric, value in zip(METRICS, values):
+        if value is None:
+            encoded.append(None)
+        elif metric == 'rating':
+            encoded.append(int(round(float(value) * 100)))
+        else:
+            encoded.append(int(value))
+    return tuple(encoded)
+
+
+def decode_metrics(row):
+    """
+    把book_metrics中的一行还原为 {指标: 数值}，评分除以100
+    """
+    values = {}
+    for metric in METRICS:
+        value = row.get(metric)
+        if metric == 'rating' and value is not None:
+            value = value / 100
+        values[metric] = value
+    return values
+
+
+class MetricsDelta:
+    """
+    一个批次中发生变化的指标：书籍的新快照和各标签在本次爬取中的增量
+    """
+    def __init__(self):
+        self.snapshots = {}
+        # 标签ID -> [月点击, 鲜花, 打赏, 书籍数] 的增量
+        self.tags = {}
+
+    def add_book(self, book_id, old, new, old_tag_ids, new_tag_ids):
+        # old为None表示新书；指标没有变化时不记录快照，标签只累计新增关联
+        if old != new:
+            self.snapshots[book_id] = new
+        old = old or (None,) * len(METRICS)
+        difference = [
+            (new[METRICS.index(metric)] or 0) - (old[METRICS.index(metric)] or 0) for metric in TAG_METRICS
+        ]
+        for tag_id in old_tag_ids:
+            self._add_tag(tag_id, difference + [0])
+        for tag_id in new_tag_ids:
+            self._add_tag(tag_id, [new[METRICS.index(metric)] or 0 for metric in TAG_METRICS] + [1])
+
+    def _add_tag(self, tag_id, values):
+        totals = self.tags.setdefault(tag_id, [0] * (len(TAG_METRICS) + 1))
+        for i, value in enumerate(values):
+            totals[i] += value
+
+
+class MetricsStore:
+    """
+    书籍指标的历史记录
+
+    每次爬取（crawls表中的一行）是一个时间分区，book_metrics只在书籍的指标发生变化时
+    记录一行快照，主键为(book_id, crawl_id)，一本书的历史是一段连续的主键范围；
+    tag_metric_deltas按(tag_id, crawl_id)记录标签下所有书籍指标之和的增量，累加后即为标签的历史。
+    旧数据可以用downsample()合并为每周或每月一个分区。
+    """
+    def __init__(self, placeholder='?', dialect='sqlite'):
+        self.placeholder = placeholder
+        self.dialect = dialect
+
+    def _upsert_sql(self, table, keys, columns, increment=False):
+        names = ', '.join(keys + columns)
+        placeholders = ', '.join([self.placeholder] * (len(keys) + len(columns)))
+        if self.dialect == 'mysql':
+            updates = ', '.join(
+                f'{column} = {column} + VALUES({column})' if increment else f'{column} = VALUES({column})'
+                for column in columns
+            )
+            return f'INSERT INTO {table} ({names}) VALUES ({placeholders}) ON DUPLICATE KEY UPDATE {updates}'
+        updates = ', '.join(
+            f'{column} = {column} + excluded.{column}' if increment else f'{column} = excluded.{column}'
+            for column in columns
+        )
+        return f'INSERT INTO {table} ({names}) VALUES ({placeholders}) ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {updates}'
+
+    def start_crawl(self, cursor):
+        # 开始一次爬取，返回分区ID
+        cursor.execute('INSERT INTO crawls (started_at) VALUES (CURRENT_TIMESTAMP)')
+        return cursor.lastrowid
+
+    def finish_crawl(self, cursor, crawl_id):
+        cursor.execute(f'UPDATE crawls SET finished_at = CURRENT_TIMESTAMP WHERE id = {self.placeholder}', (crawl_id,))
+
+    def record(self, cursor, crawl_id, delta):
+        snapshots = [(book_id, crawl_id) + values for book_id, values in sorted(delta.snapshots.items())]
+        if snapshots:
+            cursor.executemany(self._upsert_sql('book_metrics', ('book_id', 'crawl_id'), METRICS), snapshots)
+
+        tags = [(tag_id, crawl_id) + tuple(values) for tag_id, values in sorted(delta.tags.items()) if any(values)]
+        if tags:
+            cursor.executemany(
+                self._upsert_sql('tag_metric_deltas', ('tag_id', 'crawl_id'), TAG_METRICS + ('book_count',), increment=True),
+                tags
+            )
+
+    def seed_baseline(self, cursor):
+        # 第一次启用历史记录时，把books表中的当前值记为一个基准分区
+        cursor.execute('SELECT COUNT(*) FROM books')
+        if not cursor.fetchone()[0]:
+            return None
+        crawl_id = self.start_crawl(cursor)
+        num_columns = ', '.join(
+            'ROUND(rating_num * 100)' if metric == 'rating' else NUMERIC_COLUMNS[metric][0] for metric in METRICS
+        )
+        cursor.execute(
+            f'INSERT INTO book_metrics (book_id, crawl_id, {", ".join(METRICS)}) '
+            f'SELECT id, {self.placeholder}, {num_columns} FROM books',
+            (crawl_id,)
+        )
+        sums = ', '.join(f'COALESCE(SUM(b.{NUMERIC_COLUMNS[metric][0]}), 0)' for metric in TAG_METRICS)
+        cursor.execute(
+            f'INSERT INTO tag_metric_deltas (tag_id, crawl_id, {", ".join(TAG_METRICS)}, book_count) '
+            f'SELECT bt.tag_id, {self.placeholder}, {sums}, COUNT(*) '
+            f'FROM book_tags bt JOIN books b ON b.id = bt.book_id GROUP BY bt.tag_id',
+            (crawl_id,)
+        )
+        self.finish_crawl(cursor, crawl_id)
+        return crawl_id
+
+    def reset(self, cursor):
+        # 清空全部历史，重新记录基准分区（回填数值列之后使用）
+        for table in ('tag_metric_deltas', 'book_metrics', 'crawls'):
+            cursor.execute(f'DELETE FROM {table}')
+        return self.seed_baseline(cursor)
+
+    @staticmethod
+    def period_of(started_at, granularity):
+        if isinstance(started_at, str):
+            started_at = datetime.strptime(started_at[:19], '%Y-%m-%d %H:%M:%S')
+        if granularity == 'day':
+            return started_at.strftime('%Y-%m-%d')
+        if granularity == 'week':
+            year, week, _ = started_at.isocalendar()
+            return f'{year}-W{week:02d}'
+        return started_at.strftime('%Y-%m')
+
+    def downsample(self, cursor, before, granularity='month'):
+        """
+        把before之前的爬取分区合并为每个周期（day/week/month）一个，保留周期内最后一次爬取
+
+        书籍快照只保留周期内最新的一条，标签增量在周期内求和，合并后每个周期末的值不变。
+        返回删除的分区数量。
+        """
+        p = self.placeholder
+        cursor.execute(f'SELECT id, started_at FROM crawls WHERE started_at < {p} ORDER BY id', (before,))
+        periods = {}
+        for crawl_id, started_at in cursor.fetchall():
+            periods.setdefault(self.period_of(started_at, granularity), []).append(crawl_id)
+
+        ignore = 'UPDATE IGNORE' if self.dialect == 'mysql' else 'UPDATE OR IGNORE'
+        removed = 0
+        for crawl_ids in periods.values():
+            keep = crawl_ids[-1]
+            # 从后往前移动快照，书籍在周期内已有更新的快照时保留更新的那条
+            for crawl_id in reversed(crawl_ids[:-1]):
+                cursor.execute(f'{ignore} book_metrics SET crawl_id = {p} WHERE crawl_id = {p}', (keep, crawl_id))
+                cursor.execute(f'DELETE FROM book_metrics WHERE crawl_id = {p}', (crawl_id,))
+
+                columns = ', '.join(TAG_METRICS + ('book_count',))
+                if self.dialect == 'mysql':
+                    updates = ', '.join(f'{c} = {c} + VALUES({c})' for c in TAG_METRICS + ('book_count',))
+                    suffix = f'ON DUPLICATE KEY UPDATE {updates}'
+                else:
+                    updates = ', '.join(f'{c} = {c} + excluded.{c}' for c in TAG_METRICS + ('book_count',))
+                    suffix = f'ON CONFLICT (tag_id, crawl_id) DO UPDATE SET {updates}'
+                cursor.execute(
+                    f'INSERT INTO tag_metric_deltas (tag_id, crawl_id, {columns}) '
+                    f'SELECT tag_id, {p}, {columns} FROM tag_metric_deltas WHERE crawl_id = {p} {suffix}',
+                    (keep, crawl_id)
+                )
+                cursor.execute(f'DELETE FROM tag_metric_deltas WHERE crawl_id = {p}', (crawl_id,))
+                cursor.execute(f'DELETE FROM crawls WHERE id = {p}', (crawl_id,))
+                removed += 1
+        return removed
@@ -1,202 +1,482 @@
-import pymysql
-import os
-from itemadapter import ItemAdapter
-
-class FeiluMySQLPipeline:
-    """
-    将爬取的小说数据保存到MySQL数据库中
-    """
-    def __init__(self, mysql_host, mysql_port, mysql_db, mysql_user, mysql_password, mysql_charset):
-        self.mysql_host = mysql_host
-        self.mysql_port = mysql_port
-        self.mysql_db = mysql_db
-        self.mysql_user = mysql_user
-        self.mysql_password = mysql_password
-        self.mysql_charset = mysql_charset
-        self.conn = None
-        self.cursor = None
-        self.success_count = 0
-        self.failed_count = 0
-        
-    @classmethod
-    def from_crawler(cls, crawler):
-        # 从设置中获取MySQL连接参数
-        return cls(
-            mysql_host=crawler.settings.get('MYSQL_HOST', 'localhost'),
-            mysql_port=crawler.settings.get('MYSQL_PORT', 3306),
-            mysql_db=crawler.settings.get('MYSQL_DATABASE', 'feilu_books'),
-            mysql_user=crawler.settings.get('MYSQL_USER', 'root'),
-            mysql_password=crawler.settings.get('MYSQL_PASSWORD', ''),
-            mysql_charset=crawler.settings.get('MYSQL_CHARSET', 'utf8mb4')
-        )
-    
-    def open_spider(self, spider):
-        # 爬虫启动时连接数据库
-        try:
-            self.conn = pymysql.connect(
-                host=self.mysql_host,
-                port=self.mysql_port,
-                user=self.mysql_user,
-                password=self.mysql_password,
-                charset=self.mysql_charset
-            )
-            self.cursor = self.conn.cursor()
-            
-            # 创建数据库（如果不存在）
-            self.cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.mysql_db}` CHARACTER SET {self.mysql_charset}")
-            self.cursor.execute(f"USE `{self.mysql_db}`")
-            
-            spider.logger.info(f"MySQL数据库连接成功: {self.mysql_host}:{self.mysql_port}/{self.mysql_db}")
-            
-            # 创建表结构
-            self.create_tables()
-            spider.logger.info("MySQL数据库表结构初始化完成")
-        except Exception as e:
-            spider.logger.error(f"MySQL数据库连接失败: {str(e)}")
-            raise e
-    
-    def create_tables(self):
-        # 创建小说信息表
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS `books` (
-            `id` INT AUTO_INCREMENT PRIMARY KEY,
-            `title` VARCHAR(255) NOT NULL,
-            `author` VARCHAR(100),
-            `monthly_clicks` VARCHAR(50),
-            `word_count` VARCHAR(50),
-            `summary` TEXT,
-            `book_url` VARCHAR(255) UNIQUE,
-            `flowers` VARCHAR(50),
-            `rating` VARCHAR(20),
-            `rewards` VARCHAR(50),
-            `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        ''')
-        
-        # 创建标签表
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS `tags` (
-            `id` INT AUTO_INCREMENT PRIMARY KEY,
-            `name` VARCHAR(50) UNIQUE
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        ''')
-        
-        # 创建小说-标签关联表
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS `book_tags` (
-            `book_id` INT,
-            `tag_id` INT,
-            PRIMARY KEY (`book_id`, `tag_id`),
-            FOREIGN KEY (`book_id`) REFERENCES `books` (`id`) ON DELETE CASCADE,
-            FOREIGN KEY (`tag_id`) REFERENCES `tags` (`id`) ON DELETE CASCADE
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        ''')
-        
-        # 创建图片表
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS `images` (
-            `id` INT AUTO_INCREMENT PRIMARY KEY,
-            `book_id` INT,
-            `image_url` VARCHAR(255),
-            `image_path` VARCHAR(255),
-            FOREIGN KEY (`book_id`) REFERENCES `books` (`id`) ON DELETE CASCADE
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
-        ''')
-        
-        self.conn.commit()
-    
-    def process_item(self, item, spider):
-        try:
-            adapter = ItemAdapter(item)
-            
-            # 开始事务
-            self.conn.begin()
-            
-            # 1. 插入小说基本信息
-            self.cursor.execute('''
-            INSERT INTO `books` 
-            (`title`, `author`, `monthly_clicks`, `word_count`, `summary`, `book_url`, `flowers`, `rating`, `rewards`)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-            `title`=%s, `author`=%s, `monthly_clicks`=%s, `word_count`=%s, `summary`=%s,
-            `flowers`=%s, `rating`=%s, `rewards`=%s
-            ''', (
-                adapter.get('title', ''),
-                adapter.get('author', ''),
-                adapter.get('monthly_clicks', ''),
-                adapter.get('word_count', ''),
-                adapter.get('summary', ''),
-                adapter.get('book_url', ''),
-                adapter.get('flowers', ''),
-                adapter.get('rating', ''),
-                adapter.get('rewards', ''),
-                # 用于ON DUPLICATE KEY UPDATE的值
-                adapter.get('title', ''),
-                adapter.get('author', ''),
-                adapter.get('monthly_clicks', ''),
-                adapter.get('word_count', ''),
-                adapter.get('summary', ''),
-                adapter.get('flowers', ''),
-                adapter.get('rating', ''),
-                adapter.get('rewards', '')
-            ))
-            
-            # 获取插入的书籍ID
-            if self.cursor.rowcount > 0:
-                book_id = self.cursor.lastrowid
-            else:
-                # 如果书籍已存在，获取其ID
-                self.cursor.execute('SELECT `id` FROM `books` WHERE `book_url` = %s', (adapter.get('book_url', ''),))
-                book_id = self.cursor.fetchone()[0]
-            
-            # 2. 处理标签
-            tags = adapter.get('tags', [])
-            if tags:
-                for tag in tags:
-                    # 插入标签（如果不存在）
-                    self.cursor.execute('INSERT IGNORE INTO `tags` (`name`) VALUES (%s)', (tag,))
-                    
-                    # 获取标签ID
-                    self.cursor.execute('SELECT `id` FROM `tags` WHERE `name` = %s', (tag,))
-                    tag_id = self.cursor.fetchone()[0]
-                    
-                    # 建立书籍和标签的关联
-                    self.cursor.execute('INSERT IGNORE INTO `book_tags` (`book_id`, `tag_id`) VALUES (%s, %s)', 
-                                       (book_id, tag_id))
-            
-            # 3. 处理图片
-            image_urls = adapter.get('image_urls', [])
-            images = adapter.get('images', [])
-            
-            if image_urls and images:
-                for i, image_info in enumerate(images):
-                    image_url = image_urls[i] if i < len(image_urls) else ''
-                    image_path = image_info.get('path', '') if isinstance(image_info, dict) else ''
-                    
-                    self.cursor.execute('''
-                    INSERT INTO `images` (`book_id`, `image_url`, `image_path`) VALUES (%s, %s, %s)
-                    ''', (book_id, image_url, image_path))
-            
-            # 提交事务
-            self.conn.commit()
-            self.success_count += 1
-            spider.logger.info(f"成功保存到MySQL数据库: {adapter.get('title', '')}")
-            
-        except Exception as e:
-            self.failed_count += 1
-            spider.logger.error(f"保存到MySQL数据库失败: {str(e)}, item: {item}")
-            # 回滚事务
-            self.conn.rollback()
-        
-        return item
-    
-    def close_spider(self, spider):
-        # 爬虫关闭时关闭数据库连接
-        if self.conn:
-            spider.logger.info("========== MySQL数据库存储统计 ==========")
-            spider.logger.info(f"成功存储记录: {self.success_count}")
-            spider.logger.info(f"存储失败记录: {self.failed_count}")
-            spider.logger.info("========================================")
-            
-            self.conn.close()
-            spider.logger.info("MySQL数据库连接已关闭")
\ No newline at end of file
+import pymysql
+from pymysql.constants import ER
+import os
+import tempfile
+from twisted.enterprise import adbapi
+
+from Feilu import data_version
+from Feilu.aggregates import DashboardAggregates
+from Feilu.normalize import NUMERIC_COLUMNS, numeric_values
+from Feilu.storage import MYSQL, WRITE_COLUMNS, StorageBackend
+
+class FeiluMySQLPipeline(StorageBackend):
+    """
+    将爬取的小说数据保存到MySQL数据库中
+
+    作为存储后端由FeiluStoragePipeline调用（STORAGE_BACKENDS中的mysql），写入逻辑见storage.py：
+    书籍用一条多行的INSERT ... ON DUPLICATE KEY UPDATE写入，
+    批量导入模式（bulk_load）下先写入临时文件，再用LOAD DATA一次性导入。
+
+    写入操作交给Twisted的数据库连接池在线程中执行，同时进行的批次数量受max_inflight限制。
+    """
+    dialect = MYSQL
+    # 锁等待超时、死锁、连接断开等错误可以整批重试
+    TRANSIENT_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError)
+    # 由原始文本转换得到的数值列，顺序与NUMERIC_COLUMNS一致
+    NUMERIC_TYPES = {
+        'monthly_clicks_num': 'INT',
+        'word_count_num': 'INT',
+        'flowers_num': 'INT',
+        'rating_num': 'DECIMAL(4,2)',
+        'rewards_num': 'INT',
+    }
+    # 旧版本books表中没有、需要迁移时补充的列
+    ADDED_COLUMNS = dict(NUMERIC_TYPES, content_hash='CHAR(40)')
+    # 仪表盘查询使用的索引（见dashboard_queries.py）: 索引名 -> (表名, 列)
+    INDEXES = {
+        'idx_books_rating': ('books', '`rating_num`'),
+        'idx_books_author_rating': ('books', '`author`, `rating_num`'),
+        'idx_books_clicks_rating': ('books', '`monthly_clicks_num`, `rating_num`'),
+        'idx_books_clicks': ('books', '`monthly_clicks_num`'),
+        'idx_books_words': ('books', '`word_count_num`'),
+        'idx_book_tags_tag': ('book_tags', '`tag_id`, `book_id`'),
+        'idx_tag_stats_count': ('tag_stats', '`book_count`'),
+        'idx_author_stats_count': ('author_stats', '`book_count`'),
+        'idx_book_metrics_crawl': ('book_metrics', '`crawl_id`'),
+        'idx_tag_metric_deltas_crawl': ('tag_metric_deltas', '`crawl_id`'),
+    }
+
+    def __init__(self, mysql_host, mysql_port, mysql_db, mysql_user, mysql_password, mysql_charset,
+                 pool_size=4, max_inflight=8, batch_size=200, flush_interval=2, bulk_load=False):
+        super().__init__()
+        self.mysql_host = mysql_host
+        self.mysql_port = mysql_port
+        self.mysql_db = mysql_db
+        self.mysql_user = mysql_user
+        self.mysql_password = mysql_password
+        self.mysql_charset = mysql_charset
+        self.pool_size = pool_size
+        self.max_inflight = max_inflight
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.bulk_load = bulk_load
+        self.dbpool = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        # 从设置中获取MySQL连接参数
+        bulk_load = settings.getbool('MYSQL_BULK_LOAD', False)
+        return cls(
+            mysql_host=settings.get('MYSQL_HOST', 'localhost'),
+            mysql_port=settings.getint('MYSQL_PORT', 3306),
+            mysql_db=settings.get('MYSQL_DATABASE', 'feilu_books'),
+            mysql_user=settings.get('MYSQL_USER', 'root'),
+            mysql_password=settings.get('MYSQL_PASSWORD', ''),
+            mysql_charset=settings.get('MYSQL_CHARSET', 'utf8mb4'),
+            pool_size=settings.getint('MYSQL_POOL_SIZE', 4),
+            max_inflight=settings.getint('MYSQL_MAX_INFLIGHT', 8),
+            batch_size=settings.getint('MYSQL_BULK_BATCH_SIZE' if bulk_load else 'MYSQL_BATCH_SIZE', 200),
+            flush_interval=cls.flush_interval_setting(settings, 'MYSQL_FLUSH_INTERVAL', 2),
+            bulk_load=bulk_load
+        )
+    
+    def open(self, spider):
+        # 爬虫启动时连接数据库，建库建表使用一个同步连接
+        try:
+            self.conn = pymysql.connect(
+                host=self.mysql_host,
+                port=self.mysql_port,
+                user=self.mysql_user,
+                password=self.mysql_password,
+                charset=self.mysql_charset
+            )
+            self.cursor = self.conn.cursor()
+            
+            # 创建数据库（如果不存在）
+            self.cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.mysql_db}` CHARACTER SET {self.mysql_charset}")
+            self.cursor.execute(f"USE `{self.mysql_db}`")
+            
+            spider.logger.info(f"MySQL数据库连接成功: {self.mysql_host}:{self.mysql_port}/{self.mysql_db}")
+            
+            # 创建表结构
+            self.create_tables()
+            added = self.migrate_tables()
+            if added:
+                spider.logger.info(f"已升级表结构: {', '.join(added)}，旧数据请运行 python manage_db.py migrate --backend mysql 回填")
+            spider.logger.info("MySQL数据库表结构初始化完成")
+
+            # 加载标签缓存
+            self.tag_cache.load(self.cursor)
+            spider.logger.info(f"已加载标签缓存: {len(self.tag_cache)} 个")
+
+            # 本次爬取作为指标历史的一个分区
+            self.crawl_id = self.metrics.start_crawl(self.cursor)
+            self.conn.commit()
+
+            self.cursor.close()
+            self.conn.close()
+            self.cursor = None
+            self.conn = None
+
+            # 创建写入用的连接池，批量导入模式需要允许LOAD DATA LOCAL
+            self.dbpool = adbapi.ConnectionPool(
+                'pymysql',
+                host=self.mysql_host,
+                port=self.mysql_port,
+                user=self.mysql_user,
+                password=self.mysql_password,
+                database=self.mysql_db,
+                charset=self.mysql_charset,
+                local_infile=self.bulk_load,
+                cp_min=1,
+                cp_max=self.pool_size,
+                cp_reconnect=True
+            )
+            spider.logger.info(
+                f"MySQL连接池已创建: 连接数 {self.pool_size}, 最大同时写入批次 {self.max_inflight}, "
+                f"每批 {self.batch_size} 条{', 批量导入模式' if self.bulk_load else ''}"
+            )
+        except Exception as e:
+            spider.logger.error(f"MySQL数据库连接失败: {str(e)}")
+            raise e
+
+    def run(self, fn, *args):
+        # 在连接池线程中执行，成功时提交，异常时回滚
+        return self.dbpool.runWithConnection(self._transaction, fn, *args)
+
+    def _transaction(self, conn, fn, *args):
+        # 与连接池的runInteraction()相同（游标断开时可以重连），另外随连接提交或回滚标签缓存
+        trans = self.dbpool.transactionFactory(self.dbpool, conn)
+        try:
+            result = fn(trans, *args)
+            trans.close()
+            conn.commit()
+            self.tag_cache.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            self.tag_cache.rollback()
+            raise
+
+    def shutdown(self):
+        if self.dbpool:
+            self.dbpool.close()
+        # 打开时出错可能留下建表用的同步连接
+        super().shutdown()
+    
+    def create_tables(self):
+        # 创建小说信息表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `books` (
+            `id` INT AUTO_INCREMENT PRIMARY KEY,
+            `title` VARCHAR(255) NOT NULL,
+            `author` VARCHAR(100),
+            `monthly_clicks` VARCHAR(50),
+            `word_count` VARCHAR(50),
+            `summary` TEXT,
+            `book_url` VARCHAR(255) UNIQUE,
+            `flowers` VARCHAR(50),
+            `rating` VARCHAR(20),
+            `rewards` VARCHAR(50),
+            `monthly_clicks_num` INT,
+            `word_count_num` INT,
+            `flowers_num` INT,
+            `rating_num` DECIMAL(4,2),
+            `rewards_num` INT,
+            `content_hash` CHAR(40),
+            `created_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+        
+        # 创建标签表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `tags` (
+            `id` INT AUTO_INCREMENT PRIMARY KEY,
+            `name` VARCHAR(50) UNIQUE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+        
+        # 创建小说-标签关联表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `book_tags` (
+            `book_id` INT,
+            `tag_id` INT,
+            PRIMARY KEY (`book_id`, `tag_id`),
+            FOREIGN KEY (`book_id`) REFERENCES `books` (`id`) ON DELETE CASCADE,
+            FOREIGN KEY (`tag_id`) REFERENCES `tags` (`id`) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+        
+        # 创建图片表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `images` (
+            `id` INT AUTO_INCREMENT PRIMARY KEY,
+            `book_id` INT,
+            `image_url` VARCHAR(255),
+            `image_path` VARCHAR(255),
+            FOREIGN KEY (`book_id`) REFERENCES `books` (`id`) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+        
+        self.conn.commit()
+
+    def migrate_tables(self):
+        # 为旧版本创建的表补充数值列和索引，返回新添加的列名和索引名
+        self.cursor.execute('''
+        SELECT `COLUMN_NAME` FROM `information_schema`.`COLUMNS`
+        WHERE `TABLE_SCHEMA` = DATABASE() AND `TABLE_NAME` = 'books'
+        ''')
+        existing = {row[0] for row in self.cursor.fetchall()}
+        added = [column for column in self.ADDED_COLUMNS if column not in existing]
+        if added:
+            # 一条ALTER TABLE添加所有缺少的列，只重建一次表
+            self.cursor.execute('ALTER TABLE `books` ' + ', '.join(
+                f'ADD COLUMN `{column}` {self.ADDED_COLUMNS[column]}' for column in added
+            ))
+
+        # 仪表盘汇总表，新建时根据已有数据全量生成
+        self.cursor.execute('''
+        SELECT `TABLE_NAME` FROM `information_schema`.`TABLES` WHERE `TABLE_SCHEMA` = DATABASE()
+        ''')
+        tables = {row[0] for row in self.cursor.fetchall()}
+        if not set(DashboardAggregates.TABLES) <= tables:
+            self.create_aggregate_tables()
+            self.aggregates.rebuild(self.cursor)
+            added.extend(DashboardAggregates.TABLES)
+
+        # 指标历史表，新建时把已有书籍的当前值记为基准分区
+        if 'book_metrics' not in tables:
+            self.create_metrics_tables()
+            self.metrics.seed_baseline(self.cursor)
+            added.extend(('crawls', 'book_metrics', 'tag_metric_deltas'))
+
+        if 'data_version' not in tables:
+            data_version.create_table(self.cursor, 'mysql')
+            added.append('data_version')
+
+        # 相似书籍表，由 python manage_db.py similar 计算填充
+        if 'similar_books' not in tables:
+            self.create_similarity_tables()
+            added.extend(('similar_books', 'similar_book_state'))
+
+        self.cursor.execute('''
+        SELECT DISTINCT `INDEX_NAME` FROM `information_schema`.`STATISTICS`
+        WHERE `TABLE_SCHEMA` = DATABASE()
+        ''')
+        existing = {row[0] for row in self.cursor.fetchall()}
+        for name, (table, columns) in self.INDEXES.items():
+            if name not in existing:
+                self.cursor.execute(f'ALTER TABLE `{table}` ADD INDEX `{name}` ({columns})')
+                added.append(name)
+
+        # 书名、作者、简介的全文索引，由InnoDB随写入自动维护
+        if 'ft_books_text' not in existing:
+            if self.add_fulltext_index():
+                added.append('ft_books_text')
+            else:
+                added.append('ft_books_text（没有ngram解析器，使用默认解析器）')
+
+        # 每本书的每个封面只保留一条images记录
+        if 'uq_images_book_url' not in existing:
+            self.dedupe_images()
+            self.cursor.execute('ALTER TABLE `images` ADD UNIQUE INDEX `uq_images_book_url` (`book_id`, `image_url`)')
+            added.append('uq_images_book_url')
+        self.conn.commit()
+        return added
+
+    def add_fulltext_index(self):
+        # ngram解析器按相邻两个字切分中文，需要MySQL 5.7.6及以上；MariaDB等没有ngram解析器时改用默认解析器，
+        # 默认解析器按空格和标点切分，中文关键词只能匹配完整的词。返回是否使用了ngram解析器
+        sql = 'ALTER TABLE `books` ADD FULLTEXT INDEX `ft_books_text` (`title`, `author`, `summary`)'
+        try:
+            self.cursor.execute(sql + ' WITH PARSER ngram')
+            return True
+        except pymysql.err.OperationalError as e:
+            if e.args[0] != ER.FUNCTION_NOT_DEFINED:
+                raise
+        self.cursor.execute(sql)
+        return False
+
+    def create_aggregate_tables(self):
+        # 标签书籍数
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `tag_stats` (
+            `tag_id` INT PRIMARY KEY,
+            `book_count` INT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+
+        # 评分分布，bucket为评分的整数部分（0-9）
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `rating_buckets` (
+            `bucket` TINYINT PRIMARY KEY,
+            `book_count` INT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+
+        # 作者书籍数和评分和，平均评分 = rating_sum / rating_count
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `author_stats` (
+            `author` VARCHAR(100) PRIMARY KEY,
+            `book_count` INT NOT NULL DEFAULT 0,
+            `rating_sum` DECIMAL(14,2) NOT NULL DEFAULT 0,
+            `rating_count` INT NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+
+    def create_metrics_tables(self):
+        # 爬取记录，每次爬取是指标历史的一个分区
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `crawls` (
+            `id` INT AUTO_INCREMENT PRIMARY KEY,
+            `started_at` DATETIME NOT NULL,
+            `finished_at` DATETIME NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+
+        # 书籍指标快照，只在指标变化时记录，评分乘以100后按整数保存
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `book_metrics` (
+            `book_id` INT NOT NULL,
+            `crawl_id` INT NOT NULL,
+            `monthly_clicks` INT,
+            `word_count` INT,
+            `flowers` INT,
+            `rating` SMALLINT,
+            `rewards` INT,
+            PRIMARY KEY (`book_id`, `crawl_id`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+
+        # 标签下所有书籍指标之和在每次爬取中的增量
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `tag_metric_deltas` (
+            `tag_id` INT NOT NULL,
+            `crawl_id` INT NOT NULL,
+            `monthly_clicks` BIGINT NOT NULL DEFAULT 0,
+            `flowers` BIGINT NOT NULL DEFAULT 0,
+            `rewards` BIGINT NOT NULL DEFAULT 0,
+            `book_count` INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (`tag_id`, `crawl_id`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+
+    def create_similarity_tables(self):
+        # 每本书最相似的k本书
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `similar_books` (
+            `book_id` INT NOT NULL,
+            `similar_id` INT NOT NULL,
+            `score` FLOAT NOT NULL,
+            PRIMARY KEY (`book_id`, `similar_id`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+
+        # 已计算过相似书籍的书，min_score为第k名的相似度，新书超过它才会进入该书的列表
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS `similar_book_state` (
+            `book_id` INT PRIMARY KEY,
+            `min_score` FLOAT NOT NULL DEFAULT 0,
+            `computed_at` TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+
+    def rebuild_aggregates(self):
+        # 根据明细表全量重建仪表盘汇总表
+        self.aggregates.rebuild(self.cursor)
+        self.conn.commit()
+
+    def dedupe_images(self):
+        # 删除重复爬取产生的重复images记录，优先保留已下载（image_path不为空）的最新一条
+        self.cursor.execute('''
+        DELETE `i` FROM `images` `i`
+        JOIN (
+            SELECT `book_id`, `image_url`,
+                   COALESCE(MAX(CASE WHEN `image_path` IS NOT NULL AND `image_path` != '' THEN `id` END), MAX(`id`)) AS `keep_id`
+            FROM `images`
+            GROUP BY `book_id`, `image_url`
+            HAVING COUNT(*) > 1
+        ) `d` ON `i`.`book_id` = `d`.`book_id` AND `i`.`image_url` = `d`.`image_url` AND `i`.`id` != `d`.`keep_id`
+        ''')
+        return self.cursor.rowcount
+
+    def backfill_numeric(self):
+        # 根据原始文本重新计算所有书籍的数值列，按主键分段读取和更新，返回更新的行数
+        raw_columns = list(NUMERIC_COLUMNS)
+        assignments = ', '.join(f'`{column}` = %s' for column, _ in NUMERIC_COLUMNS.values())
+        last_id = 0
+        total = 0
+        while True:
+            self.cursor.execute(
+                f"SELECT `id`, {', '.join(f'`{column}`' for column in raw_columns)} FROM `books` "
+                f"WHERE `id` > %s ORDER BY `id` LIMIT %s",
+                (last_id, self.CHUNK_SIZE)
+            )
+            rows = self.cursor.fetchall()
+            if not rows:
+                break
+            updates = [numeric_values(dict(zip(raw_columns, row[1:]))) + (row[0],) for row in rows]
+            self.cursor.executemany(f'UPDATE `books` SET {assignments} WHERE `id` = %s', updates)
+            self.conn.commit()
+            last_id = rows[-1][0]
+            total += len(rows)
+        return total
+    
+    def upsert_books(self, txn, rows):
+        if self.bulk_load:
+            self.load_books(txn, rows)
+        else:
+            super().upsert_books(txn, rows)
+
+    def load_books(self, txn, rows):
+        # 批量导入：写入临时文件，LOAD DATA导入临时表，再一条INSERT ... SELECT合并到books表
+        columns = ', '.join(f'`{column}`' for column in WRITE_COLUMNS)
+        updates = ', '.join(f'`{column}`=VALUES(`{column}`)' for column in WRITE_COLUMNS if column != 'book_url')
+        txn.execute('''
+        CREATE TEMPORARY TABLE IF NOT EXISTS `books_stage` (
+            `title` VARCHAR(255),
+            `author` VARCHAR(100),
+            `monthly_clicks` VARCHAR(50),
+            `word_count` VARCHAR(50),
+            `summary` TEXT,
+            `book_url` VARCHAR(255),
+            `flowers` VARCHAR(50),
+            `rating` VARCHAR(20),
+            `rewards` VARCHAR(50),
+            `monthly_clicks_num` INT,
+            `word_count_num` INT,
+            `flowers_num` INT,
+            `rating_num` DECIMAL(4,2),
+            `rewards_num` INT,
+            `content_hash` CHAR(40)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        ''')
+        txn.execute('DELETE FROM `books_stage`')
+
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', suffix='.tsv', delete=False) as f:
+            for row in rows:
+                f.write('\t'.join(self._escape_load_value(value) for value in row))
+                f.write('\n')
+            path = f.name
+        try:
+            txn.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE `books_stage` CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' ({columns})",
+                (path,)
+            )
+        finally:
+            os.remove(path)
+
+        txn.execute(
+            f'INSERT INTO `books` ({columns}) SELECT {columns} FROM `books_stage` '
+            f'ON DUPLICATE KEY UPDATE {updates}'
+        )
+
+    @staticmethod
+    def _escape_load_value(value):
+        # LOAD DATA默认的转义规则：\N表示NULL，反斜杠、制表符和换行需要转义
+        if value is None:
+            return '\\N'
+        value = str(value)
+        return (value.replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r').replace('\0', '\\0'))
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import re
+from decimal import Decimal
+
+# 数量单位
+UNITS = {
+    '千': 1000,
+    '万': 10000,
+    '亿': 100000000,
+}
+
+NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)\s*([千万亿]?)')
+
+
+def parse_count(text):
+    """
+    把页面上的数量文本转换为整数，如 '月点击：1068178'、'字数：144万'、'116.3万'
+
+    无法识别时返回None
+    """
+    if text is None:
+        return None
+    if isinstance(text, (int, float, Decimal)):
+        return int(text)
+    match = NUMBER_RE.search(str(text).replace(',', ''))
+    if not match:
+        return None
+    value = Decimal(match.group(1)) * UNITS.get(match.group(2), 1)
+    return int(value)
+
+
+def parse_rating(text):
+    """
+    把评分文本转换为保留两位小数的浮点数，如 '9.7'，无法识别时返回None
+    """
+    if text is None:
+        return None
+    if isinstance(text, (int, float, Decimal)):
+        return round(float(text), 2)
+    match = NUMBER_RE.search(str(text))
+    if not match:
+        return None
+    return round(float(match.group(1)), 2)
+
+
+# 原始文本列 -> (数值列, 转换函数)，原始文本保留用于核对
+NUMERIC_COLUMNS = {
+    'monthly_clicks': ('monthly_clicks_num', parse_count),
+    'word_count': ('word_count_num', parse_count),
+    'flowers': ('flowers_num', parse_count),
+    'rating': ('rating_num', parse_rating),
+    'rewards': ('rewards_num', parse_count),
+}
+
+
+def numeric_values(adapter):
+    """
+    按NUMERIC_COLUMNS的顺序返回item中各数值列的值
+    """
+    return tuple(parse(adapter.get(raw)) for raw, (_, parse) in NUMERIC_COLUMNS.items())
+
+
+# 参与内容哈希计算的字段
+HASH_FIELDS = ('title', 'author', 'monthly_clicks', 'word_count', 'summary', 'flowers', 'rating', 'rewards')
+
+
+def content_hash(adapter):
+    """
+    计算书籍内容的SHA-1哈希，内容（包括标签和封面URL）没有变化时哈希不变
+
+    数据库管道用它跳过重复爬取时没有变化的书籍。封面的本地路径不参与计算：
+    异步回填时书籍先于封面写入，路径由封面回填或重复爬取时单独更新，不影响哈希。
+    """
+    content = {
+        'fields': [adapter.get(field) or '' for field in HASH_FIELDS],
+        'tags': sorted(tag for tag in adapter.get('tags') or [] if tag),
+        'image_urls': sorted(adapter.get('image_urls') or []),
+    }
+    data = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
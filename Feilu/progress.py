@@ -0,0 +1,154 @@
+"""
+爬取进度通道
+
+爬虫把进度事件（JSON）作为UDP数据报发到本机的一个端口，不建立连接、不等待回复，
+没有人订阅时数据报直接被丢弃，发送只需要一次系统调用。
+Web应用用一个ProgressBroker订阅这个端口，在后台线程中接收事件并转发给所有打开的仪表盘（SSE）。
+"""
+
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 单个事件的最大字节数
+MAX_EVENT_SIZE = 65507
+
+
+class ProgressPublisher:
+    """
+    爬虫一侧：向本机端口发送进度事件
+    """
+    def __init__(self, host='127.0.0.1', port=5590):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+    def publish(self, event):
+        data = json.dumps(event, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        try:
+            self.sock.sendto(data, self.address)
+        except OSError:
+            # 没有订阅者（端口未监听）或发送缓冲区已满，丢弃这次事件
+            return False
+        return True
+
+    def close(self):
+        self.sock.close()
+
+
+class ProgressBroker:
+    """
+    Web应用一侧：订阅进度端口，把每个事件转发给所有客户端
+
+    每个客户端一个有界队列，事件只编码一次；客户端读取太慢、队列已满时丢弃它最旧的事件，
+    进度事件是完整的快照，丢弃旧事件不影响显示。新客户端连接时先收到最近一次事件
+    （收到超过replay_age秒的不再重放，避免显示很久以前结束的爬取）。
+    端口在第一个客户端连接时才绑定，同一端口只能被一个Web进程订阅。
+    """
+    def __init__(self, host='127.0.0.1', port=5590, queue_size=16, replay_age=300):
+        self.address = (host, port)
+        self.queue_size = queue_size
+        self.replay_age = replay_age
+        self.clients = set()
+        # (收到的时间, 事件)
+        self.latest = None
+        self.events = 0
+        self.sock = None
+        self.error = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.sock is not None or self.error is not None:
+                return
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                sock.bind(self.address)
+            except OSError as e:
+                sock.close()
+                self.error = str(e)
+                logger.warning(f"无法订阅爬取进度端口 {self.address[0]}:{self.address[1]}: {self.error}")
+                return
+            self.sock = sock
+            # 端口为0时绑定的是系统分配的端口
+            self.address = sock.getsockname()
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def _receive(self):
+        while True:
+            try:
+                data = self.sock.recv(MAX_EVENT_SIZE)
+            except OSError:
+                break
+            # 丢弃不是JSON的数据报；换行只可能是JSON中的空白，去掉后才能放进一行SSE data
+            try:
+                json.loads(data)
+            except ValueError:
+                continue
+            self.publish(data.decode('utf-8').replace('\n', ''))
+
+    def publish(self, data):
+        # data为编码好的JSON字符串
+        with self.lock:
+            self.latest = (time.time(), data)
+            self.events += 1
+            clients = list(self.clients)
+        for client in clients:
+            self._put(client, data)
+
+    @staticmethod
+    def _put(client, data):
+        while True:
+            try:
+                client.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    client.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def subscribe(self):
+        self.start()
+        client = queue.Queue(self.queue_size)
+        with self.lock:
+            self.clients.add(client)
+            latest = self.latest
+        if latest is not None and time.time() - latest[0] < self.replay_age:
+            client.put_nowait(latest[1])
+        return client
+
+    def unsubscribe(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def stream(self, heartbeat=15):
+        """
+        SSE格式的事件流，超过heartbeat秒没有事件时发送一行注释，防止连接被代理关闭
+        """
+        client = self.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    data = client.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: progress\ndata: {data}\n\n'
+        finally:
+            self.unsubscribe(client)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'subscribed': self.sock is not None,
+                'error': self.error,
+                'clients': len(self.clients),
+                'events': self.events,
+            }
@@ -0,0 +1,74 @@
+import re
+
+# 汉字、假名、谚文等词之间没有空格的文字
+CJK = '぀-ヿ㐀-䶿一-鿿가-힯豈-﫿'
+TOKEN_RE = re.compile(f'[{CJK}]+|(?:(?![{CJK}])[^\\W_])+')
+
+
+def tokenize(text):
+    """
+    把文本切分为检索词：连续的中日韩文字按相邻两个字切分（与MySQL ngram解析器一致），
+    其他文字按单词切分并转为小写
+    """
+    tokens = []
+    for word in TOKEN_RE.findall(text or ''):
+        if re.match(f'[{CJK}]', word):
+            if len(word) == 1:
+                tokens.append(word)
+            else:
+                tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def match_query(query, dialect='mysql'):
+    """
+    把用户输入的关键词转换为全文检索表达式，空格分隔的每个关键词都必须出现；没有有效关键词时返回None
+
+    SQLite为FTS5的MATCH表达式，MySQL为BOOLEAN MODE下的AGAINST表达式
+    """
+    terms = []
+    for term in (query or '').split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        # 单个汉字短于二元切分的长度，按前缀匹配
+        single = len(tokens) == 1 and len(tokens[0]) == 1 and re.match(f'[{CJK}]', tokens[0])
+        if dialect == 'sqlite':
+            terms.append(f'"{tokens[0]}"*' if single else '"' + ' '.join(tokens) + '"')
+        else:
+            text = ' '.join(TOKEN_RE.findall(term))
+            terms.append(f'+{text}*' if single else f'+"{text}"')
+    if not terms:
+        return None
+    return ' AND '.join(terms) if dialect == 'sqlite' else ' '.join(terms)
+
+
+class SearchIndex:
+    """
+    SQLite的书名、作者、简介全文检索索引
+
+    books_fts是FTS5表，rowid为书籍ID，保存tokenize()切分后的文本；
+    数据库管道写入书籍时在同一个事务中更新有变化的书籍，rebuild()根据books表全量重建。
+    MySQL使用books表上的ngram全文索引，由数据库自动维护。
+    """
+    COLUMNS = ('title', 'author', 'summary')
+
+    def create_table(self, cursor):
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5({', '.join(self.COLUMNS)})")
+
+    def apply(self, cursor, books):
+        # books为 [(书籍ID, 书名, 作者, 简介)]，已有的行按rowid整行替换
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO books_fts (rowid, {', '.join(self.COLUMNS)}) VALUES (?, ?, ?, ?)",
+            [(book_id,) + tuple(' '.join(tokenize(text)) for text in texts) for book_id, *texts in books]
+        )
+
+    def rebuild(self, cursor, chunk_size=500):
+        cursor.execute('DELETE FROM books_fts')
+        cursor.execute(f"SELECT id, {', '.join(self.COLUMNS)} FROM books")
+        books = cursor.fetchall()
+        for i in range(0, len(books), chunk_size):
+            self.apply(cursor, books[i:i + chunk_size])
+        return len(books)
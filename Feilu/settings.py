@@ -1,129 +1,187 @@
-# Scrapy settings for Feilu project
-#
-# For simplicity, this file contains only settings considered important or
-# commonly used. You can find more settings consulting the documentation:
-#
-#     https://docs.scrapy.org/en/latest/topics/settings.html
-#     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-
-BOT_NAME = "Feilu"
-
-SPIDER_MODULES = ["Feilu.spiders"]
-NEWSPIDER_MODULE = "Feilu.spiders"
-
-
-# Crawl responsibly by identifying yourself (and your website) on the user-agent
-#USER_AGENT = "Feilu (+http://www.yourdomain.com)"
-
-# 不遵循robots.txt规则，因为它可能阻止图片下载
-ROBOTSTXT_OBEY = False
-
-# 增加重试次数
-RETRY_TIMES = 5
-RETRY_HTTP_CODES = [500, 502, 503, 504, 408, 403, 404, 429]
-
-# Configure maximum concurrent requests performed by Scrapy (default: 16)
-#CONCURRENT_REQUESTS = 32
-
-# Configure a delay for requests for the same website (default: 0)
-# See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
-# See also autothrottle settings and docs
-#DOWNLOAD_DELAY = 3
-# The download delay setting will honor only one of:
-#CONCURRENT_REQUESTS_PER_DOMAIN = 16
-#CONCURRENT_REQUESTS_PER_IP = 16
-
-# Disable cookies (enabled by default)
-#COOKIES_ENABLED = False
-
-# Disable Telnet Console (enabled by default)
-#TELNETCONSOLE_ENABLED = False
-
-# Override the default request headers:
-#DEFAULT_REQUEST_HEADERS = {
-#    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-#    "Accept-Language": "en",
-#}
-
-# Enable or disable spider middlewares
-# See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "Feilu.middlewares.FeiluSpiderMiddleware": 543,
-#}
-
-# Enable or disable downloader middlewares
-# See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "Feilu.middlewares.FeiluDownloaderMiddleware": 543,
-#}
-
-# Enable or disable extensions
-# See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
-
-# Configure item pipelines
-# See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-# 启用图片下载管道、数据库管道和自定义管道
-ITEM_PIPELINES = {
-    'Feilu.pipelines.FeiluImagesPipeline': 1,
-    'Feilu.pipelines.FeiluPipeline': 300,
-    'Feilu.mysql_pipeline.FeiluMySQLPipeline': 400
-}
-
-# 设置图片存储路径 - 使用绝对路径
-import os
-IMAGES_STORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'images')
-
-# 设置用户代理
-USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-
-# 禁用重定向
-REDIRECT_ENABLED = False
-
-# 设置图片下载超时时间
-DOWNLOAD_TIMEOUT = 180
-
-# 设置图片缩略图
-IMAGES_THUMBS = {
-    'small': (50, 50),
-    'medium': (100, 100),
-}
-IMAGES_URLS_FIELD = 'image_urls'
-
-# SQLite数据库设置
-DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'feilu_books.db')
-
-# MySQL数据库设置
-MYSQL_HOST = 'localhost'  # MySQL主机地址
-MYSQL_PORT = 3306         # MySQL端口
-MYSQL_DATABASE = 'feilu_books'  # 数据库名称
-MYSQL_USER = 'root'       # 数据库用户名
-MYSQL_PASSWORD = '1234'       # 数据库密码
-MYSQL_CHARSET = 'utf8mb4' # 字符集
-# Enable and configure the AutoThrottle extension (disabled by default)
-# See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
-# The initial download delay
-#AUTOTHROTTLE_START_DELAY = 5
-# The maximum download delay to be set in case of high latencies
-#AUTOTHROTTLE_MAX_DELAY = 60
-# The average number of requests Scrapy should be sending in parallel to
-# each remote server
-#AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
-# Enable showing throttling stats for every response received:
-#AUTOTHROTTLE_DEBUG = False
-
-# Enable and configure HTTP caching (disabled by default)
-# See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
-
-# Set settings whose default value is deprecated to a future-proof value
-TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
-FEED_EXPORT_ENCODING = "utf-8"
+# Scrapy settings for Feilu project
+#
+# For simplicity, this file contains only settings considered important or
+# commonly used. You can find more settings consulting the documentation:
+#
+#     https://docs.scrapy.org/en/latest/topics/settings.html
+#     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
+#     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
+
+BOT_NAME = "Feilu"
+
+SPIDER_MODULES = ["Feilu.spiders"]
+NEWSPIDER_MODULE = "Feilu.spiders"
+
+
+# Crawl responsibly by identifying yourself (and your website) on the user-agent
+#USER_AGENT = "Feilu (+http://www.yourdomain.com)"
+
+# 不遵循robots.txt规则，因为它可能阻止图片下载
+ROBOTSTXT_OBEY = False
+
+# 增加重试次数
+RETRY_TIMES = 5
+RETRY_HTTP_CODES = [500, 502, 503, 504, 408, 403, 404, 429]
+
+# Configure maximum concurrent requests performed by Scrapy (default: 16)
+#CONCURRENT_REQUESTS = 32
+
+# Configure a delay for requests for the same website (default: 0)
+# See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
+# See also autothrottle settings and docs
+#DOWNLOAD_DELAY = 3
+# The download delay setting will honor only one of:
+#CONCURRENT_REQUESTS_PER_DOMAIN = 16
+#CONCURRENT_REQUESTS_PER_IP = 16
+
+# Disable cookies (enabled by default)
+#COOKIES_ENABLED = False
+
+# Disable Telnet Console (enabled by default)
+#TELNETCONSOLE_ENABLED = False
+
+# Override the default request headers:
+#DEFAULT_REQUEST_HEADERS = {
+#    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+#    "Accept-Language": "en",
+#}
+
+# Enable or disable spider middlewares
+# See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
+#SPIDER_MIDDLEWARES = {
+#    "Feilu.middlewares.FeiluSpiderMiddleware": 543,
+#}
+
+# Enable or disable downloader middlewares
+# See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
+#DOWNLOADER_MIDDLEWARES = {
+#    "Feilu.middlewares.FeiluDownloaderMiddleware": 543,
+#}
+
+# Enable or disable extensions
+# See https://docs.scrapy.org/en/latest/topics/extensions.html
+EXTENSIONS = {
+    'Feilu.extensions.FeiluLaneStats': 500,  # 下载通道利用率统计
+    'Feilu.extensions.FeiluProgressStats': 510,  # 向Web应用发布爬取进度
+}
+
+# Configure item pipelines
+# See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
+# 启用图片下载管道、自定义管道和存储管道
+ITEM_PIPELINES = {
+    'Feilu.pipelines.FeiluImagesPipeline': 1,
+    'Feilu.pipelines.FeiluPipeline': 300,
+    'Feilu.storage.FeiluStoragePipeline': 400
+}
+
+# 存储后端：存储管道把每个item同时写入这里列出的所有数据库（sqlite、mysql），各数据库独立批量写入
+STORAGE_BACKENDS = ['mysql']
+STORAGE_RETRY_TIMES = 2        # 锁等待、连接断开等暂时性错误的整批重试次数
+STORAGE_RETRY_DELAY = 1        # 重试前等待的时间（秒）
+
+# 设置图片存储路径 - 使用绝对路径
+import os
+IMAGES_STORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'images')
+
+# 设置用户代理
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# 禁用重定向
+REDIRECT_ENABLED = False
+
+# 设置下载超时时间（HTML页面，图片使用IMAGES_LANE_TIMEOUT）
+DOWNLOAD_TIMEOUT = 180
+
+# 图片下载通道：封面请求使用独立的下载槽位、并发、延迟、超时和排队队列
+IMAGES_LANE_SLOT = 'images'      # 图片下载槽位名称
+IMAGES_LANE_CONCURRENCY = 4      # 图片通道最大并发
+IMAGES_LANE_DELAY = 0.5          # 图片请求之间的延迟（秒）
+IMAGES_LANE_TIMEOUT = 30         # 图片下载超时时间（秒）
+IMAGES_LANE_HTML_RESERVE = 4     # 为HTML页面保留的全局并发数，图片积压时详情页仍可下载
+DOWNLOAD_SLOTS = {
+    IMAGES_LANE_SLOT: {
+        'concurrency': IMAGES_LANE_CONCURRENCY,
+        'delay': IMAGES_LANE_DELAY,
+    },
+}
+LANE_STATS_INTERVAL = 5          # 通道利用率采样间隔（秒），设为0关闭统计
+
+# 爬取进度：每隔PROGRESS_INTERVAL秒向本机UDP端口发布一次进度，Web应用订阅后推送给打开的仪表盘
+PROGRESS_HOST = '127.0.0.1'
+PROGRESS_PORT = 5590
+PROGRESS_INTERVAL = 1            # 发布间隔（秒），设为0关闭
+
+# 封面异步回填：开启后书籍信息立即写入数据库，封面下载完成后再回填images表
+# 未完成的封面可以运行 scrapy crawl covers 补全
+IMAGES_ASYNC_BACKFILL = False
+
+# 设置图片缩略图
+IMAGES_THUMBS = {
+    'small': (50, 50),
+    'medium': (100, 100),
+}
+IMAGES_URLS_FIELD = 'image_urls'
+
+# SQLite数据库设置
+DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'feilu_books.db')
+DATABASE_BATCH_SIZE = 500      # 每批写入的item数量
+DATABASE_FLUSH_INTERVAL = 5    # 缓冲区定时写入间隔（秒），必须大于0
+DATABASE_MAX_INFLIGHT = 2      # 同时排队的最大写入批次数，SQLite在一个线程中依次写入
+
+# 死信文件：重试后仍然写入失败的item追加到这里，用 python manage_db.py replay 重新写入；设为None关闭
+DEAD_LETTER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dead_letters.jsonl')
+
+# MySQL数据库设置
+MYSQL_HOST = 'localhost'  # MySQL主机地址
+MYSQL_PORT = 3306         # MySQL端口
+MYSQL_DATABASE = 'feilu_books'  # 数据库名称
+MYSQL_USER = 'root'       # 数据库用户名
+MYSQL_PASSWORD = '1234'       # 数据库密码
+MYSQL_CHARSET = 'utf8mb4' # 字符集
+MYSQL_POOL_SIZE = 4       # 写入连接池的连接数
+MYSQL_MAX_INFLIGHT = 8    # 同时进行的最大写入批次数，超出后item排队等待，爬虫随之放慢调度
+MYSQL_BATCH_SIZE = 200    # 每批写入的item数量（一条多行INSERT）
+MYSQL_FLUSH_INTERVAL = 2  # 缓冲区定时写入间隔（秒），必须大于0
+# 批量导入模式：适合首次导入或补数据，先写临时文件再LOAD DATA，需要MySQL服务器开启local_infile
+MYSQL_BULK_LOAD = False
+MYSQL_BULK_BATCH_SIZE = 5000
+
+# Web应用（app.py）的数据库连接池
+WEB_DB_POOL_SIZE = 8             # 最大连接数，也是同时执行查询的请求数上限
+WEB_DB_POOL_TIMEOUT = 5          # 连接全部借出时请求最多等待的时间（秒）
+WEB_DB_POOL_RECYCLE = 3600       # 连接使用超过这个时间（秒）后关闭重建，应小于MySQL的wait_timeout
+WEB_DB_POOL_PING_INTERVAL = 30   # 空闲超过这个时间（秒）的连接借出前先检查是否可用
+
+# Web应用的接口响应缓存，数据版本（爬取结束时加一）变化前缓存一直有效
+WEB_CACHE_TTL = 600              # 缓存的最长有效时间（秒）
+WEB_CACHE_MAX_ENTRIES = 256      # 每个进程缓存的最大响应数
+WEB_CACHE_VERSION_INTERVAL = 5   # 查询数据版本的最小间隔（秒）
+WEB_CACHE_SHARED_PATH = None     # 多进程部署时设置为本机文件路径（如 /tmp/feilu_cache.db），各进程共用缓存
+
+# Web应用的接口耗时统计（/metrics）和慢查询日志（/api/metrics/slow_queries）
+WEB_SLOW_QUERY_SECONDS = 0.2     # 执行时间超过这个值（秒）的查询记入慢查询日志
+WEB_SLOW_QUERY_LOG_SIZE = 100    # 保留最近多少条慢查询
+# Enable and configure the AutoThrottle extension (disabled by default)
+# See https://docs.scrapy.org/en/latest/topics/autothrottle.html
+#AUTOTHROTTLE_ENABLED = True
+# The initial download delay
+#AUTOTHROTTLE_START_DELAY = 5
+# The maximum download delay to be set in case of high latencies
+#AUTOTHROTTLE_MAX_DELAY = 60
+# The average number of requests Scrapy should be sending in parallel to
+# each remote server
+#AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
+# Enable showing throttling stats for every response received:
+#AUTOTHROTTLE_DEBUG = False
+
+# Enable and configure HTTP caching (disabled by default)
+# See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
+#HTTPCACHE_ENABLED = True
+#HTTPCACHE_EXPIRATION_SECS = 0
+#HTTPCACHE_DIR = "httpcache"
+#HTTPCACHE_IGNORE_HTTP_CODES = []
+#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+
+# Set settings whose default value is deprecated to a future-proof value
+TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
+FEED_EXPORT_ENCODING = "utf-8"
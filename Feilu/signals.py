@@ -0,0 +1,9 @@
+"""
+项目自定义信号
+
+See documentation in:
+https://docs.scrapy.org/en/latest/topics/signals.html
+"""
+
+# 异步模式下封面下载完成时发送，参数: item (FeiluCoverItem), spider
+cover_downloaded = object()
@@ -0,0 +1,181 @@
+import math
+from collections import Counter
+
+import numpy as np
+from scipy import sparse
+
+from Feilu.search import tokenize
+
+
+class SimilarBooks:
+    """
+    相似书籍的计算
+
+    相似度 = TAG_WEIGHT × 标签集合的Jaccard系数 + (1 - TAG_WEIGHT) × 简介TF-IDF向量的余弦相似度。
+    标签和简介都表示为稀疏矩阵（每本书一行），按行分块与全部书籍相乘，每行只保留最相似的k本，
+    写入similar_books表，接口按主键直接读取。
+
+    rebuild()全量计算；update()只计算还没有记录的新书：新书与全部书籍的相似度算一遍，
+    相似度超过已有书籍第k名（similar_book_state.min_score）的新书同时插入已有书籍的列表，
+    计算量与新书数量乘以书籍总数成正比。
+    """
+    TAG_WEIGHT = 0.5
+    # 每块相似度矩阵的元素个数上限（float32，约80MB）
+    BLOCK_CELLS = 20000000
+    # 单条SQL中IN (...) 参数的最大数量
+    CHUNK_SIZE = 500
+
+    def __init__(self, placeholder='?', k=10):
+        self.placeholder = placeholder
+        self.k = k
+        self.ids = None
+
+    def load(self, cursor):
+        # 读取全部书籍的标签和简介，构建标签矩阵和TF-IDF矩阵
+        cursor.execute('SELECT id, summary FROM books ORDER BY id')
+        books = cursor.fetchall()
+        self.ids = np.array([row[0] for row in books], dtype=np.int64)
+        count = len(books)
+
+        cursor.execute('SELECT book_id, tag_id FROM book_tags')
+        links = np.array(cursor.fetchall(), dtype=np.int64).reshape(-1, 2)
+        positions = np.searchsorted(self.ids, links[:, 0])
+        tags = sparse.csr_matrix(
+            (np.ones(len(links), dtype=np.float32), (positions, links[:, 1])),
+            shape=(count, int(links[:, 1].max()) + 1 if len(links) else 0)
+        )
+        tags.data[:] = 1
+        self.tags = tags
+        self.tag_sizes = np.asarray(tags.sum(axis=1), dtype=np.float32).ravel()
+
+        # 简介按search.tokenize()切分，词频取对数，IDF平滑，每行归一化为单位向量
+        vocabulary = {}
+        indptr, indices, values = [0], [], []
+        for _, summary in books:
+            for token, frequency in Counter(tokenize(summary)).items():
+                indices.append(vocabulary.setdefault(token, len(vocabulary)))
+                values.append(1 + math.log(frequency))
+            indptr.append(len(indices))
+        text = sparse.csr_matrix(
+            (np.array(values, dtype=np.float32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(count, len(vocabulary))
+        )
+        document_frequency = np.bincount(text.indices, minlength=len(vocabulary))
+        text = text @ sparse.diags(np.log((1 + count) / (1 + document_frequency)).astype(np.float32) + 1)
+        norms = np.sqrt(np.asarray(text.multiply(text).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        self.text = sparse.csr_matrix(sparse.diags(1 / norms) @ text, dtype=np.float32)
+        return count
+
+    def scores(self, rows):
+        # rows中的书籍（位置）与全部书籍的相似度，返回 len(rows) × 书籍数 的矩阵，与自身的相似度为0
+        intersection = (self.tags[rows] @ self.tags.T).toarray()
+        union = self.tag_sizes[rows][:, None] + self.tag_sizes[None, :] - intersection
+        jaccard = np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+        cosine = (self.text[rows] @ self.text.T).toarray()
+        scores = self.TAG_WEIGHT * jaccard + (1 - self.TAG_WEIGHT) * cosine
+        scores[np.arange(len(rows)), rows] = 0
+        return scores
+
+    def blocks(self, positions):
+        size = max(1, self.BLOCK_CELLS // max(len(self.ids), 1))
+        for i in range(0, len(positions), size):
+            yield positions[i:i + size]
+
+    def top(self, scores):
+        # 每行最相似的k本: 返回每行的 [(书籍ID, 相似度)]，按相似度从高到低
+        k = min(self.k, scores.shape[1])
+        if not k:
+            return [[] for _ in range(len(scores))]
+        columns = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        result = []
+        for row, top in zip(scores, columns):
+            top = top[np.argsort(-row[top], kind='stable')]
+            result.append([(int(self.ids[j]), round(float(row[j]), 4)) for j in top if row[j] > 0])
+        return result
+
+    def rebuild(self, cursor):
+        """
+        全量计算所有书籍的相似书籍，返回书籍数量
+        """
+        count = self.load(cursor)
+        cursor.execute('DELETE FROM similar_books')
+        cursor.execute('DELETE FROM similar_book_state')
+        for rows in self.blocks(np.arange(count)):
+            self.write(cursor, dict(zip(self.ids[rows].tolist(), self.top(self.scores(rows)))))
+        return count
+
+    def update(self, cursor):
+        """
+        为还没有相似书籍记录的新书计算相似书籍，并更新受影响的已有书籍，返回新书数量
+        """
+        self.load(cursor)
+        cursor.execute('SELECT book_id, min_score FROM similar_book_state')
+        state = dict(cursor.fetchall())
+        computed = np.array([book_id in state for book_id in self.ids.tolist()], dtype=bool)
+        min_scores = np.array([state.get(book_id, 0) for book_id in self.ids.tolist()], dtype=np.float32)
+        new = np.flatnonzero(~computed)
+        existing = np.flatnonzero(computed)
+        if not len(new):
+            return 0
+
+        # 已有书籍 -> 新书中的候选 [(书籍ID, 相似度)]
+        candidates = {}
+        for rows in self.blocks(new):
+            scores = self.scores(rows)
+            self.write(cursor, dict(zip(self.ids[rows].tolist(), self.top(scores))))
+
+            # 每本已有书籍在这一块新书中只取最相似的k本，再与它的第k名比较
+            block = scores[:, existing]
+            if len(rows) > self.k:
+                best = np.argpartition(-block, self.k - 1, axis=0)[:self.k]
+            else:
+                best = np.broadcast_to(np.arange(len(rows))[:, None], block.shape)
+            best_scores = np.take_along_axis(block, best, axis=0)
+            for i, j in zip(*np.nonzero(best_scores > min_scores[existing][None, :])):
+                candidates.setdefault(int(self.ids[existing[j]]), []).append(
+                    (int(self.ids[rows[best[i, j]]]), round(float(best_scores[i, j]), 4))
+                )
+
+        # 合并已有书籍原来的列表和新的候选
+        affected = sorted(candidates)
+        current = self.fetch(cursor, affected)
+        merged = {}
+        for book_id in affected:
+            neighbours = dict(current.get(book_id, []))
+            neighbours.update(candidates[book_id])
+            merged[book_id] = sorted(neighbours.items(), key=lambda item: -item[1])[:self.k]
+        self.write(cursor, merged)
+        return len(new)
+
+    def fetch(self, cursor, book_ids):
+        # 返回 {书籍ID: [(相似书籍ID, 相似度)]}
+        neighbours = {}
+        for i in range(0, len(book_ids), self.CHUNK_SIZE):
+            chunk = book_ids[i:i + self.CHUNK_SIZE]
+            placeholders = ', '.join([self.placeholder] * len(chunk))
+            cursor.execute(
+                f'SELECT book_id, similar_id, score FROM similar_books WHERE book_id IN ({placeholders})', chunk
+            )
+            for book_id, similar_id, score in cursor.fetchall():
+                neighbours.setdefault(book_id, []).append((similar_id, score))
+        return neighbours
+
+    def write(self, cursor, neighbours):
+        # 整体替换这些书籍的相似书籍列表，记录第k名的相似度（不足k本时为0）
+        book_ids = sorted(neighbours)
+        p = self.placeholder
+        for i in range(0, len(book_ids), self.CHUNK_SIZE):
+            chunk = book_ids[i:i + self.CHUNK_SIZE]
+            cursor.execute(f"DELETE FROM similar_books WHERE book_id IN ({', '.join([p] * len(chunk))})", chunk)
+        cursor.executemany(
+            f'INSERT INTO similar_books (book_id, similar_id, score) VALUES ({p}, {p}, {p})',
+            [(book_id, similar_id, score) for book_id in book_ids for similar_id, score in neighbours[book_id]]
+        )
+        cursor.executemany(
+            f'REPLACE INTO similar_book_state (book_id, min_score) VALUES ({p}, {p})',
+            [
+                (book_id, neighbours[book_id][-1][1] if len(neighbours[book_id]) >= self.k else 0)
+                for book_id in book_ids
+            ]
+        )
@@ -0,0 +1,73 @@
+import sqlite3
+
+import pymysql
+import scrapy
+from Feilu.items import FeiluCoverItem
+
+
+class CoversSpider(scrapy.Spider):
+    """
+    补全未完成的封面下载
+
+    从数据库中找出image_path为空的images记录，重新下载封面并回填。
+    用法: scrapy crawl covers [-a backend=mysql|sqlite] [-a limit=1000]
+    """
+    name = "covers"
+    allowed_domains = ["img.faloo.com"]
+
+    custom_settings = {
+        # 补全任务需要等封面下载完成后再交给数据库管道回填
+        'IMAGES_ASYNC_BACKFILL': False,
+    }
+
+    def __init__(self, backend=None, limit=1000, *args, **kwargs):
+        super(CoversSpider, self).__init__(*args, **kwargs)
+        self.backend = backend
+        self.limit = int(limit)
+
+    def start_requests(self):
+        # 待补全的封面直接从数据库读取，这里只需要一个本地请求来触发parse
+        yield scrapy.Request('data:,', callback=self.parse, dont_filter=True)
+
+    def parse(self, response):
+        pending = self.load_pending_covers()
+        self.logger.info(f"待补全的封面数量: {len(pending)}")
+
+        for book_url, title, image_url in pending:
+            yield FeiluCoverItem(book_url=book_url, title=title, image_urls=[image_url])
+
+    def load_pending_covers(self):
+        settings = self.settings
+        backend = self.backend
+        if backend is None:
+            # 默认使用已启用的存储后端
+            backend = 'mysql' if 'mysql' in settings.getlist('STORAGE_BACKENDS', ['mysql']) else 'sqlite'
+
+        query = '''
+            SELECT b.book_url, b.title, i.image_url
+            FROM images i
+            JOIN books b ON b.id = i.book_id
+            WHERE (i.image_path IS NULL OR i.image_path = '')
+              AND i.image_url IS NOT NULL AND i.image_url != ''
+            LIMIT {}
+        '''
+        if backend == 'mysql':
+            conn = pymysql.connect(
+                host=settings.get('MYSQL_HOST', 'localhost'),
+                port=settings.getint('MYSQL_PORT', 3306),
+                user=settings.get('MYSQL_USER', 'root'),
+                password=settings.get('MYSQL_PASSWORD', ''),
+                database=settings.get('MYSQL_DATABASE', 'feilu_books'),
+                charset=settings.get('MYSQL_CHARSET', 'utf8mb4')
+            )
+            query = query.format('%s')
+        else:
+            conn = sqlite3.connect(settings.get('DATABASE_PATH'))
+            query = query.format('?')
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, (self.limit,))
+            return cursor.fetchall()
+        finally:
+            conn.close()
@@ -0,0 +1,654 @@
+"""
+存储层
+
+- Dialect: SQLite和MySQL在写入语句上的差异（占位符、INSERT IGNORE、upsert语法、标识符引号）
+- BookRecord / CoverRecord: item进入存储层时只整理一次（内容哈希、数值列、标签、图片），
+  之后写入每个数据库都直接使用
+- StorageBackend: 书籍、标签、图片、汇总表和指标历史的写入逻辑，SQLite和MySQL共用，
+  具体的连接、建表和事务执行方式由db_pipeline.py和mysql_pipeline.py中的子类提供
+- StorageSink: 每个数据库一个写入队列，各自按批写入、重试，并记录写入延迟等统计
+- FeiluStoragePipeline: Scrapy管道，每个item整理一次后同时放入所有数据库的写入队列
+"""
+
+import time
+
+from itemadapter import ItemAdapter
+from scrapy.utils.misc import load_object
+from twisted.internet import defer, reactor, task
+
+from Feilu import data_version
+from Feilu.aggregates import AggregateDelta, DashboardAggregates
+from Feilu.dead_letter import DeadLetterStore
+from Feilu.items import FeiluCoverItem
+from Feilu.metrics import MetricsDelta, MetricsStore, encode_metrics
+from Feilu.normalize import NUMERIC_COLUMNS, content_hash, numeric_values, parse_rating
+from Feilu.signals import cover_downloaded
+from Feilu.tag_cache import TagCache
+
+
+class Dialect:
+    """
+    数据库方言，生成写入时用到的SQL片段
+    """
+    def __init__(self, name, label, placeholder, insert_ignore, quote, new_value, old_value):
+        self.name = name
+        # 日志中显示的名称
+        self.label = label
+        self.placeholder = placeholder
+        self.insert_ignore = insert_ignore
+        self._quote = quote
+        # upsert的更新部分中引用新值、旧值的写法
+        self._new_value = new_value
+        self._old_value = old_value
+
+    def quote(self, name):
+        return self._quote.format(name)
+
+    def placeholders(self, count):
+        return ', '.join([self.placeholder] * count)
+
+    def upsert(self, table, columns, key, updates, select=None):
+        """
+        按唯一键key插入或更新的语句
+
+        updates为 {列: 表达式}，表达式中的{new}、{old}分别表示该列的新值和旧值；
+        select不为空时用 INSERT ... SELECT 代替 VALUES (...)
+        """
+        q = self.quote
+        source = select or f'VALUES ({self.placeholders(len(columns))})'
+        assignments = ', '.join(
+            f'{q(column)} = ' + expression.format(
+                new=self._new_value.format(column=q(column)),
+                old=self._old_value.format(table=q(table), column=q(column))
+            )
+            for column, expression in updates.items()
+        )
+        sql = f"INSERT INTO {q(table)} ({', '.join(q(column) for column in columns)}) {source} "
+        if self.name == 'mysql':
+            return sql + f'ON DUPLICATE KEY UPDATE {assignments}'
+        return sql + f"ON CONFLICT ({', '.join(q(column) for column in key)}) DO UPDATE SET {assignments}"
+
+
+SQLITE = Dialect('sqlite', 'SQLite', '?', 'INSERT OR IGNORE', '{}', 'excluded.{column}', '{table}.{column}')
+MYSQL = Dialect('mysql', 'MySQL', '%s', 'INSERT IGNORE', '`{}`', 'VALUES({column})', '{column}')
+
+
+# books表中由item写入的列，book_url是唯一键
+BOOK_COLUMNS = (
+    'title', 'author', 'monthly_clicks', 'word_count', 'summary',
+    'book_url', 'flowers', 'rating', 'rewards',
+)
+WRITE_COLUMNS = BOOK_COLUMNS + tuple(column for column, _ in NUMERIC_COLUMNS.values()) + ('content_hash',)
+
+
+class BookRecord:
+    """
+    整理好的书籍item，写入多个数据库时只计算一次
+    """
+    __slots__ = ('item', 'book_url', 'digest', 'row', 'author', 'rating', 'metrics', 'search_text', 'tags', 'images')
+
+    def __init__(self, item):
+        adapter = ItemAdapter(item)
+        self.item = item
+        self.book_url = adapter.get('book_url', '')
+        self.digest = content_hash(adapter)
+        numeric = numeric_values(adapter)
+        # 原始文本、转换后的数值和内容哈希，顺序与WRITE_COLUMNS一致
+        self.row = tuple(adapter.get(column, '') for column in BOOK_COLUMNS) + numeric + (self.digest,)
+        self.author = adapter.get('author')
+        self.rating = parse_rating(adapter.get('rating'))
+        self.metrics = encode_metrics(numeric)
+        self.search_text = (adapter.get('title', ''), adapter.get('author', ''), adapter.get('summary', ''))
+        self.tags = [tag for tag in adapter.get('tags') or [] if tag]
+        # 尚未下载完成的封面只有url，image_path为None等待回填
+        downloaded = {
+            image_info.get('url'): image_info.get('path')
+            for image_info in adapter.get('images') or [] if isinstance(image_info, dict)
+        }
+        self.images = [(image_url, downloaded.get(image_url)) for image_url in adapter.get('image_urls') or []]
+
+
+class CoverRecord:
+    """
+    整理好的封面回填item
+    """
+    __slots__ = ('item', 'book_url', 'images')
+
+    def __init__(self, item):
+        adapter = ItemAdapter(item)
+        self.item = item
+        self.book_url = adapter.get('book_url', '')
+        self.images = [(image_info.get('url'), image_info.get('path')) for image_info in adapter.get('images') or []]
+
+
+def prepare(item):
+    # 封面item只回填图片信息，不改动书籍记录
+    return CoverRecord(item) if isinstance(item, FeiluCoverItem) else BookRecord(item)
+
+
+class StorageBackend:
+    """
+    数据库写入逻辑，子类设置dialect并实现open()、run()，需要时扩展shutdown()
+
+    run(fn, *args)在线程中开启事务执行fn(cursor, *args)，成功时提交，异常时回滚，返回Deferred；
+    标签缓存在连接提交或回滚之后随之提交或回滚，提交失败时不会留下数据库中不存在的标签ID。
+    内容哈希没有变化的书籍直接跳过，只补写这次下载成功的封面路径，重复爬取时只写入有变化的书籍。
+    """
+    dialect = None
+    # 写入队列的参数，由子类的from_settings()根据设置填写
+    batch_size = 500
+    flush_interval = 5
+    max_inflight = 1
+    # 可以整批重试的暂时性错误（锁等待、连接断开等），其他错误改为逐条写入
+    TRANSIENT_ERRORS = ()
+    # 单条SQL中IN (...) 参数的最大数量
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def flush_interval_setting(settings, name, default):
+        # 缓冲区必须定时写入：Scrapy同时处理的item数量（CONCURRENT_ITEMS）可能小于batch_size，
+        # 没有定时写入时缓冲区可能永远攒不满一个批次
+        interval = settings.getfloat(name, default)
+        if interval <= 0:
+            raise ValueError(f"{name} 必须大于0，当前为 {interval}")
+        return interval
+
+    def __init__(self):
+        self.conn = None
+        self.cursor = None
+        self.tag_cache = TagCache(placeholder=self.dialect.placeholder, insert_ignore=self.dialect.insert_ignore)
+        self.aggregates = DashboardAggregates(placeholder=self.dialect.placeholder, dialect=self.dialect.name)
+        self.metrics = MetricsStore(placeholder=self.dialect.placeholder, dialect=self.dialect.name)
+        # 全文检索索引，只有需要在写入时自行维护的数据库（SQLite）才设置
+        self.search_index = None
+        # 本次爬取在指标历史中的分区ID
+        self.crawl_id = None
+
+    def write_batch(self, cursor, records):
+        # 在事务中写入一个批次，返回内容没有变化而跳过的书籍数量
+        books = [record for record in records if isinstance(record, BookRecord)]
+        covers = [record for record in records if isinstance(record, CoverRecord)]
+        unchanged = 0
+        if books:
+            unchanged = self.write_books(cursor, books)
+        if covers:
+            self.write_covers(cursor, covers)
+        return unchanged
+
+    def write_items(self, items, pending=None):
+        # 用同步连接写入一组书籍item（维护脚本和测试使用），事务由调用方提交
+        return self.write_books(self.cursor, [BookRecord(item) for item in items], pending)
+
+    def upsert_books(self, cursor, rows):
+        # 插入或整行更新书籍，MySQL的executemany会合并成一条多行INSERT，更新部分引用新值，每个值只绑定一次
+        cursor.executemany(self.dialect.upsert('books', WRITE_COLUMNS, ('book_url',), {
+            column: '{new}' for column in WRITE_COLUMNS if column != 'book_url'
+        }), rows)
+
+    def write_books(self, cursor, records, pending=None):
+        # 写入书籍及其标签、图片，返回内容没有变化而跳过的书籍数量
+        existing = self.fetch_books(cursor, [record.book_url for record in records])
+
+        # 1. 对比内容哈希，只有新书和内容有变化的书需要写入；同一批次中同一本书只保留最后一条
+        changed = {}
+        for record in records:
+            current = existing.get(record.book_url)
+            if current is None or current[1] != record.digest:
+                changed[record.book_url] = record
+            else:
+                changed.pop(record.book_url, None)
+        changed = list(changed.values())
+
+        # 内容没有变化的书籍不再写入，但这次下载成功的封面路径仍要写入：
+        # 封面路径不参与内容哈希，同步下载模式下上次下载失败的封面只能在重复爬取时补上
+        changed_urls = {record.book_url for record in changed}
+        images = [
+            (existing[record.book_url][0], image_url, image_path)
+            for record in records if record.book_url not in changed_urls
+            for image_url, image_path in record.images if image_path
+        ]
+        if not changed:
+            self.upsert_images(cursor, images)
+            return len(records)
+
+        self.upsert_books(cursor, [record.row for record in changed])
+
+        # 获取新书的ID
+        book_ids = {book_url: row[0] for book_url, row in existing.items()}
+        new_urls = [record.book_url for record in changed if record.book_url not in book_ids]
+        if new_urls:
+            book_ids.update((book_url, row[0]) for book_url, row in self.fetch_books(cursor, new_urls).items())
+
+        # 2. 通过缓存批量获取本批所有标签的ID
+        tag_ids = self.tag_cache.resolve(cursor, [tag for record in changed for tag in record.tags], pending)
+
+        # 汇总表的增量：先减去书籍原来的作者和评分，再加上新值
+        delta = AggregateDelta()
+        book_tags = set()
+        for record in changed:
+            book_id = book_ids.get(record.book_url)
+            if book_id is None:
+                raise ValueError(f"无法确定书籍ID, book_url: {record.book_url}")
+
+            if record.book_url in existing:
+                delta.remove_book(existing[record.book_url][2], existing[record.book_url][3])
+            delta.add_book(record.author, record.rating)
+
+            book_tags.update((book_id, tag_ids[tag]) for tag in record.tags if tag in tag_ids)
+            # 3. 图片：尚未下载完成的封面只记录url，image_path留空等待回填
+            images.extend((book_id, image_url, image_path) for image_url, image_path in record.images)
+
+        # 书籍和标签的关联只插入新增的部分，并计入标签书籍数
+        q = self.dialect.quote
+        old_links = self.fetch_book_tags(cursor, [existing[record.book_url][0] for record in changed
+                                                  if record.book_url in existing])
+        book_tags -= old_links
+        if book_tags:
+            cursor.executemany(
+                f"{self.dialect.insert_ignore} INTO {q('book_tags')} ({q('book_id')}, {q('tag_id')}) "
+                f"VALUES ({self.dialect.placeholders(2)})",
+                sorted(book_tags)
+            )
+        delta.add_tag_links(tag_id for _, tag_id in book_tags)
+        self.aggregates.apply(cursor, delta)
+
+        # 更新全文检索索引
+        if self.search_index is not None:
+            self.search_index.apply(cursor, [
+                (book_ids[record.book_url],) + record.search_text for record in changed
+            ])
+
+        # 记录指标变化
+        if self.crawl_id is not None:
+            self.record_metrics(cursor, changed, existing, book_ids, old_links, book_tags)
+
+        self.upsert_images(cursor, images)
+        return len(records) - len(changed)
+
+    def upsert_images(self, cursor, images):
+        # 图片按(book_id, image_url)去重，已下载的路径不会被空值覆盖
+        if images:
+            cursor.executemany(self.dialect.upsert(
+                'images', ('book_id', 'image_url', 'image_path'), ('book_id', 'image_url'),
+                {'image_path': 'COALESCE({new}, {old})'}
+            ), images)
+
+    def record_metrics(self, cursor, changed, existing, book_ids, old_links, new_links):
+        # 与books表中的旧值比较，只记录发生变化的指标
+        old_tags = {}
+        for book_id, tag_id in old_links:
+            old_tags.setdefault(book_id, []).append(tag_id)
+        new_tags = {}
+        for book_id, tag_id in new_links:
+            new_tags.setdefault(book_id, []).append(tag_id)
+
+        delta = MetricsDelta()
+        for record in changed:
+            book_id = book_ids[record.book_url]
+            old = encode_metrics(existing[record.book_url][4:]) if record.book_url in existing else None
+            delta.add_book(book_id, old, record.metrics, old_tags.get(book_id, ()), new_tags.get(book_id, ()))
+        self.metrics.record(cursor, self.crawl_id, delta)
+
+    def fetch_books(self, cursor, book_urls):
+        # 返回 {book_url: (书籍ID, 内容哈希, 作者, 评分, 各数值列)}
+        q = self.dialect.quote
+        columns = ['id', 'book_url', 'content_hash', 'author', 'rating_num'] + [
+            column for column, _ in NUMERIC_COLUMNS.values()
+        ]
+        books = {}
+        book_urls = list(set(book_urls))
+        for i in range(0, len(book_urls), self.CHUNK_SIZE):
+            chunk = book_urls[i:i + self.CHUNK_SIZE]
+            cursor.execute(
+                f"SELECT {', '.join(q(column) for column in columns)} FROM {q('books')} "
+                f"WHERE {q('book_url')} IN ({self.dialect.placeholders(len(chunk))})",
+                chunk
+            )
+            books.update((row[1], (row[0],) + tuple(row[2:])) for row in cursor.fetchall())
+        return books
+
+    def fetch_book_tags(self, cursor, book_ids):
+        # 返回这些书籍已有的 (book_id, tag_id) 关联
+        q = self.dialect.quote
+        book_tags = set()
+        for i in range(0, len(book_ids), self.CHUNK_SIZE):
+            chunk = book_ids[i:i + self.CHUNK_SIZE]
+            cursor.execute(
+                f"SELECT {q('book_id')}, {q('tag_id')} FROM {q('book_tags')} "
+                f"WHERE {q('book_id')} IN ({self.dialect.placeholders(len(chunk))})",
+                chunk
+            )
+            book_tags.update(tuple(row) for row in cursor.fetchall())
+        return book_tags
+
+    def write_covers(self, cursor, covers):
+        # 回填封面路径，没有对应images记录时补充插入
+        q = self.dialect.quote
+        p = self.dialect.placeholder
+        cursor.executemany(
+            self.dialect.upsert(
+                'images', ('book_id', 'image_url', 'image_path'), ('book_id', 'image_url'), {'image_path': '{new}'},
+                select=f"SELECT {q('id')}, {p}, {p} FROM {q('books')} WHERE {q('book_url')} = {p}"
+            ),
+            [(image_url, image_path, cover.book_url) for cover in covers for image_url, image_path in cover.images]
+        )
+
+    def finish_crawl(self, cursor):
+        # 爬取结束，数据版本加一通知Web应用刷新
+        if self.crawl_id is not None:
+            self.metrics.finish_crawl(cursor, self.crawl_id)
+        data_version.bump(cursor)
+
+    def describe(self):
+        # 日志中显示的数据库名称
+        return self.dialect.label
+
+    def shutdown(self):
+        # 所有写入完成后关闭连接，子类先关闭自己的写入线程或连接池
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+            self.cursor = None
+
+
+class StorageSink:
+    """
+    一个数据库的写入队列
+
+    记录先放入缓冲区，每满batch_size条或每隔flush_interval秒作为一个批次交给backend.run()写入，
+    同时进行的批次数量受max_inflight限制，同一本书的写入按顺序执行。
+    整批写入遇到暂时性错误时等待retry_delay秒后整批重试，其他错误或重试次数用完后逐条写入，
+    仍然失败的记录写入死信文件（dead_letters），之后可以用 python manage_db.py replay 重新写入。
+    记录从进入队列到提交的时间为写入延迟，与其他统计一起记录在 storage/<数据库>/* 中。
+    """
+    def __init__(self, backend, stats=None, retry_times=2, retry_delay=1, dead_letters=None):
+        self.backend = backend
+        self.name = backend.dialect.name
+        self.stats = stats
+        self.retry_times = retry_times
+        self.retry_delay = retry_delay
+        self.dead_letters = dead_letters
+        # 缓冲区中的 (记录, Deferred, 进入队列的时间)，Deferred在记录提交后触发
+        self.buffer = []
+        self.flush_task = None
+        self.write_limiter = defer.DeferredSemaphore(backend.max_inflight)
+        # 每本书最近一次写入完成时触发的Deferred，用于保证同一本书的写入顺序
+        self.book_writes = {}
+        # 正在进行的批次
+        self.writes = set()
+        self.success_count = 0
+        self.failed_count = 0
+        self.batch_count = 0
+        self.unchanged_count = 0
+        self.retry_count = 0
+        self.dead_letter_count = 0
+        self.inflight = 0
+        self.max_inflight_seen = 0
+        self.saturated_count = 0
+        self.lag_total = 0
+        self.lag_max = 0
+        self.lag_count = 0
+
+    def open(self, spider):
+        self.backend.open(spider)
+        # 定时写入缓冲区中的数据，避免爬取较慢时记录长时间停留在内存中
+        self.flush_task = task.LoopingCall(self.flush, spider)
+        self.flush_task.start(self.backend.flush_interval, now=False)
+
+    @property
+    def saturated(self):
+        # 所有写入名额都被占用
+        return self.write_limiter.tokens == 0
+
+    def wait_for_slot(self):
+        # 等到有写入名额空出（排在已经等待的批次之后），不等这条记录所在的批次提交：
+        # 批次要等缓冲区满或定时写入才会开始，而缓冲区要等item继续进来才会满
+        dfd = self.write_limiter.acquire()
+        dfd.addCallback(lambda limiter: limiter.release())
+        return dfd
+
+    def enqueue(self, record, spider):
+        dfd = defer.Deferred()
+        self.buffer.append((record, dfd, time.time()))
+        if len(self.buffer) >= self.backend.batch_size:
+            self.flush(spider)
+        return dfd
+
+    def flush(self, spider):
+        # 将缓冲区中的数据作为一个批次写入
+        entries, self.buffer = self.buffer, []
+        if not entries:
+            return defer.succeed(None)
+
+        # 等本批所有书籍的上一次写入完成后，再排队获取写入名额
+        book_urls = {record.book_url for record, _, _ in entries}
+        done = defer.Deferred()
+        waiting = defer.DeferredList([self._after_previous_write(book_url) for book_url in book_urls])
+        for book_url in book_urls:
+            self.book_writes[book_url] = done
+
+        self.inflight += 1
+        self.max_inflight_seen = max(self.max_inflight_seen, self.inflight)
+        if self.saturated:
+            self.saturated_count += 1
+        self._update_stats()
+
+        records = [record for record, _, _ in entries]
+        started = time.time()
+        dfd = waiting.addCallback(lambda _: self._write(records, spider))
+        dfd.addCallbacks(self._batch_succeeded, self._batch_failed,
+                         callbackArgs=(entries, started, spider), errbackArgs=(entries, spider))
+        dfd.addBoth(self._write_finished, book_urls, done)
+        self.writes.add(done)
+        return dfd
+
+    def _after_previous_write(self, book_url):
+        waiting = defer.Deferred()
+        previous = self.book_writes.get(book_url)
+        if previous is None:
+            waiting.callback(None)
+        else:
+            def _resume(result):
+                waiting.callback(None)
+                return result
+            previous.addBoth(_resume)
+        return waiting
+
+    def _write(self, records, spider, attempt=0):
+        # 获取写入名额后在一个事务中写入，暂时性错误整批重试
+        dfd = self.write_limiter.run(self.backend.run, self.backend.write_batch, records)
+
+        def _retry(failure):
+            if attempt >= self.retry_times or not failure.check(*self.backend.TRANSIENT_ERRORS):
+                return failure
+            self.retry_count += 1
+            self._update_stats()
+            spider.logger.warning(
+                f"写入{self.backend.describe()}数据库遇到暂时性错误，{self.retry_delay} 秒后重试"
+                f"（第 {attempt + 1} 次）: {str(failure.value)}"
+            )
+            return task.deferLater(reactor, self.retry_delay, self._write, records, spider, attempt + 1)
+        return dfd.addErrback(_retry)
+
+    def _batch_succeeded(self, unchanged, entries, started, spider):
+        books = [record for record, _, _ in entries if isinstance(record, BookRecord)]
+        self.success_count += len(books)
+        self.unchanged_count += unchanged
+        self.batch_count += 1
+        spider.logger.info(
+            f"批量写入{self.backend.describe()}数据库: 书籍 {len(books)} 条（未变化 {unchanged} 条）, "
+            f"封面 {len(entries) - len(books)} 条, 耗时 {time.time() - started:.3f} 秒"
+        )
+        for record, dfd, enqueued_at in entries:
+            self._record_lag(enqueued_at)
+            dfd.callback(record)
+
+    def _batch_failed(self, failure, entries, spider):
+        # 整批写入失败（事务已回滚），逐条重试以跳过有问题的记录
+        spider.logger.warning(f"批量写入{self.backend.describe()}数据库失败，改为逐条重试: {str(failure.value)}")
+        retries = []
+        for record, dfd, enqueued_at in entries:
+            retry = self._write([record], spider)
+            retry.addCallbacks(self._write_succeeded, self._write_failed,
+                               callbackArgs=(record, enqueued_at), errbackArgs=(record, spider))
+            retry.chainDeferred(dfd)
+            retries.append(retry)
+        return defer.DeferredList(retries)
+
+    def _write_succeeded(self, unchanged, record, enqueued_at):
+        if isinstance(record, BookRecord):
+            self.success_count += 1
+            self.unchanged_count += unchanged
+        self._record_lag(enqueued_at)
+        return record
+
+    def _write_failed(self, failure, record, spider):
+        if isinstance(record, BookRecord):
+            self.failed_count += 1
+            message = f"保存到{self.backend.describe()}数据库失败: {str(failure.value)}, book_url: {record.book_url}"
+        else:
+            message = f"回填封面到{self.backend.describe()}数据库失败: {str(failure.value)}, book_url: {record.book_url}"
+        if self.dead_letters is None:
+            spider.logger.error(f"{message}, item: {record.item}")
+            return record
+
+        try:
+            self.dead_letters.append(record.item, self.name, failure.value, self.backend.crawl_id)
+            self.dead_letter_count += 1
+            self._update_stats()
+            spider.logger.error(f"{message}，已写入死信文件")
+        except Exception as e:
+            spider.logger.error(f"{message}, item: {record.item}")
+            spider.logger.error(f"写入死信文件失败: {str(e)}")
+        return record
+
+    def _write_finished(self, result, book_urls, done):
+        self.inflight -= 1
+        self._update_stats()
+        for book_url in book_urls:
+            if self.book_writes.get(book_url) is done:
+                del self.book_writes[book_url]
+        self.writes.discard(done)
+        done.callback(None)
+        return result
+
+    def _record_lag(self, enqueued_at):
+        lag = time.time() - enqueued_at
+        self.lag_total += lag
+        self.lag_count += 1
+        self.lag_max = max(self.lag_max, lag)
+
+    def _update_stats(self):
+        if self.stats:
+            prefix = f'storage/{self.name}'
+            self.stats.set_value(f'{prefix}/inflight', self.inflight)
+            self.stats.max_value(f'{prefix}/inflight_max', self.inflight)
+            self.stats.max_value(f'{prefix}/waiting_max', len(self.write_limiter.waiting))
+            self.stats.set_value(f'{prefix}/saturated_count', self.saturated_count)
+            self.stats.set_value(f'{prefix}/retry_count', self.retry_count)
+            self.stats.set_value(f'{prefix}/dead_letters', self.dead_letter_count)
+            self.stats.set_value(f'{prefix}/lag_max', round(self.lag_max, 3))
+            self.stats.set_value(f'{prefix}/lag_sum', self.lag_total)
+            self.stats.set_value(f'{prefix}/lag_count', self.lag_count)
+            if self.lag_count:
+                self.stats.set_value(f'{prefix}/lag_avg', round(self.lag_total / self.lag_count, 3))
+
+    def close(self, spider):
+        # 写入剩余数据，等待所有写入完成后结束本次爬取并关闭连接
+        if self.flush_task and self.flush_task.running:
+            self.flush_task.stop()
+        self.flush(spider)
+        dfd = defer.DeferredList(list(self.writes))
+        dfd.addCallback(lambda _: self.backend.run(self.backend.finish_crawl))
+        dfd.addErrback(lambda failure: spider.logger.error(
+            f"{self.backend.describe()}数据库结束爬取记录失败: {str(failure.value)}"
+        ))
+        dfd.addBoth(lambda _: self._shutdown(spider))
+        return dfd
+
+    def _shutdown(self, spider):
+        self._update_stats()
+        spider.logger.info(f"========== {self.backend.describe()}数据库存储统计 ==========")
+        spider.logger.info(f"成功存储记录: {self.success_count}")
+        spider.logger.info(f"存储失败记录: {self.failed_count}")
+        spider.logger.info(f"内容未变化跳过: {self.unchanged_count}")
+        spider.logger.info(f"批量写入次数: {self.batch_count}")
+        spider.logger.info(f"暂时性错误重试次数: {self.retry_count}")
+        if self.dead_letter_count:
+            spider.logger.info(f"写入死信文件: {self.dead_letter_count} 条（{self.dead_letters.path}）")
+        else:
+            spider.logger.info("写入死信文件: 0 条")
+        spider.logger.info(f"最大同时写入批次: {self.max_inflight_seen}")
+        spider.logger.info(f"写入名额饱和次数: {self.saturated_count}")
+        if self.lag_count:
+            spider.logger.info(
+                f"写入延迟: 平均 {self.lag_total / self.lag_count:.3f} 秒, 最大 {self.lag_max:.3f} 秒"
+            )
+        spider.logger.info("==========================================")
+        self.backend.shutdown()
+        spider.logger.info(f"{self.backend.describe()}数据库连接已关闭")
+
+
+class FeiluStoragePipeline:
+    """
+    将爬取的数据写入STORAGE_BACKENDS中的所有数据库
+
+    每个item只整理一次，放入每个数据库的写入队列后立即返回，各数据库在自己的线程中并发写入，
+    增加一个数据库不会增加item的处理时间。只有某个数据库的写入名额全部占用时，
+    item才等待该数据库空出写入名额，形成背压使Scrapy放慢调度。
+    """
+    BACKENDS = {
+        'sqlite': 'Feilu.db_pipeline.FeiluDatabasePipeline',
+        'mysql': 'Feilu.mysql_pipeline.FeiluMySQLPipeline',
+    }
+
+    def __init__(self, sinks, dead_letters=None):
+        self.sinks = sinks
+        self.dead_letters = dead_letters
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        # 所有数据库共用一个死信文件，每条记录注明数据库
+        path = settings.get('DEAD_LETTER_PATH')
+        dead_letters = DeadLetterStore(path) if path else None
+        sinks = []
+        for name in settings.getlist('STORAGE_BACKENDS', ['mysql']):
+            if name not in cls.BACKENDS:
+                raise ValueError(f"未知的存储后端: {name}，可选: {', '.join(cls.BACKENDS)}")
+            backend = load_object(cls.BACKENDS[name]).from_settings(settings)
+            sinks.append(StorageSink(
+                backend,
+                stats=crawler.stats,
+                retry_times=settings.getint('STORAGE_RETRY_TIMES', 2),
+                retry_delay=settings.getfloat('STORAGE_RETRY_DELAY', 1),
+                dead_letters=dead_letters,
+            ))
+        pipeline = cls(sinks, dead_letters)
+        # 异步回填模式下，封面下载结果通过信号到达
+        crawler.signals.connect(pipeline.cover_downloaded, signal=cover_downloaded)
+        return pipeline
+
+    def open_spider(self, spider):
+        for sink in self.sinks:
+            sink.open(spider)
+        spider.logger.info(f"存储后端: {', '.join(sink.backend.describe() for sink in self.sinks)}")
+
+    def cover_downloaded(self, item, spider):
+        self.process_item(item, spider)
+
+    def process_item(self, item, spider):
+        record = prepare(item)
+        waiting = []
+        for sink in self.sinks:
+            sink.enqueue(record, spider)
+            if sink.saturated:
+                waiting.append(sink.wait_for_slot())
+        if not waiting:
+            return item
+        dfd = defer.DeferredList(waiting)
+        dfd.addCallback(lambda _: item)
+        return dfd
+
+    def close_spider(self, spider):
+        return defer.DeferredList([sink.close(spider) for sink in self.sinks])
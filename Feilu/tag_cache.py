@@ -0,0 +1,82 @@
+import threading
+
+
+class TagCache:
+    """
+    标签名到标签ID的内存缓存
+
+    爬虫启动时一次性加载tags表，之后只有新出现的标签才需要访问数据库，
+    并且新标签按批插入和查询。事务提交后调用commit()，回滚后调用rollback()丢弃本次事务中新增的ID。
+    没有传入pending集合时使用当前线程的集合，每个线程同时只执行一个事务（SQLite写入线程、MySQL连接池线程）。
+    """
+    # 单条SQL中IN (...) 参数的最大数量
+    CHUNK_SIZE = 500
+
+    def __init__(self, placeholder='?', insert_ignore='INSERT OR IGNORE'):
+        self.insert_sql = f'{insert_ignore} INTO tags (name) VALUES ({placeholder})'
+        self.select_sql = 'SELECT id, name FROM tags WHERE name IN ({})'
+        self.placeholder = placeholder
+        self.ids = {}
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    @property
+    def pending(self):
+        # 当前线程的事务中新增的标签
+        if not hasattr(self.local, 'pending'):
+            self.local.pending = set()
+        return self.local.pending
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self, cursor):
+        cursor.execute('SELECT id, name FROM tags')
+        with self.lock:
+            self.ids = {name: tag_id for tag_id, name in cursor.fetchall()}
+            self.pending.clear()
+
+    def resolve(self, cursor, names, pending=None):
+        # 返回 {标签名: 标签ID}，缓存中没有的标签批量插入后再批量查询
+        pending = self.pending if pending is None else pending
+        names = {name for name in names if name}
+        with self.lock:
+            missing = sorted(name for name in names if name not in self.ids)
+        if missing:
+            found = {}
+            cursor.executemany(self.insert_sql, [(name,) for name in missing])
+            for i in range(0, len(missing), self.CHUNK_SIZE):
+                chunk = missing[i:i + self.CHUNK_SIZE]
+                placeholders = ', '.join([self.placeholder] * len(chunk))
+                cursor.execute(self.select_sql.format(placeholders), chunk)
+                for tag_id, name in cursor.fetchall():
+                    found[name] = tag_id
+
+            # MySQL按排序规则比较，大小写等不同写法会命中同一行，这类标签单独查询
+            for name in missing:
+                if name not in found:
+                    cursor.execute(f'SELECT id FROM tags WHERE name = {self.placeholder}', (name,))
+                    row = cursor.fetchone()
+                    if row:
+                        found[name] = row[0]
+
+            with self.lock:
+                for name, tag_id in found.items():
+                    if name not in self.ids:
+                        self.ids[name] = tag_id
+                        pending.add(name)
+
+        with self.lock:
+            return {name: self.ids[name] for name in names if name in self.ids}
+
+    def commit(self, pending=None):
+        pending = self.pending if pending is None else pending
+        pending.clear()
+
+    def rollback(self, pending=None):
+        # 回滚后本次事务插入的标签可能不存在，需要从缓存中移除
+        pending = self.pending if pending is None else pending
+        with self.lock:
+            for name in pending:
+                self.ids.pop(name, None)
+        pending.clear()
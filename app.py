@@ -1,260 +1,621 @@
-#!/usr/bin/env python
-# -*- coding: utf-8 -*-
-
-"""
-飞卢小说数据可视化分析系统
-
-此应用程序使用Flask框架创建一个Web界面，用于可视化分析MySQL数据库中的飞卢小说数据。
-"""
-
-from flask import Flask, render_template, jsonify, request
-import pymysql
-import pandas as pd 
-import json
-import os
-
-app = Flask(__name__)
-
-# 从settings.py中读取MySQL配置
-def get_mysql_config():
-    try:
-        # 尝试从settings.py中导入配置
-        from Feilu.settings import MYSQL_HOST, MYSQL_PORT, MYSQL_DATABASE, MYSQL_USER, MYSQL_PASSWORD, MYSQL_CHARSET
-        
-        return {
-            'host': MYSQL_HOST,
-            'port': MYSQL_PORT,
-            'database': MYSQL_DATABASE,
-            'user': MYSQL_USER,
-            'password': MYSQL_PASSWORD,
-            'charset': MYSQL_CHARSET
-        }
-    except ImportError:
-        # 如果导入失败，使用默认配置
-        return {
-            'host': 'localhost',
-            'port': 3306,
-            'database': 'feilu_books',
-            'user': 'root',
-            'password': '1234',
-            'charset': 'utf8mb4'
-        }
-
-# 数据库连接函数
-def get_db_connection():
-    config = get_mysql_config()
-    connection = pymysql.connect(
-        host=config['host'],
-        port=config['port'],
-        user=config['user'],
-        password=config['password'],
-        database=config['database'],
-        charset=config['charset'],
-        cursorclass=pymysql.cursors.DictCursor
-    )
-    return connection
-
-# 首页路由
-@app.route('/')
-def index():
-    return render_template('index.html')
-
-# 获取书籍数据API
-@app.route('/api/books')
-def get_books():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 获取查询参数
-        limit = request.args.get('limit', default=100, type=int)
-        offset = request.args.get('offset', default=0, type=int)
-        
-        # 查询书籍数据
-        cursor.execute(
-            """SELECT id, title, author, monthly_clicks, word_count, 
-                      flowers, rating, rewards, created_at 
-               FROM books LIMIT %s OFFSET %s""", 
-            (limit, offset)
-        )
-        books = cursor.fetchall()
-        
-        # 查询总数
-        cursor.execute("SELECT COUNT(*) as count FROM books")
-        total = cursor.fetchone()['count']
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            'total': total,
-            'books': books
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# 获取标签分布数据API
-@app.route('/api/tags/distribution')
-def get_tag_distribution():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 查询标签分布
-        cursor.execute(
-            """SELECT t.name, COUNT(bt.book_id) as book_count 
-               FROM tags t 
-               JOIN book_tags bt ON t.id = bt.tag_id 
-               GROUP BY t.name 
-               ORDER BY book_count DESC 
-               LIMIT 20"""
-        )
-        tags = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(tags)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# 获取评分分布数据API
-@app.route('/api/ratings/distribution')
-def get_rating_distribution():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 查询评分分布
-        cursor.execute(
-            """SELECT 
-                  CASE 
-                    WHEN rating BETWEEN 0 AND 1 THEN '0-1' 
-                    WHEN rating BETWEEN 1 AND 2 THEN '1-2' 
-                    WHEN rating BETWEEN 2 AND 3 THEN '2-3' 
-                    WHEN rating BETWEEN 3 AND 4 THEN '3-4' 
-                    WHEN rating BETWEEN 4 AND 5 THEN '4-5' 
-                    WHEN rating BETWEEN 5 AND 6 THEN '5-6' 
-                    WHEN rating BETWEEN 6 AND 7 THEN '6-7' 
-                    WHEN rating BETWEEN 7 AND 8 THEN '7-8' 
-                    WHEN rating BETWEEN 8 AND 9 THEN '8-9' 
-                    WHEN rating BETWEEN 9 AND 10 THEN '9-10' 
-                    ELSE 'Unknown' 
-                  END as rating_range, 
-                  COUNT(*) as book_count 
-               FROM books 
-               WHERE rating IS NOT NULL 
-               GROUP BY rating_range 
-               ORDER BY rating_range"""
-        )
-        ratings = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(ratings)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# 获取热门作者数据API
-@app.route('/api/authors/top')
-def get_top_authors():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 查询热门作者
-        cursor.execute(
-            """SELECT author, COUNT(*) as book_count, 
-                      AVG(CAST(rating AS DECIMAL(10,2))) as avg_rating 
-               FROM books 
-               WHERE author IS NOT NULL AND author != '' 
-               GROUP BY author 
-               ORDER BY book_count DESC 
-               LIMIT 10"""
-        )
-        authors = cursor.fetchall()
-        
-        # 处理数据，确保avg_rating是数值类型
-        for author in authors:
-            if author['avg_rating'] is not None:
-                author['avg_rating'] = float(author['avg_rating'])
-            else:
-                author['avg_rating'] = 0
-            
-            # 确保book_count是整数
-            if author['book_count'] is not None:
-                author['book_count'] = int(author['book_count'])
-            else:
-                author['book_count'] = 0
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify(authors)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# 获取点击量与评分关系数据API
-@app.route('/api/correlation/clicks_rating')
-def get_clicks_rating_correlation():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # 查询点击量与评分数据
-        cursor.execute(
-            """SELECT title, monthly_clicks, rating 
-               FROM books 
-               WHERE monthly_clicks IS NOT NULL 
-                 AND rating IS NOT NULL 
-               LIMIT 200"""
-        )
-        data = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
-        
-        # 处理数据，将点击量转换为数值
-        for item in data:
-            clicks = item['monthly_clicks']
-            if isinstance(clicks, str):
-                # 处理"月点击：1130542"格式
-                if '月点击：' in clicks:
-                    clicks = clicks.replace('月点击：', '')
-                    
-                # 处理带单位的数字
-                if '万' in clicks:
-                    item['monthly_clicks'] = float(clicks.replace('万', '')) * 10000
-                elif '千' in clicks:
-                    item['monthly_clicks'] = float(clicks.replace('千', '')) * 1000
-                else:
-                    try:
-                        item['monthly_clicks'] = float(clicks)
-                    except:
-                        item['monthly_clicks'] = 0
-            
-            # 确保评分是数值类型
-            if item['rating'] is not None:
-                try:
-                    item['rating'] = float(item['rating'])
-                except:
-                    item['rating'] = 0
-        
-        return jsonify(data)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-# 启动应用
-if __name__ == '__main__':
-    # 确保templates目录存在
-    if not os.path.exists('templates'):
-        os.makedirs('templates')
-    
-    # 确保static目录存在
-    if not os.path.exists('static'):
-        os.makedirs('static')
-        os.makedirs('static/js', exist_ok=True)
-        os.makedirs('static/css', exist_ok=True)
-    
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统
+
+此应用程序使用Flask框架创建一个Web界面，用于可视化分析MySQL数据库中的飞卢小说数据。
+"""
+
+from flask import Flask, Response, render_template, request, stream_with_context
+import pymysql
+import pandas as pd 
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+
+from book_export import EXPORT_FORMATS, export_chunks
+from dashboard_queries import BOOK_SORTS, books_export_query, books_page_query, decode_cursor, encode_cursor, get_query, id_list_param
+from db_pool import ConnectionPool
+from request_metrics import RequestMetrics, prometheus_gauges
+from response_cache import ResponseCache
+from facet_index import RANGE_COLUMNS, LiveFacetIndex
+from json_response import compress_response, json_response, rows_payload
+from Feilu.metrics import decode_metrics
+from Feilu.progress import ProgressBroker
+from Feilu.search import match_query
+
+app = Flask(__name__)
+
+# JSON响应按Accept-Encoding压缩
+app.after_request(compress_response)
+
+# 从settings.py中读取MySQL配置，只在第一次调用时读取
+@lru_cache(maxsize=None)
+def get_mysql_config():
+    try:
+        # 尝试从settings.py中导入配置
+        from Feilu.settings import MYSQL_HOST, MYSQL_PORT, MYSQL_DATABASE, MYSQL_USER, MYSQL_PASSWORD, MYSQL_CHARSET
+        
+        return {
+            'host': MYSQL_HOST,
+            'port': MYSQL_PORT,
+            'database': MYSQL_DATABASE,
+            'user': MYSQL_USER,
+            'password': MYSQL_PASSWORD,
+            'charset': MYSQL_CHARSET
+        }
+    except ImportError:
+        # 如果导入失败，使用默认配置
+        return {
+            'host': 'localhost',
+            'port': 3306,
+            'database': 'feilu_books',
+            'user': 'root',
+            'password': '1234',
+            'charset': 'utf8mb4'
+        }
+
+# Web应用连接池配置，settings.py中没有设置时使用默认值
+def get_pool_config():
+    try:
+        from Feilu import settings
+    except ImportError:
+        settings = None
+    return {
+        'max_size': getattr(settings, 'WEB_DB_POOL_SIZE', 8),
+        'timeout': getattr(settings, 'WEB_DB_POOL_TIMEOUT', 5),
+        'recycle': getattr(settings, 'WEB_DB_POOL_RECYCLE', 3600),
+        'ping_interval': getattr(settings, 'WEB_DB_POOL_PING_INTERVAL', 30),
+    }
+
+# 接口响应缓存配置
+def get_cache_config():
+    try:
+        from Feilu import settings
+    except ImportError:
+        settings = None
+    return {
+        'ttl': getattr(settings, 'WEB_CACHE_TTL', 600),
+        'max_entries': getattr(settings, 'WEB_CACHE_MAX_ENTRIES', 256),
+        'version_interval': getattr(settings, 'WEB_CACHE_VERSION_INTERVAL', 5),
+        'shared_path': getattr(settings, 'WEB_CACHE_SHARED_PATH', None),
+    }
+
+# 爬取进度通道配置，与爬虫的PROGRESS_HOST/PROGRESS_PORT一致
+def get_progress_config():
+    try:
+        from Feilu import settings
+    except ImportError:
+        settings = None
+    return {
+        'host': getattr(settings, 'PROGRESS_HOST', '127.0.0.1'),
+        'port': getattr(settings, 'PROGRESS_PORT', 5590),
+    }
+
+# 接口耗时统计和慢查询日志配置
+def get_metrics_config():
+    try:
+        from Feilu import settings
+    except ImportError:
+        settings = None
+    return {
+        'slow_query_seconds': getattr(settings, 'WEB_SLOW_QUERY_SECONDS', 0.2),
+        'slow_log_size': getattr(settings, 'WEB_SLOW_QUERY_LOG_SIZE', 100),
+    }
+
+# 每个接口的请求耗时、数据库时间、读取行数和响应大小，在压缩钩子之后注册以统计压缩前的大小
+request_metrics = RequestMetrics(**get_metrics_config())
+request_metrics.init_app(app)
+
+# 计时游标，所有数据库查询都使用这几种游标
+DictCursor = request_metrics.cursor_class(pymysql.cursors.DictCursor)
+Cursor = request_metrics.cursor_class(pymysql.cursors.Cursor)
+SSCursor = request_metrics.cursor_class(pymysql.cursors.SSCursor)
+
+# 数据库连接函数
+def get_db_connection(cursorclass=DictCursor):
+    config = get_mysql_config()
+    connection = pymysql.connect(
+        host=config['host'],
+        port=config['port'],
+        user=config['user'],
+        password=config['password'],
+        database=config['database'],
+        charset=config['charset'],
+        cursorclass=cursorclass,
+        # 连接会被连接池复用，自动提交使每条查询都读取最新数据
+        autocommit=True
+    )
+    return connection
+
+# 所有接口共用的连接池，连接断开、超时等错误发生后连接不再复用
+db_pool = ConnectionPool(
+    get_db_connection,
+    discard_errors=(pymysql.err.OperationalError, pymysql.err.InterfaceError),
+    **get_pool_config()
+)
+
+# 当前数据版本，爬取结束或运行manage_db.py后加一
+def load_data_version():
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(get_query('data_version'))
+        row = cursor.fetchone()
+        cursor.close()
+    return row['version'] if row else None
+
+# 仪表盘接口的响应缓存，数据版本变化前一直有效
+response_cache = ResponseCache(load_data_version, **get_cache_config())
+
+# 书籍总数，按数据版本缓存，不必每次分页都对整张表计数
+def load_books_count():
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(get_query('books_count'))
+        count = cursor.fetchone()['count']
+        cursor.close()
+    return int(count)
+
+# 书籍筛选索引，第一次筛选时加载，爬取结束（数据版本变化）后在后台刷新
+facet_index = LiveFacetIndex(lambda: get_db_connection(Cursor))
+
+# 爬取进度，第一个仪表盘连接时订阅，所有仪表盘共用这一个订阅
+progress_broker = ProgressBroker(**get_progress_config())
+
+# 首页路由
+@app.route('/')
+def index():
+    return render_template('index.html')
+
+# 书籍列表每页最多返回的条数
+BOOKS_PAGE_MAX_LIMIT = 100
+
+# 读取书籍列表的一页，按数值排序时没有该值的书籍排在最后，读完有值的书籍后接着读取
+def fetch_books_page(cursor, sort, after, limit):
+    books = []
+    while len(books) < limit:
+        name, params = books_page_query(sort, after)
+        cursor.execute(get_query(name), params + (limit - len(books),))
+        rows = cursor.fetchall()
+        books.extend(rows)
+        if sort == 'id' or name.endswith('_missing') or len(books) == limit:
+            break
+        after = (None, 0)
+    return books
+
+# 获取书籍数据API
+@app.route('/api/books')
+def get_books():
+    try:
+        # 键集分页：cursor为上一页返回的next_cursor，第一页不传；sort为id（ID升序）或
+        # rating/clicks/words（降序，没有该值的书籍排在最后）；format=columns时books为列式格式
+        limit = max(1, min(request.args.get('limit', default=100, type=int), BOOKS_PAGE_MAX_LIMIT))
+        sort = request.args.get('sort', 'id')
+        if sort != 'id' and sort not in BOOK_SORTS:
+            return json_response({'error': f'不支持的排序方式: {sort}'}), 400
+        # 旧的offset分页已经不再支持，明确报错，避免调用方一直拿到第一页
+        if 'offset' in request.args:
+            return json_response({'error': '不再支持offset分页，请使用上一页返回的next_cursor作为cursor参数'}), 400
+        token = request.args.get('cursor')
+        try:
+            after = decode_cursor(token, sort) if token else None
+        except ValueError as e:
+            return json_response({'error': str(e)}), 400
+        
+        columnar = request.args.get('format') == 'columns'
+        
+        # 使用元组游标，列名只从游标描述中读取一次
+        with db_pool.connection() as conn:
+            cursor = conn.cursor(Cursor)
+            rows = fetch_books_page(cursor, sort, after, limit)
+            columns = [column[0] for column in cursor.description]
+            cursor.close()
+        
+        # 下一页从本页最后一本书之后开始，不足一页说明已经是最后一页；按数值排序时最后一列是排序值
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = encode_cursor(sort, last[-1] if sort != 'id' else None, last[0])
+        if sort != 'id':
+            columns = columns[:-1]
+            rows = [row[:-1] for row in rows]
+        
+        return json_response({
+            'total': response_cache.value('books_count', load_books_count),
+            'books': rows_payload(columns, rows, columnar),
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 书籍汇总统计：总数、平均评分和最高月点击量，直接在数值列上计算
+def query_book_stats(cursor):
+    cursor.execute(get_query('books_stats'))
+    stats = cursor.fetchone()
+    return {
+        'total': int(stats['total']),
+        'avg_rating': float(stats['avg_rating']) if stats['avg_rating'] is not None else None,
+        'max_clicks': int(stats['max_clicks']) if stats['max_clicks'] is not None else None
+    }
+
+# 标签分布
+def query_tag_distribution(cursor):
+    cursor.execute(get_query('tag_distribution'))
+    return cursor.fetchall()
+
+# 评分分布，满分10分归入9-10
+def query_rating_distribution(cursor):
+    cursor.execute(get_query('rating_distribution'))
+    return [
+        {'rating_range': f"{int(row['bucket'])}-{int(row['bucket']) + 1}", 'book_count': int(row['book_count'])}
+        for row in cursor.fetchall()
+    ]
+
+# 热门作者，确保avg_rating是数值类型、book_count是整数
+def query_top_authors(cursor):
+    cursor.execute(get_query('top_authors'))
+    authors = cursor.fetchall()
+    for author in authors:
+        author['avg_rating'] = float(author['avg_rating']) if author['avg_rating'] is not None else 0
+        author['book_count'] = int(author['book_count']) if author['book_count'] is not None else 0
+    return authors
+
+# 点击量与评分数据，数值在写入时已转换，DECIMAL转换为浮点数以便序列化
+def query_clicks_rating(cursor):
+    cursor.execute(get_query('clicks_rating'))
+    data = cursor.fetchall()
+    for item in data:
+        item['rating'] = float(item['rating'])
+    return data
+
+# 从连接池借出一个连接执行query(cursor)，返回查询结果
+def run_query(query):
+    with db_pool.connection() as conn:
+        cursor = conn.cursor()
+        result = query(cursor)
+        cursor.close()
+    return result
+
+# 书籍目录导出API，流式输出，内存占用与导出的书籍数量无关
+@app.route('/api/books/export')
+def export_books():
+    # format为ndjson或csv，gzip=1时输出gzip压缩文件；updated_since为时间（如2024-01-01 00:00:00），
+    # 只导出此后的爬取中新加入或指标有变化的书籍；tag为标签名
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return json_response({'error': f'不支持的导出格式: {fmt}'}), 400
+    since = request.args.get('updated_since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since).strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            return json_response({'error': f'无效的时间: {since}'}), 400
+    compress = request.args.get('gzip', default=0, type=int) == 1
+    name, params = books_export_query(since or None, request.args.get('tag') or None)
+    
+    # 使用单独的连接和服务端游标（SSCursor）逐批读取，不占用连接池中的连接；
+    # 查询在第一次读取前执行，出错时直接返回错误
+    conn = get_db_connection(SSCursor)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(get_query(name), params)
+    except Exception as e:
+        conn.close()
+        return json_response({'error': str(e)}), 500
+    
+    filename = f'books.{fmt}' + ('.gz' if compress else '')
+    response = Response(
+        stream_with_context(export_chunks(cursor, fmt, compress)),
+        mimetype='application/gzip' if compress else EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+    # 导出结束或客户端中途断开时关闭连接，不读完剩余结果
+    response.call_on_close(conn.close)
+    return response
+
+# 获取书籍汇总统计API
+@app.route('/api/books/stats')
+@response_cache.cached
+def get_book_stats():
+    try:
+        return json_response(run_query(query_book_stats))
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 获取标签分布数据API
+@app.route('/api/tags/distribution')
+@response_cache.cached
+def get_tag_distribution():
+    try:
+        return json_response(run_query(query_tag_distribution))
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 获取评分分布数据API
+@app.route('/api/ratings/distribution')
+@response_cache.cached
+def get_rating_distribution():
+    try:
+        return json_response(run_query(query_rating_distribution))
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 获取热门作者数据API
+@app.route('/api/authors/top')
+@response_cache.cached
+def get_top_authors():
+    try:
+        return json_response(run_query(query_top_authors))
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 获取点击量与评分关系数据API
+@app.route('/api/correlation/clicks_rating')
+@response_cache.cached
+def get_clicks_rating_correlation():
+    try:
+        return json_response(run_query(query_clicks_rating))
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 点击量与评分二维直方图的每轴分箱数上限，以及精确点模式最多返回的点数
+HISTOGRAM_MAX_BINS = 100
+HISTOGRAM_MAX_POINTS = 2000
+
+# 筛选条件参数：tag可以出现多次（必须同时带有），author可以出现多次（任意一个），
+# rating/clicks/words各有_min、_max两个范围参数
+def filter_args():
+    ranges = {
+        name: (request.args.get(f'{name}_min', type=float), request.args.get(f'{name}_max', type=float))
+        for name in RANGE_COLUMNS
+    }
+    return request.args.getlist('tag'), request.args.getlist('author'), ranges
+
+# 点击量与评分的二维直方图，在内存筛选索引的数值数组上分箱，覆盖全部书籍
+def query_clicks_rating_bins(index, tags=(), authors=(), ranges=None, x_bins=40, y_bins=20, log_x=True, max_points=0):
+    return index.histogram(
+        index.filter(tags, authors, ranges), 'clicks', 'rating',
+        bins=(max(1, min(x_bins, HISTOGRAM_MAX_BINS)), max(1, min(y_bins, HISTOGRAM_MAX_BINS))),
+        log_x=log_x,
+        ranges=ranges,
+        max_points=max(0, min(max_points, HISTOGRAM_MAX_POINTS))
+    )
+
+# 获取点击量与评分二维直方图API
+@app.route('/api/correlation/clicks_rating/bins')
+def get_clicks_rating_bins():
+    try:
+        # x_bins/y_bins为分箱数，log=1时点击量按对数分箱；筛选条件与/api/books/filter相同，
+        # 放大查看时传入clicks、rating范围和points，范围内的书籍不超过points本时返回各点
+        tags, authors, ranges = filter_args()
+        result = query_clicks_rating_bins(
+            facet_index.get(), tags, authors, ranges,
+            x_bins=request.args.get('x_bins', default=40, type=int),
+            y_bins=request.args.get('y_bins', default=20, type=int),
+            log_x=request.args.get('log', default=1, type=int) == 1,
+            max_points=request.args.get('points', default=0, type=int)
+        )
+        
+        # 精确点模式补上书名，点数有上限
+        if result.get('points'):
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(get_query('books_by_ids'), (id_list_param([point[0] for point in result['points']]),))
+                titles = {row['id']: row['title'] for row in cursor.fetchall()}
+                cursor.close()
+            for point in result['points']:
+                point.append(titles.get(point[0]))
+        
+        return json_response(result)
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 仪表盘首页需要的全部数据API，在同一个连接上查询后一次返回，
+# 数据版本作为ETag，数据没有变化时浏览器带If-None-Match重新验证得到304
+@app.route('/api/dashboard')
+@response_cache.cached
+def get_dashboard():
+    try:
+        limit = max(1, min(request.args.get('limit', default=10, type=int), BOOKS_PAGE_MAX_LIMIT))
+        # 点击量与评分关系用筛选索引上的直方图；索引还没有刷新到当前数据版本时响应不缓存
+        version = response_cache.version()
+        index = facet_index.get(version)
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+            stats = query_book_stats(cursor)
+            books = fetch_books_page(cursor, 'id', None, limit)
+            data = {
+                'stats': stats,
+                'tags': query_tag_distribution(cursor),
+                'ratings': query_rating_distribution(cursor),
+                'authors': query_top_authors(cursor),
+                'clicks_rating': query_clicks_rating_bins(index),
+                'books': {
+                    'total': stats['total'],
+                    'books': books,
+                    'next_cursor': encode_cursor('id', None, books[-1]['id']) if len(books) == limit else None
+                }
+            }
+            cursor.close()
+        
+        response = json_response(data)
+        if index.version != version:
+            response.headers['Cache-Control'] = 'no-store'
+        return response
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 获取单本书籍指标历史API
+@app.route('/api/books/<int:book_id>/history')
+def get_book_history(book_id):
+    try:
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+        
+            # 每个点是一次指标发生变化的爬取，两点之间指标保持不变
+            cursor.execute(get_query('book_history'), (book_id,))
+            points = []
+            for row in cursor.fetchall():
+                point = {'crawl_id': row['crawl_id'], 'crawled_at': str(row['crawled_at'])}
+                point.update(decode_metrics(row))
+                points.append(point)
+        
+            cursor.close()
+        
+        return json_response({'book_id': book_id, 'points': points})
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 获取相似书籍API
+@app.route('/api/books/<int:book_id>/similar')
+def get_similar_books(book_id):
+    try:
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+        
+            # 相似书籍由 python manage_db.py similar 预先计算，这里只按主键读取
+            cursor.execute(get_query('similar_books'), (book_id,))
+            books = cursor.fetchall()
+            for book in books:
+                book['score'] = float(book['score'])
+        
+            cursor.close()
+        
+        return json_response({'book_id': book_id, 'books': books})
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 获取标签指标历史API
+@app.route('/api/tags/<path:name>/history')
+def get_tag_history(name):
+    try:
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+        
+            # 数据库中保存的是每次爬取的增量，累加后得到标签下所有书籍的指标之和
+            cursor.execute(get_query('tag_history'), (name,))
+            totals = {'monthly_clicks': 0, 'flowers': 0, 'rewards': 0, 'book_count': 0}
+            points = []
+            for row in cursor.fetchall():
+                for key in totals:
+                    totals[key] += int(row[key])
+                point = {'crawl_id': row['crawl_id'], 'crawled_at': str(row['crawled_at'])}
+                point.update(totals)
+                points.append(point)
+        
+            cursor.close()
+        
+        return json_response({'tag': name, 'points': points})
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 书籍组合筛选API
+@app.route('/api/books/filter')
+def filter_books():
+    try:
+        tags, authors, ranges = filter_args()
+        result = facet_index.get().query(
+            tags=tags,
+            authors=authors,
+            ranges=ranges,
+            sort=request.args.get('sort', 'id'),
+            limit=max(1, min(request.args.get('limit', default=20, type=int), 100)),
+            offset=max(0, request.args.get('offset', default=0, type=int))
+        )
+        
+        # 当前页的书籍详情按ID从数据库读取，保持索引给出的顺序
+        books = []
+        if result['ids']:
+            with db_pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(get_query('books_by_ids'), (id_list_param(result['ids']),))
+                rows = {row['id']: row for row in cursor.fetchall()}
+                cursor.close()
+            books = [rows[book_id] for book_id in result['ids'] if book_id in rows]
+        
+        return json_response({
+            'total': result['total'],
+            'books': books,
+            'facets': result['facets']
+        })
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 连接池状态API
+@app.route('/api/pool')
+def get_pool_stats():
+    return json_response(dict(db_pool.stats(), cache=response_cache.stats(), progress=progress_broker.stats()))
+
+# 爬取进度推送（Server-Sent Events），爬虫运行时每秒一个progress事件，爬取结束时state为finished
+@app.route('/api/crawl/progress')
+def crawl_progress():
+    return Response(
+        progress_broker.stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# Prometheus格式的统计：各接口的请求数、耗时直方图、数据库时间、读取行数、响应大小，以及连接池和响应缓存的状态
+@app.route('/metrics')
+def get_metrics():
+    body = (
+        request_metrics.prometheus()
+        + prometheus_gauges('feilu', 'db_pool', '数据库连接池', db_pool.stats())
+        + prometheus_gauges('feilu', 'response_cache', '接口响应缓存', response_cache.stats())
+    )
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+# 最近的慢查询（SQL、参数、所属接口和耗时），最新的在前
+@app.route('/api/metrics/slow_queries')
+def get_slow_queries():
+    return json_response({
+        'threshold': request_metrics.slow_query_seconds,
+        'queries': request_metrics.slow_queries(),
+    })
+
+# 全文检索API
+@app.route('/api/search')
+def search_books():
+    try:
+        # 关键词之间用空格分隔，每个关键词都必须出现在书名、作者或简介中
+        query = match_query(request.args.get('q', ''))
+        if query is None:
+            return json_response({'error': '请输入搜索关键词'}), 400
+        limit = max(1, min(request.args.get('limit', default=20, type=int), 100))
+        offset = max(0, request.args.get('offset', default=0, type=int))
+        
+        with db_pool.connection() as conn:
+            cursor = conn.cursor()
+        
+            cursor.execute(get_query('search'), {'query': query, 'limit': limit, 'offset': offset})
+            books = cursor.fetchall()
+            for book in books:
+                book['score'] = float(book['score'])
+        
+            cursor.execute(get_query('search_count'), {'query': query})
+            total = cursor.fetchone()['count']
+        
+            cursor.close()
+        
+        return json_response({
+            'total': total,
+            'books': books
+        })
+    except Exception as e:
+        return json_response({'error': str(e)}), 500
+
+# 启动应用
+if __name__ == '__main__':
+    # 确保templates目录存在
+    if not os.path.exists('templates'):
+        os.makedirs('templates')
+    
+    # 确保static目录存在
+    if not os.path.exists('static'):
+        os.makedirs('static')
+        os.makedirs('static/js', exist_ok=True)
+        os.makedirs('static/css', exist_ok=True)
+    
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
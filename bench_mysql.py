@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - MySQL写入性能测试工具
+
+用随机生成的书籍数据比较FeiluMySQLPipeline三种写入方式的速度（行/秒）：
+    row   逐条写入，每本书一个事务
+    batch 多行INSERT ... ON DUPLICATE KEY UPDATE，每批一个事务
+    bulk  写入临时文件后LOAD DATA批量导入（需要服务器开启local_infile）
+
+测试在单独的数据库（默认feilu_books_bench）中进行，不会改动正式数据。
+需要MySQL 5.7.6及以上（全文索引使用ngram解析器），例如：
+    docker run -d -p 3307:3306 -e MYSQL_ROOT_PASSWORD=1234 mysql:8.0 --local-infile=1
+
+使用方法：
+    python bench_mysql.py
+    python bench_mysql.py --port 3307 --rows 50000 --batch 1000 --modes batch bulk
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pymysql
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.mysql_pipeline import FeiluMySQLPipeline
+from testing_utils import make_items
+
+
+# 从settings.py中读取MySQL配置
+def get_mysql_config():
+    try:
+        from Feilu.settings import MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASSWORD, MYSQL_CHARSET
+
+        return {
+            'host': MYSQL_HOST,
+            'port': MYSQL_PORT,
+            'user': MYSQL_USER,
+            'password': MYSQL_PASSWORD,
+            'charset': MYSQL_CHARSET
+        }
+    except ImportError:
+        return {
+            'host': 'localhost',
+            'port': 3306,
+            'user': 'root',
+            'password': '',
+            'charset': 'utf8mb4'
+        }
+
+
+def reset_database(config, database, local_infile):
+    conn = pymysql.connect(local_infile=local_infile, **config)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+    cursor.execute(f"CREATE DATABASE `{database}` CHARACTER SET {config['charset']}")
+    cursor.execute(f"USE `{database}`")
+    return conn, cursor
+
+
+def run_mode(mode, items, batch_size, config, database):
+    pipeline = FeiluMySQLPipeline(
+        config['host'], config['port'], database, config['user'], config['password'], config['charset'],
+        batch_size=batch_size, bulk_load=(mode == 'bulk')
+    )
+    pipeline.conn, pipeline.cursor = reset_database(config, database, local_infile=(mode == 'bulk'))
+    pipeline.create_tables()
+    # 汇总表等由migrate_tables()创建，写入书籍时会同时更新
+    pipeline.migrate_tables()
+
+    step = 1 if mode == 'row' else batch_size
+    started = time.time()
+    for i in range(0, len(items), step):
+        pending = set()
+        pipeline.write_items(items[i:i + step], pending)
+        pipeline.conn.commit()
+        pipeline.tag_cache.commit(pending)
+    elapsed = time.time() - started
+
+    pipeline.cursor.execute("SELECT COUNT(*) FROM `books`")
+    count = pipeline.cursor.fetchone()[0]
+    pipeline.cursor.execute(f"DROP DATABASE `{database}`")
+    pipeline.conn.close()
+    return count, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MySQL写入性能测试')
+    config = get_mysql_config()
+    parser.add_argument('--host', default=config['host'])
+    parser.add_argument('--port', type=int, default=config['port'])
+    parser.add_argument('--user', default=config['user'])
+    parser.add_argument('--password', default=config['password'])
+    parser.add_argument('--database', default='feilu_books_bench')
+    parser.add_argument('--rows', type=int, default=20000, help='测试数据行数')
+    parser.add_argument('--batch', type=int, default=500, help='batch/bulk模式每批行数')
+    parser.add_argument('--modes', nargs='+', default=['row', 'batch', 'bulk'], choices=['row', 'batch', 'bulk'])
+    args = parser.parse_args()
+    config.update(host=args.host, port=args.port, user=args.user, password=args.password)
+
+    print("=" * 60)
+    print("飞卢小说爬虫 - MySQL写入性能测试")
+    print("=" * 60)
+    print(f"服务器: {args.host}:{args.port}, 测试数据: {args.rows} 行, 每批: {args.batch} 行")
+
+    items = make_items(args.rows)
+    for mode in args.modes:
+        try:
+            count, elapsed = run_mode(mode, items, args.batch, config, args.database)
+            print(f"{mode:>6}: {count} 行, 耗时 {elapsed:.2f} 秒, {count / elapsed:,.0f} 行/秒")
+        except Exception as e:
+            print(f"{mode:>6}: 测试失败 - {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 书籍目录流式导出
+
+从数据库游标中分批读取书籍，逐批编码为NDJSON或CSV输出，可选gzip压缩：
+- 游标应为服务端游标（pymysql的SSCursor），数据库不会把整个结果集一次发给Web进程
+- 每次只在内存中保留fetch_size行和一批编码后的数据，导出的书籍再多内存占用也不变
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+# 导出格式 -> MIME类型
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+# 每批读取的行数
+FETCH_SIZE = 1000
+
+
+def fetch_batches(cursor, fetch_size=FETCH_SIZE):
+    """
+    逐批读取已执行查询的游标
+    """
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def _json_value(value):
+    # DECIMAL转换为浮点数，时间转换为字符串
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'无法序列化的类型: {type(value).__name__}')
+
+
+def ndjson_chunks(columns, batches):
+    """
+    每本书一行JSON，标签展开为列表
+    """
+    tags = columns.index('tags') if 'tags' in columns else None
+    for rows in batches:
+        lines = []
+        for row in rows:
+            book = dict(zip(columns, row))
+            if tags is not None:
+                book['tags'] = row[tags].split(',') if row[tags] else []
+            lines.append(json.dumps(book, ensure_ascii=False, default=_json_value))
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def csv_chunks(columns, batches):
+    """
+    带表头的CSV，标签保持逗号分隔
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    把字节块流式压缩为gzip格式
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(cursor, fmt='ndjson', compress=False, fetch_size=FETCH_SIZE):
+    """
+    把已执行查询的游标导出为字节块，fmt为EXPORT_FORMATS中的格式
+    """
+    columns = [column[0] for column in cursor.description]
+    batches = fetch_batches(cursor, fetch_size)
+    chunks = ndjson_chunks(columns, batches) if fmt == 'ndjson' else csv_chunks(columns, batches)
+    return gzip_chunks(chunks) if compress else chunks
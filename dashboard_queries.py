@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 仪表盘查询
+
+app.py中各接口使用的SQL集中定义在这里，test_query_plans.py会对每条查询执行EXPLAIN，
+检查是否都能用上索引。修改或新增查询时请同步更新索引（见两个数据库管道的INDEXES）。
+"""
+
+import base64
+import json
+import re
+
+# 查询名称 -> MySQL语句（%s或%(name)s占位符）
+DASHBOARD_QUERIES = {
+    # 书籍列表分页，按ID键集分页：从上一页最后一本书的ID之后沿主键读取，页数再深也只读LIMIT行
+    'books_page': """SELECT id, title, author, monthly_clicks, word_count,
+                            flowers, rating, rewards, created_at
+                     FROM books WHERE id > %s ORDER BY id LIMIT %s""",
+
+    # 书籍总数，使用最小的二级索引计数
+    'books_count': "SELECT COUNT(*) as count FROM books",
+
+    # 汇总统计，拆成子查询使每一项都能单独用上索引
+    'books_stats': """SELECT (SELECT COUNT(*) FROM books) as total,
+                             (SELECT AVG(rating_num) FROM books) as avg_rating,
+                             (SELECT MAX(monthly_clicks_num) FROM books) as max_clicks""",
+
+    # 标签分布，读取由数据库管道增量维护的tag_stats汇总表
+    'tag_distribution': """SELECT t.name, s.book_count
+                           FROM tag_stats s
+                           JOIN tags t ON t.id = s.tag_id
+                           WHERE s.book_count > 0
+                           ORDER BY s.book_count DESC
+                           LIMIT 20""",
+
+    # 评分分布，bucket为评分的整数部分，满分10分归入9-10
+    'rating_distribution': """SELECT bucket, book_count
+                              FROM rating_buckets
+                              WHERE book_count > 0
+                              ORDER BY bucket""",
+
+    # 热门作者，读取author_stats汇总表
+    'top_authors': """SELECT author, book_count,
+                             rating_sum / NULLIF(rating_count, 0) as avg_rating
+                      FROM author_stats
+                      ORDER BY book_count DESC
+                      LIMIT 10""",
+
+    # 点击量与评分关系，取月点击最高的200本，沿(monthly_clicks_num, rating_num)索引倒序读取
+    'clicks_rating': """SELECT title, monthly_clicks_num as monthly_clicks, rating_num as rating
+                        FROM books
+                        WHERE monthly_clicks_num IS NOT NULL
+                          AND rating_num IS NOT NULL
+                        ORDER BY monthly_clicks_num DESC
+                        LIMIT 200""",
+
+    # 单本书籍的指标历史，沿book_metrics主键(book_id, crawl_id)范围读取，只包含发生变化的爬取
+    'book_history': """SELECT m.crawl_id, c.started_at as crawled_at,
+                              m.monthly_clicks, m.word_count, m.flowers, m.rating, m.rewards
+                       FROM book_metrics m
+                       JOIN crawls c ON c.id = m.crawl_id
+                       WHERE m.book_id = %s
+                       ORDER BY m.crawl_id""",
+
+    # 标签的指标增量，沿tag_metric_deltas主键(tag_id, crawl_id)范围读取，累加后为标签的历史
+    'tag_history': """SELECT d.crawl_id, c.started_at as crawled_at,
+                             d.monthly_clicks, d.flowers, d.rewards, d.book_count
+                      FROM tags t
+                      JOIN tag_metric_deltas d ON d.tag_id = t.id
+                      JOIN crawls c ON c.id = d.crawl_id
+                      WHERE t.name = %s
+                      ORDER BY d.crawl_id""",
+
+    # 全文检索，query为search.match_query()生成的BOOLEAN MODE表达式，按相关度排序
+    'search': """SELECT id, title, author, SUBSTR(summary, 1, 120) as summary, monthly_clicks, rating,
+                        MATCH(title, author, summary) AGAINST (%(query)s IN BOOLEAN MODE) as score
+                 FROM books
+                 WHERE MATCH(title, author, summary) AGAINST (%(query)s IN BOOLEAN MODE)
+                 ORDER BY score DESC
+                 LIMIT %(limit)s OFFSET %(offset)s""",
+
+    # 全文检索的结果总数
+    'search_count': """SELECT COUNT(*) as count
+                       FROM books
+                       WHERE MATCH(title, author, summary) AGAINST (%(query)s IN BOOLEAN MODE)""",
+
+    # 相似书籍，沿similar_books主键(book_id, similar_id)读取预先计算好的k本
+    'similar_books': """SELECT b.id, b.title, b.author, b.rating, sb.score
+                        FROM similar_books sb
+                        JOIN books b ON b.id = sb.similar_id
+                        WHERE sb.book_id = %s
+                        ORDER BY sb.score DESC""",
+
+    # 按ID取书籍详情，参数为id_list_param()生成的ID列表
+    'books_by_ids': """SELECT id, title, author, monthly_clicks, word_count,
+                              flowers, rating, rewards, created_at
+                       FROM books WHERE id IN %s""",
+
+    # 数据版本，每次爬取结束后加一
+    'data_version': "SELECT version FROM data_version WHERE id = 1",
+
+    # 内存筛选索引（facet_index.py）加载的数据，启动和数据版本变化时各读取一遍
+    'facet_books': """SELECT id, author, rating_num, monthly_clicks_num, word_count_num
+                      FROM books ORDER BY id""",
+    'facet_book_tags': "SELECT book_id, tag_id FROM book_tags",
+    'facet_tags': "SELECT id, name FROM tags ORDER BY id",
+}
+
+# 书籍列表可选的数值排序：排序名 -> 数值列，与facet_index.RANGE_COLUMNS的名称一致。
+# 按该列降序、同值按ID降序排列，没有该值的书籍按ID升序排在最后；每种排序生成三条查询：
+# 第一页、上一页最后一本书(排序值, ID)之后的一页、没有该值的书籍。都沿该列的单列索引读取
+BOOK_SORTS = {'rating': 'rating_num', 'clicks': 'monthly_clicks_num', 'words': 'word_count_num'}
+
+for _sort, _column in BOOK_SORTS.items():
+    DASHBOARD_QUERIES[f'books_by_{_sort}'] = f"""SELECT id, title, author, monthly_clicks, word_count,
+                            flowers, rating, rewards, created_at, {_column} as sort_value
+                     FROM books
+                     WHERE {_column} IS NOT NULL
+                     ORDER BY {_column} DESC, id DESC LIMIT %s"""
+    DASHBOARD_QUERIES[f'books_by_{_sort}_after'] = f"""SELECT id, title, author, monthly_clicks, word_count,
+                            flowers, rating, rewards, created_at, {_column} as sort_value
+                     FROM books
+                     WHERE {_column} <= %s AND ({_column} < %s OR id < %s)
+                     ORDER BY {_column} DESC, id DESC LIMIT %s"""
+    DASHBOARD_QUERIES[f'books_by_{_sort}_missing'] = f"""SELECT id, title, author, monthly_clicks, word_count,
+                            flowers, rating, rewards, created_at, NULL as sort_value
+                     FROM books
+                     WHERE {_column} IS NULL AND id > %s
+                     ORDER BY id LIMIT %s"""
+del _sort, _column
+
+# 书籍目录导出（app.py的/api/books/export）的可选条件，可以组合使用：
+# since为爬取开始时间，导出在此后的爬取中新加入或指标有变化的书籍（book_metrics只记录有变化的快照）；
+# tag为标签名，导出带有该标签的书籍
+EXPORT_FILTERS = {
+    'since': """b.id IN (SELECT m.book_id FROM book_metrics m
+                              JOIN crawls c ON c.id = m.crawl_id
+                              WHERE c.started_at >= %(since)s)""",
+    'tag': """b.id IN (SELECT bt.book_id FROM book_tags bt
+                            JOIN tags t ON t.id = bt.tag_id
+                            WHERE t.name = %(tag)s)""",
+}
+
+# 导出的列与book.csv一致，另外加上ID、数值列和入库时间；标签以逗号分隔，沿book_tags主键读取
+EXPORT_SELECT = """SELECT b.id, b.title, b.author, b.book_url, b.summary,
+                          b.monthly_clicks, b.word_count, b.flowers, b.rating, b.rewards,
+                          b.monthly_clicks_num, b.word_count_num, b.flowers_num, b.rating_num, b.rewards_num,
+                          (SELECT GROUP_CONCAT(t.name) FROM book_tags bt
+                           JOIN tags t ON t.id = bt.tag_id
+                           WHERE bt.book_id = b.id) as tags,
+                          b.created_at
+                   FROM books b"""
+
+for _filters in ((), ('since',), ('tag',), ('since', 'tag')):
+    _where = ' AND '.join(EXPORT_FILTERS[name] for name in _filters)
+    DASHBOARD_QUERIES['_'.join(('books_export',) + _filters)] = (
+        EXPORT_SELECT + (f'\n                   WHERE {_where}' if _where else '') + '\n                   ORDER BY b.id'
+    )
+del _filters, _where
+
+# SQLite写法不同的查询
+SQLITE_OVERRIDES = {
+    # 在FTS5表books_fts中检索，书名、作者、简介的权重依次为10、5、1，bm25越小越相关
+    'search': """SELECT b.id, b.title, b.author, SUBSTR(b.summary, 1, 120) as summary,
+                        b.monthly_clicks, b.rating, -f.score as score
+                 FROM (SELECT rowid, bm25(books_fts, 10.0, 5.0, 1.0) as score
+                       FROM books_fts
+                       WHERE books_fts MATCH %(query)s
+                       ORDER BY score
+                       LIMIT %(limit)s OFFSET %(offset)s) f
+                 JOIN books b ON b.id = f.rowid
+                 ORDER BY f.score""",
+
+    'search_count': """SELECT COUNT(*) as count FROM books_fts WHERE books_fts MATCH %(query)s""",
+
+    # SQLite不能绑定列表，ID列表以JSON数组传入
+    'books_by_ids': """SELECT id, title, author, monthly_clicks, word_count,
+                              flowers, rating, rewards, created_at
+                       FROM books WHERE id IN (SELECT value FROM json_each(%s))""",
+}
+
+# 允许全表扫描的表：筛选索引和不带条件的导出本来就要读取全部数据
+ALLOWED_SCANS = {
+    'books_export': {'books'},
+    'facet_books': {'books'},
+    'facet_book_tags': {'book_tags'},
+    'facet_tags': {'tags'},
+}
+
+
+def get_query(name, dialect='mysql'):
+    """
+    返回指定数据库的查询语句，dialect为mysql或sqlite
+    """
+    if dialect == 'sqlite':
+        query = SQLITE_OVERRIDES.get(name, DASHBOARD_QUERIES[name])
+        return re.sub(r'%\((\w+)\)s', r':\1', query).replace('%s', '?')
+    return DASHBOARD_QUERIES[name]
+
+
+def id_list_param(ids, dialect='mysql'):
+    """
+    IN %s 占位符的参数：MySQL为元组（pymysql展开为括号列表），SQLite为JSON数组
+    """
+    if dialect == 'sqlite':
+        return json.dumps([int(book_id) for book_id in ids])
+    return tuple(int(book_id) for book_id in ids)
+
+
+def books_page_query(sort='id', after=None):
+    """
+    书籍列表一页的查询，返回 (查询名, 参数)，LIMIT是查询的最后一个参数，不包含在参数中
+
+    after为上一页最后一本书的 (排序值, ID)，第一页为None；按数值排序时排序值为None表示
+    已经读到没有该值的书籍
+    """
+    if sort == 'id':
+        return 'books_page', (after[1] if after else 0,)
+    if after is None:
+        return f'books_by_{sort}', ()
+    value, book_id = after
+    if value is None:
+        return f'books_by_{sort}_missing', (book_id,)
+    return f'books_by_{sort}_after', (value, value, book_id)
+
+
+def books_export_query(since=None, tag=None):
+    """
+    书籍目录导出的查询，返回 (查询名, 参数)
+    """
+    params = {name: value for name, value in (('since', since), ('tag', tag)) if value is not None}
+    return '_'.join(('books_export',) + tuple(params)), params
+
+
+def encode_cursor(sort, value, book_id):
+    """
+    把排序方式和上一页最后一本书的 (排序值, ID) 编码为分页游标
+    """
+    value = float(value) if value is not None else None
+    data = json.dumps([sort, value, book_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(token, sort):
+    """
+    解析分页游标，返回 (排序值, ID)；游标无效或与排序方式不一致时抛出ValueError
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        cursor_sort, value, book_id = data
+    except (TypeError, ValueError):
+        raise ValueError('分页游标无效')
+    if cursor_sort != sort or not isinstance(book_id, int) or not isinstance(value, (int, float, type(None))):
+        raise ValueError('分页游标无效')
+    return value, book_id
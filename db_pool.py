@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 数据库连接池
+
+Web应用的各个接口共用一组数据库连接，避免每个请求都重新建立TCP连接和认证：
+- 同时借出的连接数不超过max_size，连接用完时请求最多等待timeout秒
+- 空闲超过ping_interval秒的连接借出前先ping一次，断开的连接丢弃后重新建立
+- 建立超过recycle秒的连接归还时关闭，避免被服务器的wait_timeout断开
+- 使用中出现连接错误的连接不再放回连接池
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeout(Exception):
+    """
+    等待空闲连接超时
+    """
+
+
+class ConnectionPool:
+    """
+    线程安全的连接池
+
+    connect: 返回新数据库连接的函数，连接须支持ping()和close()
+    discard_errors: 使用中抛出这些异常时连接不再放回连接池
+    """
+    def __init__(self, connect, max_size=8, timeout=5, recycle=3600, ping_interval=30, discard_errors=()):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.discard_errors = discard_errors
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        # 空闲连接 [(连接, 建立时间, 归还时间)]，后归还的先借出
+        self.idle = []
+        self.in_use = 0
+        self.acquired_count = 0
+        self.created_count = 0
+        self.recycled_count = 0
+        self.broken_count = 0
+        self.timeout_count = 0
+        self.wait_total = 0
+        self.wait_max = 0
+
+    @contextmanager
+    def connection(self):
+        """
+        借出一个连接，with块结束后归还
+        """
+        conn, created_at = self._acquire()
+        try:
+            yield conn
+        except self.discard_errors:
+            self._release(conn, created_at, broken=True)
+            raise
+        except BaseException:
+            self._release(conn, created_at)
+            raise
+        else:
+            self._release(conn, created_at)
+
+    def _acquire(self):
+        started = time.time()
+        if not self.slots.acquire(timeout=self.timeout):
+            with self.lock:
+                self.timeout_count += 1
+            raise PoolTimeout(f'等待数据库连接超过 {self.timeout} 秒（连接池大小 {self.max_size}）')
+        waited = time.time() - started
+        with self.lock:
+            self.in_use += 1
+            self.acquired_count += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+        try:
+            while True:
+                with self.lock:
+                    entry = self.idle.pop() if self.idle else None
+                if entry is None:
+                    break
+                conn, created_at, released_at = entry
+                if time.time() - released_at < self.ping_interval:
+                    return conn, created_at
+                # 空闲较久的连接先检查是否仍然可用
+                try:
+                    conn.ping()
+                    return conn, created_at
+                except Exception:
+                    with self.lock:
+                        self.broken_count += 1
+                    self._close(conn)
+
+            conn = self.connect()
+            with self.lock:
+                self.created_count += 1
+            return conn, time.time()
+        except BaseException:
+            with self.lock:
+                self.in_use -= 1
+            self.slots.release()
+            raise
+
+    def _release(self, conn, created_at, broken=False):
+        recycle = not broken and time.time() - created_at >= self.recycle
+        if broken or recycle:
+            self._close(conn)
+        with self.lock:
+            if broken:
+                self.broken_count += 1
+            elif recycle:
+                self.recycled_count += 1
+            else:
+                self.idle.append((conn, created_at, time.time()))
+            self.in_use -= 1
+        self.slots.release()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        # 关闭所有空闲连接
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn, _, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'max_size': self.max_size,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'acquired': self.acquired_count,
+                'created': self.created_count,
+                'recycled': self.recycled_count,
+                'broken': self.broken_count,
+                'timeouts': self.timeout_count,
+                'wait_avg_ms': round(self.wait_total / self.acquired_count * 1000, 3) if self.acquired_count else 0,
+                'wait_max_ms': round(self.wait_max * 1000, 3),
+            }
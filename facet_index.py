@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 内存筛选索引
+
+Web应用把书籍的标签、作者和数值列读入内存，按标签、作者、评分、月点击、字数组合筛选：
+- 每个标签、作者对应一个有序的书籍位置数组（倒排表），筛选时展开为位图后按位与
+- 评分、月点击、字数各保存一份排好序的数值数组，范围条件用二分查找定位
+筛选结果和各维度的计数（facet），以及任意两列的二维直方图都在numpy数组上计算，不访问数据库。
+数据库中的数据版本（data_version表）变化后在后台线程重新加载。
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from dashboard_queries import get_query
+
+# 范围筛选和排序的数值列: 参数名 -> books表中的列在facet_books查询结果中的位置
+RANGE_COLUMNS = {'rating': 2, 'clicks': 3, 'words': 4}
+
+
+def _postings(codes, count):
+    # 把每行的编号转换为倒排表: 返回 (按编号排序的行号, 每个编号在其中的起始位置)
+    order = np.argsort(codes, kind='stable').astype(np.int32)
+    starts = np.searchsorted(codes[order], np.arange(count + 1))
+    return order, starts
+
+
+def _top(counts, names, size):
+    # 计数最多的size项，计数为0的不返回
+    size = min(size, len(counts))
+    if not size:
+        return []
+    top = np.argpartition(-counts, size - 1)[:size]
+    top = top[np.argsort(-counts[top], kind='stable')]
+    return [{'name': names[i], 'count': int(counts[i])} for i in top if counts[i] > 0]
+
+
+class FacetIndex:
+    """
+    书籍筛选索引，用facet_books、facet_book_tags、facet_tags三条查询的结果构建
+
+    书籍按ID排序后的下标称为位置，所有数组都以位置表示书籍。
+    """
+    def __init__(self, books, book_tags, tags, version=None):
+        self.version = version
+        self.ids = np.array([row[0] for row in books], dtype=np.int64)
+
+        # 作者
+        authors = np.array([row[1] or '' for row in books], dtype=object)
+        author_names, author_codes = np.unique(authors, return_inverse=True)
+        self.author_names = list(author_names)
+        self.author_codes = np.asarray(author_codes, dtype=np.int32)
+        self.author_lookup = {name: code for code, name in enumerate(self.author_names) if name}
+        self.author_order, self.author_starts = _postings(self.author_codes, len(self.author_names))
+
+        # 标签，(位置, 标签编号)对用于计算标签的计数
+        self.tag_names = [name for _, name in tags]
+        self.tag_lookup = {name: code for code, name in enumerate(self.tag_names)}
+        tag_codes = {tag_id: code for code, (tag_id, _) in enumerate(tags)}
+        links = np.array([(book_id, tag_codes.get(tag_id, -1)) for book_id, tag_id in book_tags],
+                         dtype=np.int64).reshape(-1, 2)
+        positions = np.searchsorted(self.ids, links[:, 0])
+        found = (positions < len(self.ids)) & (links[:, 1] >= 0)
+        found[found] = self.ids[positions[found]] == links[found, 0]
+        self.link_positions = positions[found].astype(np.int32)
+        self.link_tags = links[found, 1].astype(np.int32)
+        order, self.tag_starts = _postings(self.link_tags, len(self.tag_names))
+        self.tag_positions = self.link_positions[order]
+        # 按书籍排列的标签编号，计数时只读取选中书籍的标签
+        order, self.book_tag_starts = _postings(self.link_positions, len(self.ids))
+        self.book_tags = self.link_tags[order]
+
+        # 数值列，NULL不参与范围筛选和排序
+        self.values = {}
+        self.sorted_positions = {}
+        self.sorted_values = {}
+        for name, column in RANGE_COLUMNS.items():
+            values = np.array([np.nan if row[column] is None else float(row[column]) for row in books], dtype=np.float64)
+            order = np.argsort(values, kind='stable')
+            order = order[~np.isnan(values[order])].astype(np.int32)
+            self.values[name] = values
+            self.sorted_positions[name] = order
+            self.sorted_values[name] = values[order]
+
+        # 评分分布，与汇总表rating_buckets一致，满分10分归入9；这里加1后保存，0表示无评分
+        rating = self.values['rating']
+        self.rating_buckets = np.where(np.isnan(rating), 0, np.minimum(np.floor(np.nan_to_num(rating)), 9) + 1).astype(np.int8)
+
+        # 全部书籍的计数，选中超过一半时用它减去未选中书籍的计数
+        self.total_counts = self._counts(np.arange(len(self.ids)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, cursor, dialect='mysql'):
+        """
+        从数据库加载，cursor须返回元组形式的行
+        """
+        cursor.execute(get_query('data_version', dialect))
+        row = cursor.fetchone()
+        version = row[0] if row else None
+        cursor.execute(get_query('facet_books', dialect))
+        books = cursor.fetchall()
+        cursor.execute(get_query('facet_book_tags', dialect))
+        book_tags = cursor.fetchall()
+        cursor.execute(get_query('facet_tags', dialect))
+        tags = cursor.fetchall()
+        return cls(books, book_tags, tags, version)
+
+    def _mask(self, positions):
+        mask = np.zeros(len(self.ids), dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def _range(self, name, low, high):
+        values = self.sorted_values[name]
+        start = 0 if low is None else np.searchsorted(values, low, side='left')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right')
+        return self.sorted_positions[name][start:end]
+
+    def filter(self, tags=(), authors=(), ranges=None):
+        """
+        返回满足条件的书籍位图：同时带有tags中的所有标签、作者是authors中的任意一个、
+        数值列在ranges给出的 {列: (最小值, 最大值)} 范围内（None表示不限）
+        """
+        mask = np.ones(len(self.ids), dtype=bool)
+        for tag in tags:
+            code = self.tag_lookup.get(tag)
+            if code is None:
+                return np.zeros(len(self.ids), dtype=bool)
+            mask &= self._mask(self.tag_positions[self.tag_starts[code]:self.tag_starts[code + 1]])
+
+        if authors:
+            codes = [self.author_lookup[author] for author in authors if author in self.author_lookup]
+            mask &= self._mask(np.concatenate([
+                self.author_order[self.author_starts[code]:self.author_starts[code + 1]] for code in codes
+            ] or [np.empty(0, dtype=np.int32)]))
+
+        for name, (low, high) in (ranges or {}).items():
+            if low is not None or high is not None:
+                mask &= self._mask(self._range(name, low, high))
+        return mask
+
+    def _counts(self, positions):
+        # 这些书籍中各标签、作者、评分分组的书籍数
+        starts = self.book_tag_starts[positions]
+        lengths = self.book_tag_starts[positions + 1] - starts
+        links = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(lengths.sum())
+        return (
+            np.bincount(self.book_tags[links], minlength=len(self.tag_names)),
+            np.bincount(self.author_codes[positions], minlength=len(self.author_names)),
+            np.bincount(self.rating_buckets[positions], minlength=11),
+        )
+
+    def facets(self, mask, size=20):
+        # 筛选结果中各标签、作者的书籍数和评分分布，只统计选中和未选中中较少的一方
+        if np.count_nonzero(mask) * 2 > len(mask):
+            tag_counts, author_counts, rating_counts = (
+                total - counts for total, counts in zip(self.total_counts, self._counts(np.flatnonzero(~mask)))
+            )
+        else:
+            tag_counts, author_counts, rating_counts = self._counts(np.flatnonzero(mask))
+        if self.author_names and self.author_names[0] == '':
+            author_counts[0] = 0
+        return {
+            'tags': _top(tag_counts, self.tag_names, size),
+            'authors': _top(author_counts, self.author_names, size),
+            'ratings': [
+                {'rating_range': f'{bucket}-{bucket + 1}', 'book_count': int(count)}
+                for bucket, count in enumerate(rating_counts[1:]) if count
+            ],
+        }
+
+    def query(self, tags=(), authors=(), ranges=None, sort='id', limit=20, offset=0, facet_size=20):
+        """
+        组合筛选，返回 {'total': 总数, 'ids': 当前页的书籍ID, 'facets': 各维度计数}
+
+        sort为id（ID升序）或RANGE_COLUMNS中的列（降序，没有该值的书籍排在最后）
+        """
+        mask = self.filter(tags, authors, ranges)
+        if sort in RANGE_COLUMNS:
+            order = self.sorted_positions[sort][::-1]
+            positions = order[mask[order]]
+            if len(positions) < offset + limit:
+                missing = np.flatnonzero(mask & np.isnan(self.values[sort]))
+                positions = np.concatenate([positions, missing])
+        else:
+            positions = np.flatnonzero(mask)
+        return {
+            'total': int(np.count_nonzero(mask)),
+            'ids': [int(book_id) for book_id in self.ids[positions[offset:offset + limit]]],
+            'facets': self.facets(mask, facet_size),
+        }
+
+    def histogram(self, mask, x='clicks', y='rating', bins=(40, 20), log_x=False, ranges=None, max_points=0):
+        """
+        选中书籍在x、y两列上的二维直方图，没有x或y值的书籍不计入
+
+        ranges中给出的 {列: (最小值, 最大值)} 作为坐标轴范围，没有给出时取选中书籍的最小、最大值；
+        log_x时x轴按log10(x + 1)等宽分箱，返回的边界仍为原始数值。
+        选中书籍不超过max_points本时mode为points，直接返回各点 [ID, x, y]（放大查看时使用）；
+        否则mode为bins，返回各轴的分箱边界和非空格子 [x下标, y下标, 书籍数]，结果大小只取决于分箱数。
+        """
+        positions = np.flatnonzero(mask & ~np.isnan(self.values[x]) & ~np.isnan(self.values[y]))
+        xs = self.values[x][positions]
+        ys = self.values[y][positions]
+        result = {'x': x, 'y': y, 'total': int(len(positions)), 'log_x': bool(log_x)}
+        if len(positions) <= max_points:
+            result['mode'] = 'points'
+            result['points'] = [
+                [int(book_id), float(a), float(b)] for book_id, a, b in zip(self.ids[positions], xs, ys)
+            ]
+            return result
+
+        def axis_range(name, values):
+            low, high = (ranges or {}).get(name, (None, None))
+            low = float(values.min()) if low is None else low
+            high = float(values.max()) if high is None else high
+            return low, (high if high > low else low + 1)
+
+        x_range = axis_range(x, xs)
+        y_range = axis_range(y, ys)
+        if log_x:
+            xs = np.log10(np.maximum(xs, 0) + 1)
+            x_range = tuple(np.log10(max(value, 0) + 1) for value in x_range)
+        counts, x_edges, y_edges = np.histogram2d(xs, ys, bins=bins, range=(x_range, y_range))
+        if log_x:
+            x_edges = 10 ** x_edges - 1
+        cells = np.argwhere(counts > 0)
+        result['mode'] = 'bins'
+        result['x_edges'] = [round(float(edge), 4) for edge in x_edges]
+        result['y_edges'] = [round(float(edge), 4) for edge in y_edges]
+        result['cells'] = [[int(i), int(j), int(counts[i, j])] for i, j in cells]
+        return result
+
+
+class LiveFacetIndex:
+    """
+    随数据版本刷新的FacetIndex
+
+    第一次使用时同步加载；之后每隔check_interval秒检查一次数据版本，
+    有变化时在后台线程重新加载并替换，加载期间继续使用旧索引。
+    """
+    def __init__(self, connect, dialect='mysql', check_interval=30):
+        # connect: 返回新数据库连接的函数，连接的游标须返回元组形式的行
+        self.connect = connect
+        self.dialect = dialect
+        self.check_interval = check_interval
+        self.index = None
+        self.checked_at = 0
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def get(self, version=None):
+        # version为调用方已经知道的当前数据版本，与索引不同时不等check_interval立即在后台刷新
+        if self.index is None:
+            with self.lock:
+                if self.index is None:
+                    self.index = self._load()
+                    self.checked_at = time.time()
+        elif ((version is not None and version != self.index.version)
+              or time.time() - self.checked_at >= self.check_interval) and not self.refreshing:
+            self.checked_at = time.time()
+            self.refreshing = True
+            threading.Thread(target=self._refresh, daemon=True).start()
+        return self.index
+
+    def _load(self):
+        conn = self.connect()
+        try:
+            return FacetIndex.load(conn.cursor(), self.dialect)
+        finally:
+            conn.close()
+
+    def _refresh(self):
+        try:
+            conn = self.connect()
+            try:
+                cursor = conn.cursor()
+                cursor.execute(get_query('data_version', self.dialect))
+                row = cursor.fetchone()
+            finally:
+                conn.close()
+            if row is None or row[0] != self.index.version:
+                self.index = self._load()
+        finally:
+            self.refreshing = False
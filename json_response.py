@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - JSON响应
+
+Web应用各接口的JSON响应：
+- 安装了orjson时用orjson序列化，否则用标准库json，两者都输出紧凑的UTF-8，内容一致
+- 正文超过min_size字节的响应按请求的Accept-Encoding压缩，优先br（需要安装brotli），其次gzip
+- 列表接口可以返回列式格式 {"columns": [...], "data": [[...], ...]}，每个键只出现一次
+"""
+
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import Response, request
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(value):
+    # DECIMAL转换为浮点数，时间与flask.jsonify一样输出为HTTP日期格式（如"Mon, 01 Jan 2024 12:00:00 GMT"）
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return http_date(value)
+    raise TypeError(f'无法序列化的类型: {type(value).__name__}')
+
+
+def dumps(data):
+    """
+    序列化为JSON，返回bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def json_response(data):
+    """
+    代替flask.jsonify的JSON响应
+    """
+    return Response(dumps(data), mimetype='application/json')
+
+
+def rows_payload(columns, rows, columnar=False):
+    """
+    元组游标读取的行：columnar为True时返回列式格式，否则返回每行一个字典的列表
+    """
+    if columnar:
+        return {'columns': list(columns), 'data': [list(row) for row in rows]}
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _compress(body, encoding, gzip_level, brotli_quality):
+    if encoding == 'br':
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+def compress_response(response, min_size=1024, gzip_level=6, brotli_quality=4):
+    """
+    按Accept-Encoding压缩JSON响应，用作Flask的after_request钩子
+
+    压缩后的强ETag加上编码后缀（如"v7-gzip"），不同编码的正文不会共用同一个ETag。
+    """
+    if (response.status_code != 200 or response.mimetype != 'application/json'
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+    accepted = [encoding for encoding in encodings if request.accept_encodings[encoding]]
+    if not accepted:
+        return response
+    encoding = accepted[0]
+    response.set_data(_compress(body, encoding, gzip_level, brotli_quality))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 数据库维护工具
+
+子命令：
+    migrate             升级表结构（数值列、仪表盘索引、汇总表），并根据原始文本回填数值列
+    rebuild-aggregates  根据明细数据全量重建仪表盘汇总表（标签、评分分布、作者）
+    downsample          把较早的指标历史合并为每周/每月一个分区
+    similar             为新书计算相似书籍（--full 全量重新计算），需要安装scipy
+    replay              把死信文件中写入失败的item重新批量写入数据库，仍然失败的保留在文件中
+
+使用方法：
+    python manage_db.py migrate
+    python manage_db.py migrate --backend mysql
+    python manage_db.py rebuild-aggregates
+    python manage_db.py downsample --older-than 90 --granularity month
+    python manage_db.py similar
+    python manage_db.py replay --backend mysql
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pymysql
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu import data_version, settings
+from Feilu.db_pipeline import FeiluDatabasePipeline
+from Feilu.dead_letter import DeadLetterStore
+from Feilu.mysql_pipeline import FeiluMySQLPipeline
+from Feilu.storage import prepare
+
+
+def open_sqlite(args):
+    """
+    打开SQLite数据库，返回设置好连接的FeiluDatabasePipeline
+    """
+    pipeline = FeiluDatabasePipeline(args.db_path)
+    pipeline.conn = sqlite3.connect(args.db_path)
+    pipeline.cursor = pipeline.conn.cursor()
+    for name, value in pipeline.PRAGMAS:
+        pipeline.cursor.execute(f"PRAGMA {name} = {value}")
+    return pipeline
+
+
+def open_mysql(args):
+    """
+    打开MySQL数据库，返回设置好连接的FeiluMySQLPipeline
+    """
+    pipeline = FeiluMySQLPipeline(
+        settings.MYSQL_HOST, settings.MYSQL_PORT, settings.MYSQL_DATABASE,
+        settings.MYSQL_USER, settings.MYSQL_PASSWORD, settings.MYSQL_CHARSET
+    )
+    pipeline.conn = pymysql.connect(
+        host=settings.MYSQL_HOST,
+        port=settings.MYSQL_PORT,
+        user=settings.MYSQL_USER,
+        password=settings.MYSQL_PASSWORD,
+        database=settings.MYSQL_DATABASE,
+        charset=settings.MYSQL_CHARSET
+    )
+    pipeline.cursor = pipeline.conn.cursor()
+    return pipeline
+
+
+def migrate(pipeline, args):
+    started = time.time()
+    pipeline.create_tables()
+    added = pipeline.migrate_tables()
+    if added:
+        print(f"已升级表结构: {', '.join(added)}")
+    else:
+        print("表结构已是最新")
+
+    count = pipeline.backfill_numeric()
+    print(f"已回填数值列: {count} 本书籍, 耗时 {time.time() - started:.2f} 秒")
+
+    # 指标历史表是本次新建的，基准分区要用回填后的数值重新记录
+    if count and 'book_metrics' in added:
+        pipeline.metrics.reset(pipeline.cursor)
+        pipeline.conn.commit()
+
+    # 评分数值可能发生变化，汇总表需要重建
+    rebuild_aggregates(pipeline, args)
+
+
+def rebuild_aggregates(pipeline, args):
+    started = time.time()
+    pipeline.create_tables()
+    pipeline.migrate_tables()
+    pipeline.rebuild_aggregates()
+    print(f"已重建仪表盘汇总表, 耗时 {time.time() - started:.2f} 秒")
+
+
+def downsample(pipeline, args):
+    started = time.time()
+    before = (datetime.now() - timedelta(days=args.older_than)).strftime('%Y-%m-%d %H:%M:%S')
+    removed = pipeline.metrics.downsample(pipeline.cursor, before, args.granularity)
+    pipeline.conn.commit()
+    print(f"已合并 {before} 之前的指标历史: 删除 {removed} 个分区, 耗时 {time.time() - started:.2f} 秒")
+
+
+def similar(pipeline, args):
+    # 只有这个命令依赖scipy
+    from Feilu.similarity import SimilarBooks
+
+    started = time.time()
+    pipeline.create_tables()
+    pipeline.migrate_tables()
+    engine = SimilarBooks('%s' if args.backend == 'mysql' else '?', k=args.top_k)
+    if args.full:
+        count = engine.rebuild(pipeline.cursor)
+        message = f"已全量计算相似书籍: {count} 本书籍"
+    else:
+        count = engine.update(pipeline.cursor)
+        message = f"已为新书计算相似书籍: {count} 本书籍"
+    pipeline.conn.commit()
+    print(f"{message}, 耗时 {time.time() - started:.2f} 秒")
+
+
+def replay(pipeline, args):
+    started = time.time()
+    pipeline.create_tables()
+    pipeline.migrate_tables()
+    pipeline.tag_cache.load(pipeline.cursor)
+
+    store = DeadLetterStore(args.dead_letter_path)
+    entries = store.read()
+    selected = [entry for entry in entries if entry.get('backend') == args.backend]
+    kept = [entry for entry in entries if entry.get('backend') != args.backend]
+
+    # 按失败时所在的爬取分组，指标变化记入原来的分区；分区已被合并删除时不记录指标
+    groups = {}
+    for entry in selected:
+        groups.setdefault(entry.get('crawl'), []).append(entry)
+    p = pipeline.dialect.placeholder
+    for crawl_id, group in groups.items():
+        pipeline.crawl_id = None
+        if crawl_id is not None:
+            pipeline.cursor.execute(f'SELECT id FROM crawls WHERE id = {p}', (crawl_id,))
+            if pipeline.cursor.fetchone():
+                pipeline.crawl_id = crawl_id
+
+        # 整批写入失败时逐条重试，仍然失败的记录更新错误信息后写回死信文件
+        for i in range(0, len(group), args.batch_size):
+            batch = group[i:i + args.batch_size]
+            if replay_batch(pipeline, batch) is None:
+                continue
+            for entry in batch:
+                error = replay_batch(pipeline, [entry])
+                if error is not None:
+                    kept.append(dict(entry, error=type(error).__name__, message=str(error)))
+
+    store.rewrite(kept)
+    failed = len(kept) - (len(entries) - len(selected))
+    print(f"已重新写入死信记录: {len(selected) - failed} 条, 仍然失败: {failed} 条, 耗时 {time.time() - started:.2f} 秒")
+
+
+def replay_batch(pipeline, entries):
+    # 在一个事务中写入，返回异常（成功时为None）
+    try:
+        pipeline.write_batch(pipeline.cursor, [prepare(DeadLetterStore.to_item(entry)) for entry in entries])
+        pipeline.conn.commit()
+        pipeline.tag_cache.commit()
+    except Exception as e:
+        pipeline.conn.rollback()
+        pipeline.tag_cache.rollback()
+        return e
+    return None
+
+
+COMMANDS = {
+    'migrate': migrate,
+    'rebuild-aggregates': rebuild_aggregates,
+    'downsample': downsample,
+    'similar': similar,
+    'replay': replay,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='飞卢小说数据库维护工具')
+    parser.add_argument('command', choices=list(COMMANDS), help='要执行的操作')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite', help='数据库类型')
+    parser.add_argument('--db-path', default=settings.DATABASE_PATH, help='SQLite数据库文件路径')
+    parser.add_argument('--older-than', type=int, default=90, help='downsample: 合并多少天之前的历史')
+    parser.add_argument('--granularity', choices=['day', 'week', 'month'], default='month',
+                        help='downsample: 合并后每个分区的时间跨度')
+    parser.add_argument('--full', action='store_true', help='similar: 全量重新计算所有书籍')
+    parser.add_argument('--top-k', type=int, default=10, help='similar: 每本书保存的相似书籍数量')
+    parser.add_argument('--dead-letter-path', default=settings.DEAD_LETTER_PATH, help='replay: 死信文件路径')
+    parser.add_argument('--batch-size', type=int, default=500, help='replay: 每批写入的记录数')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"飞卢小说数据库维护 - {args.command} ({args.backend})")
+    print("=" * 60)
+
+    pipeline = open_mysql(args) if args.backend == 'mysql' else open_sqlite(args)
+    try:
+        COMMANDS[args.command](pipeline, args)
+        # 数据已修改，通知Web应用刷新内存中的索引
+        data_version.bump(pipeline.cursor)
+        pipeline.conn.commit()
+    finally:
+        pipeline.conn.close()
+
+
+if __name__ == "__main__":
+    main()
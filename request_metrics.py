@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 接口耗时统计
+
+按接口（路由规则）统计每个请求的：
+- 请求耗时（直方图）
+- 数据库时间和查询次数：计时游标的execute和fetch*耗时之和
+- 返回的行数：从计时游标读取的行数
+- 响应正文的字节数：压缩前序列化后的大小，流式响应不计
+执行时间超过slow_query_seconds的查询连同SQL、参数和所属接口保存在最近slow_log_size条的慢查询日志中。
+统计结果以Prometheus文本格式输出。
+
+每个请求只在当前线程的局部变量上累加，请求结束时加一次锁合并到接口的统计中，可以一直开启。
+"""
+
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+# 请求耗时直方图的上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 慢查询日志中参数的最大长度，超过时保存截断后的字符串
+MAX_PARAMS_LENGTH = 1000
+
+
+class EndpointStats:
+    """
+    一个接口的累计统计
+    """
+    __slots__ = ('buckets', 'count', 'latency', 'db_time', 'queries', 'rows', 'bytes', 'statuses')
+
+    def __init__(self, bucket_count):
+        # 每个直方图区间的请求数，最后一个为超过最大上界的请求
+        self.buckets = [0] * (bucket_count + 1)
+        self.count = 0
+        self.latency = 0.0
+        self.db_time = 0.0
+        self.queries = 0
+        self.rows = 0
+        self.bytes = 0
+        self.statuses = {}
+
+
+class TimedCursorMixin:
+    """
+    统计execute和fetch*耗时及读取行数的游标，与pymysql或sqlite3的游标类组合使用，见RequestMetrics.cursor_class()
+    """
+    metrics = None
+    _measuring = False
+
+    def execute(self, query, args=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query) if args is None else super().execute(query, args)
+        finally:
+            self.metrics.record_query(query, args, time.perf_counter() - started)
+
+    def _measure(self, fetch, one, *args):
+        # pymysql的SSCursor.fetchall()内部调用fetchone()，只统计最外层的调用
+        if self._measuring:
+            return fetch(*args)
+        self._measuring = True
+        started = time.perf_counter()
+        try:
+            result = fetch(*args)
+        finally:
+            self._measuring = False
+        rows = (0 if result is None else 1) if one else len(result)
+        self.metrics.record_fetch(rows, time.perf_counter() - started)
+        return result
+
+    def fetchone(self):
+        return self._measure(super().fetchone, True)
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._measure(super().fetchmany, False)
+        return self._measure(super().fetchmany, False, size)
+
+    def fetchall(self):
+        return self._measure(super().fetchall, False)
+
+
+class RequestMetrics:
+    """
+    Web应用的接口耗时统计和慢查询日志
+
+    init_app()注册请求钩子；数据库连接使用cursor_class()生成的计时游标后才会统计数据库时间和行数。
+    不在请求中执行的查询（如后台刷新筛选索引）只记录慢查询。
+    """
+    def __init__(self, slow_query_seconds=0.2, slow_log_size=100, buckets=DEFAULT_BUCKETS):
+        self.slow_query_seconds = slow_query_seconds
+        self.buckets = tuple(buckets)
+        self.endpoints = {}
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.slow_count = 0
+        self.lock = threading.Lock()
+        # 当前线程正在处理的请求
+        self.local = threading.local()
+
+    def init_app(self, app):
+        # Flask按注册的相反顺序调用after_request，在压缩钩子之后注册才能得到压缩前的大小
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def cursor_class(self, base):
+        """
+        返回base游标类的计时版本
+        """
+        return type(f'Timed{base.__name__}', (TimedCursorMixin, base), {'metrics': self})
+
+    def _before_request(self):
+        self.local.current = {
+            'started': time.perf_counter(),
+            'db_time': 0.0,
+            'queries': 0,
+            'rows': 0,
+            'bytes': 0,
+            'status': 500,
+        }
+
+    def _after_request(self, response):
+        current = getattr(self.local, 'current', None)
+        if current is not None:
+            current['status'] = response.status_code
+            if not response.is_streamed:
+                current['bytes'] = response.calculate_content_length() or 0
+        return response
+
+    def _teardown_request(self, exc=None):
+        current = getattr(self.local, 'current', None)
+        if current is None:
+            return
+        self.local.current = None
+        rule = request.url_rule
+        self.record_request(rule.rule if rule is not None else 'unmatched', current,
+                            time.perf_counter() - current['started'])
+
+    def record_request(self, endpoint, current, latency):
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats(len(self.buckets))
+            stats.buckets[bisect.bisect_left(self.buckets, latency)] += 1
+            stats.count += 1
+            stats.latency += latency
+            stats.db_time += current['db_time']
+            stats.queries += current['queries']
+            stats.rows += current['rows']
+            stats.bytes += current['bytes']
+            stats.statuses[current['status']] = stats.statuses.get(current['status'], 0) + 1
+
+    def record_query(self, query, args, seconds):
+        current = getattr(self.local, 'current', None)
+        if current is not None:
+            current['db_time'] += seconds
+            current['queries'] += 1
+        if seconds >= self.slow_query_seconds:
+            self._log_slow_query(query, args, seconds)
+
+    def record_fetch(self, rows, seconds):
+        current = getattr(self.local, 'current', None)
+        if current is not None:
+            current['db_time'] += seconds
+            current['rows'] += rows
+
+    def _log_slow_query(self, query, args, seconds):
+        try:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        except RuntimeError:
+            # 不在请求中（后台线程）
+            endpoint = None
+        if args is not None and len(repr(args)) > MAX_PARAMS_LENGTH:
+            args = repr(args)[:MAX_PARAMS_LENGTH] + '...'
+        entry = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'endpoint': endpoint,
+            'seconds': round(seconds, 4),
+            'sql': ' '.join(query.split()),
+            'params': args,
+        }
+        with self.lock:
+            self.slow_log.append(entry)
+            self.slow_count += 1
+        logger.warning(f"慢查询 {seconds:.3f} 秒（{endpoint}）: {entry['sql'][:200]}")
+
+    def slow_queries(self):
+        # 最近的慢查询，最新的在前
+        with self.lock:
+            return list(reversed(self.slow_log))
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+            self.slow_log.clear()
+            self.slow_count = 0
+
+    def prometheus(self, prefix='feilu'):
+        """
+        Prometheus文本格式（text/plain; version=0.0.4）的统计结果
+        """
+        with self.lock:
+            endpoints = sorted(
+                (endpoint, stats.count, list(stats.buckets), stats.latency, stats.db_time,
+                 stats.queries, stats.rows, stats.bytes, dict(stats.statuses))
+                for endpoint, stats in self.endpoints.items()
+            )
+            slow_count = self.slow_count
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for suffix, labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape_label(label)}"' for key, label in labels)
+                lines.append(f'{prefix}_{name}{suffix}{{{label_text}}} {value}' if labels
+                             else f'{prefix}_{name}{suffix} {value}')
+
+        metric('http_requests_total', 'counter', '按接口和状态码统计的请求数', [
+            ('', (('endpoint', endpoint), ('status', status)), count)
+            for endpoint, _, _, _, _, _, _, _, statuses in endpoints
+            for status, count in sorted(statuses.items())
+        ])
+
+        samples = []
+        for endpoint, count, buckets, latency, *_ in endpoints:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), buckets):
+                cumulative += bucket
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                samples.append(('_bucket', (('endpoint', endpoint), ('le', le)), cumulative))
+            samples.append(('_sum', (('endpoint', endpoint),), _format(latency)))
+            samples.append(('_count', (('endpoint', endpoint),), count))
+        metric('http_request_duration_seconds', 'histogram', '请求耗时（秒）', samples)
+
+        for index, name, help_text in (
+            (4, 'db_query_duration_seconds_total', '请求中数据库查询和读取结果的总耗时（秒）'),
+            (5, 'db_queries_total', '请求中执行的查询数'),
+            (6, 'db_rows_total', '请求中从数据库读取的行数'),
+            (7, 'http_response_bytes_total', '响应正文压缩前的字节数，流式响应不计'),
+        ):
+            metric(name, 'counter', help_text, [
+                ('', (('endpoint', entry[0]),), _format(entry[index])) for entry in endpoints
+            ])
+
+        metric('slow_queries_total', 'counter', f'执行时间超过{self.slow_query_seconds}秒的查询数',
+               [('', (), slow_count)])
+        return '\n'.join(lines) + '\n'
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+def prometheus_gauges(prefix, name, help_text, values):
+    """
+    把 {指标: 数值} 输出为一组Prometheus gauge，如连接池和响应缓存的状态，非数值的项跳过
+    """
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines.append(f'# HELP {prefix}_{name}_{key} {help_text}: {key}')
+        lines.append(f'# TYPE {prefix}_{name}_{key} gauge')
+        lines.append(f'{prefix}_{name}_{key} {_format(value)}')
+    return '\n'.join(lines) + '\n' if lines else ''
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 接口响应缓存
+
+仪表盘接口的数据只在爬取写入后才会变化。响应正文按数据版本（data_version表）缓存：
+- 进程内的LRU缓存，最多保存max_entries个响应
+- 可选的共享缓存（本机SQLite文件），多个Web进程共用，一个进程计算后其他进程直接读取
+数据版本变化（爬取结束、运行manage_db.py）后旧版本的缓存不再使用；ttl是额外的过期时间上限。
+数据版本每隔version_interval秒最多查询一次。
+除整个响应外，也可以用value()缓存接口中单独的一个值（如分页接口的书籍总数）。
+缓存的响应以数据版本作为ETag，浏览器重新验证时数据没有变化则返回304，不再传输正文。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import make_response, request
+
+
+class LRUCache:
+    """
+    线程安全的LRU缓存，值为 (数据版本, 过期时间, 响应正文)
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version or entry[1] <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, version, body, expires_at):
+        with self.lock:
+            self.entries[key] = (version, expires_at, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SharedCache:
+    """
+    本机多个进程共用的缓存，保存在SQLite文件中，每个线程使用自己的连接
+    """
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                body BLOB NOT NULL
+            )
+            ''')
+            self.local.conn = conn
+        return conn
+
+    def get(self, key, version):
+        row = self._conn().execute(
+            'SELECT body, expires_at FROM response_cache WHERE key = ? AND version = ? AND expires_at > ?',
+            (key, str(version), time.time())
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set(self, key, version, body, expires_at):
+        self._conn().execute(
+            'INSERT OR REPLACE INTO response_cache (key, version, expires_at, body) VALUES (?, ?, ?, ?)',
+            (key, str(version), expires_at, body)
+        )
+
+    def purge(self, version):
+        # 删除其他版本和已过期的缓存
+        self._conn().execute(
+            'DELETE FROM response_cache WHERE version != ? OR expires_at <= ?', (str(version), time.time())
+        )
+
+
+class ResponseCache:
+    """
+    按数据版本缓存Flask接口的JSON响应
+
+    load_version: 返回当前数据版本的函数，出错时按ttl过期
+    """
+    def __init__(self, load_version, ttl=600, max_entries=256, version_interval=5, shared_path=None):
+        self.load_version = load_version
+        self.ttl = ttl
+        self.version_interval = version_interval
+        self.local = LRUCache(max_entries)
+        self.shared = SharedCache(shared_path) if shared_path else None
+        self.current_version = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+        self.hit_count = 0
+        self.shared_hit_count = 0
+        self.miss_count = 0
+        self.not_modified_count = 0
+
+    def version(self):
+        if time.time() - self.checked_at < self.version_interval:
+            return self.current_version
+        with self.lock:
+            if time.time() - self.checked_at < self.version_interval:
+                return self.current_version
+            try:
+                version = self.load_version()
+            except Exception:
+                version = self.current_version
+            if version != self.current_version:
+                # 数据已更新，旧版本的缓存全部作废
+                self.local.clear()
+                if self.shared:
+                    try:
+                        self.shared.purge(version)
+                    except sqlite3.Error:
+                        pass
+            self.current_version = version
+            self.checked_at = time.time()
+            return version
+
+    def get(self, key, version):
+        body = self.local.get(key, version)
+        if body is not None:
+            self.hit_count += 1
+            return body
+        if self.shared:
+            try:
+                entry = self.shared.get(key, version)
+            except sqlite3.Error:
+                entry = None
+            if entry is not None:
+                self.shared_hit_count += 1
+                self.local.set(key, version, entry[0], entry[1])
+                return entry[0]
+        self.miss_count += 1
+        return None
+
+    def set(self, key, version, body):
+        expires_at = time.time() + self.ttl
+        self.local.set(key, version, body, expires_at)
+        if self.shared:
+            try:
+                self.shared.set(key, version, body, expires_at)
+            except sqlite3.Error:
+                pass
+
+    def value(self, key, compute):
+        """
+        按数据版本缓存compute()的结果（须能JSON序列化），用于接口中可以单独复用的部分，如书籍总数
+        """
+        version = self.version()
+        body = self.get(key, version)
+        if body is not None:
+            return json.loads(body)
+        value = compute()
+        self.set(key, version, json.dumps(value).encode())
+        return value
+
+    def cached(self, view):
+        """
+        缓存接口响应的装饰器，缓存键为路径和排序后的查询参数，只缓存状态码为200且没有no-store的响应；
+        响应带有以数据版本为值的ETag，请求的If-None-Match与之相同时返回304
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = f'{request.path}?{urlencode(sorted(request.args.items(multi=True)))}'
+            version = self.version()
+            # 同一个URL在同一数据版本下的响应完全相同，数据版本可以直接作为强ETag
+            etag = f'v{version}' if version is not None else None
+            matched = self.matching_etag(etag)
+            if matched:
+                self.not_modified_count += 1
+                return self.add_etag(make_response('', 304), matched)
+
+            body = self.get(key, version)
+            if body is not None:
+                response = make_response(body)
+                response.mimetype = 'application/json'
+                response.headers['X-Cache'] = 'HIT'
+                return self.add_etag(response, etag)
+
+            response = make_response(view(*args, **kwargs))
+            response.headers['X-Cache'] = 'MISS'
+            # 接口可以用Cache-Control: no-store表示这次的响应不能缓存（如依赖的数据还没有更新）
+            if response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+                self.set(key, version, response.get_data())
+                self.add_etag(response, etag)
+            return response
+        return wrapper
+
+    @staticmethod
+    def matching_etag(etag):
+        # 请求的If-None-Match中与etag相同的值；压缩后的响应ETag带有编码后缀（如v7-gzip），同样视为相同
+        if not etag:
+            return None
+        for tag in request.if_none_match:
+            if tag == etag or tag.startswith(etag + '-'):
+                return tag
+        return None
+
+    @staticmethod
+    def add_etag(response, etag):
+        # 浏览器可以保存响应，但每次使用前都要带If-None-Match向服务器确认
+        if etag:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def stats(self):
+        return {
+            'version': self.current_version,
+            'entries': len(self.local.entries),
+            'hits': self.hit_count,
+            'shared_hits': self.shared_hit_count,
+            'misses': self.miss_count,
+            'not_modified': self.not_modified_count,
+        }
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 仪表盘汇总表测试
+
+通过SQLite数据库管道写入随机数据并模拟重复爬取（作者、评分、标签发生变化），
+检查增量维护的汇总表与全量重建的结果一致。
+
+使用方法：
+    python test_aggregates.py
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from testing_utils import SQLitePipelineTestCase, make_items
+
+
+class AggregateTablesTest(SQLitePipelineTestCase):
+    db_name = 'aggregates.db'
+
+    def write(self, items, batch_size=200):
+        for i in range(0, len(items), batch_size):
+            self.pipeline.write_items(items[i:i + batch_size])
+            self.pipeline.conn.commit()
+
+    def snapshot(self):
+        cursor = self.pipeline.cursor
+        cursor.execute('SELECT tag_id, book_count FROM tag_stats WHERE book_count > 0 ORDER BY tag_id')
+        tags = cursor.fetchall()
+        cursor.execute('SELECT bucket, book_count FROM rating_buckets WHERE book_count > 0 ORDER BY bucket')
+        buckets = cursor.fetchall()
+        cursor.execute('SELECT author, book_count, ROUND(rating_sum, 2), rating_count FROM author_stats ORDER BY author')
+        authors = cursor.fetchall()
+        return tags, buckets, authors
+
+    def assert_matches_rebuild(self):
+        incremental = self.snapshot()
+        self.pipeline.rebuild_aggregates()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_initial_load(self):
+        self.write(make_items(2000))
+        self.assert_matches_rebuild()
+
+    def test_recrawl_with_changes(self):
+        items = make_items(2000)
+        self.write(items)
+
+        # 模拟重复爬取：部分书籍更换作者、评分变化或消失、增加标签
+        rng = random.Random(7)
+        for item in rng.sample(items, 600):
+            change = rng.randint(0, 3)
+            if change == 0:
+                item['author'] = f'新作者{rng.randint(1, 50)}'
+            elif change == 1:
+                item['rating'] = f'{rng.uniform(0, 10):.1f}'
+            elif change == 2:
+                item['rating'] = ''
+            else:
+                item['tags'] = item['tags'] + [f'新标签{rng.randint(1, 20)}']
+        # 同一批次中出现重复的书籍
+        recrawl = items + rng.sample(items, 100)
+        rng.shuffle(recrawl)
+        self.write(recrawl)
+        self.assert_matches_rebuild()
+
+    def test_author_without_books_is_removed(self):
+        # 作者的书籍全部改到其他作者名下后，汇总表中不再有该作者
+        items = make_items(500)
+        self.write(items)
+        author = items[0]['author']
+        moved = [item for item in items if item['author'] == author]
+        for item in moved:
+            item['author'] = '新作者'
+        self.write(moved)
+        authors = [row[0] for row in self.snapshot()[2]]
+        self.assertNotIn(author, authors)
+        self.assertIn('新作者', authors)
+        self.assert_matches_rebuild()
+
+    def test_unchanged_recrawl_is_skipped(self):
+        items = make_items(500)
+        self.write(items)
+        before = self.snapshot()
+        self.assertEqual(self.pipeline.write_items(items), len(items))
+        self.assertEqual(before, self.snapshot())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 书籍目录流式导出测试
+
+在SQLite数据库中写入随机数据，检查NDJSON、CSV和gzip导出的内容与数据库一致，
+导出条件（爬取时间、标签）生效，以及导出过程中的内存占用不随书籍数量增长。
+
+使用方法：
+    python test_book_export.py
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from book_export import export_chunks
+from dashboard_queries import books_export_query, get_query
+from testing_utils import make_items, open_sqlite_pipeline
+
+
+class BookExportTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        pipeline = open_sqlite_pipeline(os.path.join(cls.tmpdir.name, 'export.db'))
+        pipeline.crawl_id = pipeline.metrics.start_crawl(pipeline.cursor)
+        items = make_items(5000)
+        for i in range(0, len(items), pipeline.CHUNK_SIZE):
+            pipeline.write_items(items[i:i + pipeline.CHUNK_SIZE])
+        # 第二次爬取只有前10本书的指标发生变化
+        pipeline.cursor.execute("UPDATE crawls SET started_at = '2024-01-01 00:00:00'")
+        pipeline.crawl_id = pipeline.metrics.start_crawl(pipeline.cursor)
+        for item in items[:10]:
+            item['flowers'] = '1'
+        pipeline.write_items(items[:10])
+        pipeline.conn.commit()
+        cls.conn = pipeline.conn
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cls.tmpdir.cleanup()
+
+    def export(self, fmt='ndjson', compress=False, since=None, tag=None, fetch_size=100):
+        name, params = books_export_query(since, tag)
+        cursor = self.conn.execute(get_query(name, 'sqlite'), params)
+        return b''.join(export_chunks(cursor, fmt, compress, fetch_size))
+
+    def test_ndjson(self):
+        books = [json.loads(line) for line in self.export().decode('utf-8').splitlines()]
+        self.assertEqual(len(books), 5000)
+        self.assertEqual([book['id'] for book in books], list(range(1, 5001)))
+        first = self.conn.execute('SELECT title, rating_num FROM books WHERE id = 1').fetchone()
+        self.assertEqual((books[0]['title'], books[0]['rating_num']), first)
+        tags = {row[0] for row in self.conn.execute(
+            'SELECT t.name FROM book_tags bt JOIN tags t ON t.id = bt.tag_id WHERE bt.book_id = 1'
+        )}
+        self.assertEqual(set(books[0]['tags']), tags)
+
+    def test_csv_and_gzip(self):
+        data = self.export('csv', compress=True)
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(data).decode('utf-8'))))
+        self.assertEqual(len(rows), 5000)
+        self.assertEqual(rows[-1]['title'], '测试小说4999')
+        self.assertIn('tags', rows[0])
+
+    def test_filters(self):
+        ids = lambda **kwargs: [json.loads(line)['id'] for line in self.export(**kwargs).decode('utf-8').splitlines()]
+        self.assertEqual(ids(since='2024-06-01 00:00:00'), list(range(1, 11)))
+        expected = [row[0] for row in self.conn.execute(
+            "SELECT bt.book_id FROM book_tags bt JOIN tags t ON t.id = bt.tag_id WHERE t.name = '标签1' ORDER BY 1"
+        )]
+        self.assertEqual(ids(tag='标签1'), expected)
+        self.assertEqual(ids(since='2024-06-01 00:00:00', tag='标签1'), [i for i in expected if i <= 10])
+        self.assertEqual(self.export(tag='不存在的标签'), b'')
+
+    def test_constant_memory(self):
+        # 逐块读取时内存峰值远小于导出数据的总大小
+        name, params = books_export_query()
+        cursor = self.conn.execute(get_query(name, 'sqlite'), params)
+        tracemalloc.start()
+        total = 0
+        for chunk in export_chunks(cursor, 'ndjson', fetch_size=50):
+            total += len(chunk)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertLess(peak * 10, total)
+
+
+if __name__ == '__main__':
+    unittest.main()
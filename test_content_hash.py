@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 内容哈希和重复写入测试
+
+检查内容哈希只取决于书籍字段、标签和封面URL（不受标签顺序和封面本地路径影响），
+重复爬取时内容没有变化的书籍跳过写入，images表每个封面只保留一条记录，
+以及同步下载模式下上次下载失败、这次下载成功的封面路径会补写到内容没有变化的书籍上。
+
+使用方法：
+    python test_content_hash.py
+"""
+
+import os
+import sys
+import unittest
+
+from itemadapter import ItemAdapter
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.items import FeiluItem
+from Feilu.normalize import content_hash
+from testing_utils import SQLitePipelineTestCase, make_items
+
+
+def with_cover(item, path):
+    # 同步下载模式下封面下载成功的item
+    item = FeiluItem(item)
+    item['images'] = [{'url': url, 'path': path} for url in item['image_urls']]
+    return item
+
+
+class ContentHashTest(unittest.TestCase):
+
+    def test_hash(self):
+        item = make_items(1)[0]
+        digest = content_hash(ItemAdapter(item))
+        self.assertEqual(content_hash(ItemAdapter(with_cover(item, 'full/0.jpg'))), digest)
+
+        reordered = FeiluItem(item, tags=list(reversed(item['tags'])))
+        self.assertEqual(content_hash(ItemAdapter(reordered)), digest)
+
+        for field, value in (('rating', '0.1'), ('tags', ['新标签']), ('image_urls', ['https://img.faloo.com/new.jpg'])):
+            changed = FeiluItem(item, **{field: value})
+            self.assertNotEqual(content_hash(ItemAdapter(changed)), digest, field)
+
+
+class UnchangedBooksTest(SQLitePipelineTestCase):
+    db_name = 'hash.db'
+
+    def write(self, items):
+        unchanged = self.pipeline.write_items(items)
+        self.pipeline.conn.commit()
+        return unchanged
+
+    def images(self):
+        return self.pipeline.cursor.execute('SELECT book_id, image_url, image_path FROM images ORDER BY id').fetchall()
+
+    def test_skip_unchanged(self):
+        items = make_items(5)
+        self.assertEqual(self.write(items), 0)
+        self.assertEqual(self.write(items), 5)
+        items[2]['rating'] = '0.1'
+        self.assertEqual(self.write(items), 4)
+        self.assertEqual(len(self.images()), 5)
+
+    def test_cover_path_for_unchanged_book(self):
+        # 第一次爬取时封面下载失败，只记录了url
+        items = make_items(3)
+        self.write(items)
+        self.assertEqual([path for _, _, path in self.images()], [None, None, None])
+
+        # 重复爬取时内容没有变化，第二本书的封面这次下载成功
+        items[1] = with_cover(items[1], 'full/1.jpg')
+        self.assertEqual(self.write(items), 3)
+        self.assertEqual([path for _, _, path in self.images()], [None, 'full/1.jpg', None])
+
+        # 之后又下载失败时不会清空已有的路径
+        items[1] = FeiluItem(items[1], images=[])
+        self.assertEqual(self.write(items), 3)
+        self.assertEqual(len(self.images()), 3)
+        self.assertEqual(self.images()[1][2], 'full/1.jpg')
+
+    def test_cover_path_in_batch_with_changed_books(self):
+        items = make_items(2)
+        self.write(items)
+        items[0]['rating'] = '0.1'
+        items[1] = with_cover(items[1], 'full/1.jpg')
+        self.assertEqual(self.write(items), 1)
+        self.assertEqual([path for _, _, path in self.images()], [None, 'full/1.jpg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
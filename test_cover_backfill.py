@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 封面异步回填测试
+
+检查异步回填模式下书籍item不等封面下载直接交给后续管道、封面下载完成后发出回填信号、
+还有封面在下载时爬虫不会关闭，以及数据库中先写入的空封面路径由回填补上、
+补全爬虫能找出尚未回填的封面。
+
+使用方法：
+    python test_cover_backfill.py
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+from scrapy import Spider
+from scrapy.exceptions import DontCloseSpider
+from scrapy.pipelines.images import ImagesPipeline
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.items import FeiluCoverItem, FeiluItem
+from Feilu.pipelines import FeiluImagesPipeline, FeiluPipeline
+from Feilu.signals import cover_downloaded
+from Feilu.spiders.covers import CoversSpider
+from Feilu.storage import CoverRecord
+from testing_utils import SQLitePipelineTestCase, make_items
+
+
+class AsyncBackfillTest(SQLitePipelineTestCase):
+    db_name = 'covers.db'
+
+    def test_images_pipeline(self):
+        crawler = get_crawler(Spider, {'IMAGES_STORE': self.tmpdir.name, 'IMAGES_ASYNC_BACKFILL': True})
+        spider = crawler._create_spider('books')
+        pipeline = FeiluImagesPipeline.from_crawler(crawler)
+        pipeline.open_spider(spider)
+        received = []
+
+        def on_cover_downloaded(item, spider):
+            received.append(item)
+        crawler.signals.connect(on_cover_downloaded, signal=cover_downloaded)
+
+        item = make_items(1)[0]
+        download = defer.Deferred()
+        with mock.patch.object(ImagesPipeline, 'process_item', return_value=download) as process_item:
+            # 书籍item立即返回，不带下载结果
+            self.assertIs(pipeline.process_item(item, spider), item)
+        self.assertNotIn('images', item)
+        cover = process_item.call_args[0][0]
+        self.assertIsInstance(cover, FeiluCoverItem)
+        self.assertEqual(cover['book_url'], item['book_url'])
+        self.assertEqual(cover['image_urls'], item['image_urls'])
+
+        # 封面还在下载时不关闭爬虫
+        with self.assertRaises(DontCloseSpider):
+            pipeline.spider_idle(spider)
+        cover['images'] = [{'url': cover['image_urls'][0], 'path': 'full/0.jpg'}]
+        download.callback(cover)
+        self.assertEqual(received, [cover])
+        pipeline.spider_idle(spider)
+
+    def test_storage(self):
+        items = make_items(3)
+        self.pipeline.write_items(items)
+        self.pipeline.conn.commit()
+        crawler = get_crawler(CoversSpider, {'DATABASE_PATH': self.pipeline.db_path})
+        spider = crawler._create_spider(backend='sqlite')
+        self.assertEqual(len(spider.load_pending_covers()), 3)
+
+        # 回填第一本书的封面，补全爬虫只剩下另外两本
+        cover = FeiluCoverItem(book_url=items[0]['book_url'], title=items[0]['title'],
+                               image_urls=items[0]['image_urls'],
+                               images=[{'url': items[0]['image_urls'][0], 'path': 'full/0.jpg'}])
+        self.pipeline.write_batch(self.pipeline.cursor, [CoverRecord(cover)])
+        self.pipeline.conn.commit()
+        self.assertEqual(
+            self.pipeline.cursor.execute('SELECT image_path FROM images ORDER BY id').fetchall(),
+            [('full/0.jpg',), (None,), (None,)]
+        )
+        self.assertEqual({row[0] for row in spider.load_pending_covers()},
+                         {items[1]['book_url'], items[2]['book_url']})
+
+    def test_image_stats_wait_for_backfill(self):
+        # 异步模式下书籍item还没有下载结果，封面统计等回填信号到达后再计算
+        pipeline = FeiluPipeline()
+        spider = Spider('books')
+        item = FeiluItem(title='测试小说', image_urls=['https://img.faloo.com/1.jpg'])
+        pipeline.process_item(item, spider)
+        self.assertEqual(pipeline.total_count, 0)
+        pipeline.cover_downloaded(FeiluCoverItem(title='测试小说', image_urls=item['image_urls'], images=[]), spider)
+        self.assertEqual((pipeline.total_count, pipeline.failed_count), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 数据库连接池测试
+
+用内存中的连接对象检查连接复用、并发上限、等待超时、失效连接检查和定期重建。
+
+使用方法：
+    python test_db_pool.py
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class BrokenConnection(Exception):
+    pass
+
+
+class Connection:
+
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+
+    def ping(self):
+        if not self.alive:
+            raise BrokenConnection()
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.created = []
+
+    def connect(self):
+        conn = Connection()
+        self.created.append(conn)
+        return conn
+
+    def test_reuses_connections(self):
+        pool = ConnectionPool(self.connect, max_size=2)
+        for _ in range(10):
+            with pool.connection() as conn:
+                pass
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual(pool.stats()['acquired'], 10)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_bounded_under_concurrency(self):
+        pool = ConnectionPool(self.connect, max_size=3, timeout=10)
+        peak = []
+
+        def worker():
+            for _ in range(20):
+                with pool.connection():
+                    peak.append(pool.stats()['in_use'])
+                    time.sleep(0.001)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(peak), 3)
+        self.assertLessEqual(len(self.created), 3)
+        self.assertEqual(pool.stats()['in_use'], 0)
+        self.assertGreater(pool.stats()['wait_max_ms'], 0)
+
+    def test_timeout(self):
+        pool = ConnectionPool(self.connect, max_size=1, timeout=0.05)
+        with pool.connection():
+            with self.assertRaises(PoolTimeout):
+                with pool.connection():
+                    pass
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        with pool.connection():
+            pass
+
+    def test_broken_connections_are_replaced(self):
+        pool = ConnectionPool(self.connect, max_size=2, ping_interval=0, discard_errors=(BrokenConnection,))
+        with pool.connection() as conn:
+            first = conn
+        first.alive = False
+        with pool.connection() as conn:
+            self.assertIsNot(conn, first)
+        self.assertTrue(first.closed)
+
+        # 使用中出现连接错误的连接不放回连接池
+        with self.assertRaises(BrokenConnection):
+            with pool.connection() as conn:
+                second = conn
+                raise BrokenConnection()
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+        self.assertEqual(pool.stats()['broken'], 2)
+
+        # 其他异常（如SQL错误）不影响连接复用
+        with self.assertRaises(ValueError):
+            with pool.connection():
+                raise ValueError()
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_recycle(self):
+        pool = ConnectionPool(self.connect, max_size=2, recycle=0)
+        with pool.connection() as conn:
+            first = conn
+        self.assertTrue(first.closed)
+        with pool.connection() as conn:
+            self.assertIsNot(conn, first)
+        self.assertEqual(pool.stats()['recycled'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 死信文件测试
+
+检查写入失败的item能从死信文件完整还原，manage_db.py replay 重新写入后
+成功的记录从文件中移除，仍然失败的和其他数据库的记录保留，
+以及整批写入失败回滚后标签缓存中不会留下数据库中已不存在的标签ID。
+
+使用方法：
+    python test_dead_letter.py
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.dead_letter import DeadLetterStore
+from Feilu.items import FeiluCoverItem, FeiluItem
+from manage_db import replay
+from testing_utils import SQLitePipelineTestCase, make_items
+
+
+class DeadLetterTest(SQLitePipelineTestCase):
+    db_name = 'dead_letter.db'
+
+    def setUp(self):
+        super().setUp()
+        self.store = DeadLetterStore(os.path.join(self.tmpdir.name, 'dead_letters.jsonl'))
+
+    def replay(self):
+        args = argparse.Namespace(backend='sqlite', dead_letter_path=self.store.path, batch_size=50)
+        replay(self.pipeline, args)
+
+    def test_round_trip(self):
+        item = FeiluItem(make_items(1)[0])
+        item['images'] = [{'url': item['image_urls'][0], 'path': 'full/1.jpg', 'checksum': 'abc'}]
+        self.store.append(item, 'sqlite', sqlite3.OperationalError('database is locked'), crawl_id=3)
+        self.store.append(FeiluCoverItem(book_url=item['book_url'], images=[]), 'mysql', ValueError('x'))
+
+        entries = self.store.read()
+        self.assertEqual(self.store.count, 2)
+        self.assertEqual([entry['error'] for entry in entries], ['OperationalError', 'ValueError'])
+        self.assertEqual(entries[0]['crawl'], 3)
+        self.assertEqual(dict(DeadLetterStore.to_item(entries[0])), dict(item))
+        self.assertIsInstance(DeadLetterStore.to_item(entries[1]), FeiluCoverItem)
+
+    def test_replay(self):
+        items = make_items(120)
+        # 书名不能为空，这条重放时仍然失败
+        items[5]['title'] = None
+        for item in items:
+            self.store.append(FeiluItem(item), 'sqlite', sqlite3.OperationalError('database is locked'))
+        self.store.append(FeiluItem(make_items(1)[0]), 'mysql', ValueError('x'))
+
+        self.replay()
+        self.assertEqual(self.pipeline.cursor.execute('SELECT COUNT(*) FROM books').fetchone()[0], 119)
+        kept = self.store.read()
+        self.assertEqual(sorted(entry['backend'] for entry in kept), ['mysql', 'sqlite'])
+        self.assertEqual([entry['error'] for entry in kept if entry['backend'] == 'sqlite'], ['IntegrityError'])
+
+        # 再次重放只剩下失败的那一条
+        self.replay()
+        self.assertEqual(len(self.store.read()), 2)
+
+    def test_replay_failed_batch_tags(self):
+        items = make_items(10)
+        for item in items:
+            item['tags'] = ['新标签']
+            self.store.append(FeiluItem(item), 'sqlite', sqlite3.OperationalError('database is locked'))
+        bad_url = items[3]['book_url']
+
+        # 新标签插入之后才出错，整批回滚后逐条重试
+        write_batch = self.pipeline.write_batch
+
+        def failing_write_batch(cursor, records):
+            unchanged = write_batch(cursor, records)
+            if any(record.book_url == bad_url for record in records):
+                raise ValueError('写入失败')
+            return unchanged
+        self.pipeline.write_batch = failing_write_batch
+
+        self.replay()
+        cursor = self.pipeline.cursor
+        self.assertEqual(cursor.execute('SELECT COUNT(*) FROM books').fetchone()[0], 9)
+        [(tag_id,)] = cursor.execute("SELECT id FROM tags WHERE name = '新标签'").fetchall()
+        self.assertEqual(self.pipeline.tag_cache.ids['新标签'], tag_id)
+        self.assertEqual({row[0] for row in cursor.execute('SELECT tag_id FROM book_tags')}, {tag_id})
+        self.assertEqual([entry['error'] for entry in self.store.read()], ['ValueError'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 内存筛选索引测试
+
+在SQLite数据库中写入随机数据，检查facet_index.py的组合筛选结果和各维度计数
+与直接用SQL查询的结果一致，以及数据版本变化后索引会被刷新。
+
+使用方法：
+    python test_facet_index.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from facet_index import FacetIndex, LiveFacetIndex
+from Feilu import data_version
+from testing_utils import make_items, open_sqlite_pipeline
+
+
+class FacetIndexTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.db_path = os.path.join(cls.tmpdir.name, 'facets.db')
+        pipeline = open_sqlite_pipeline(cls.db_path)
+        items = make_items(3000)
+        items[0]['rating'] = ''
+        pipeline.write_items(items)
+        pipeline.conn.commit()
+        cls.pipeline = pipeline
+        cls.index = FacetIndex.load(pipeline.conn.cursor(), 'sqlite')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pipeline.conn.close()
+        cls.tmpdir.cleanup()
+
+    def sql_ids(self, where, params=(), order='b.id'):
+        rows = self.pipeline.conn.execute(f'SELECT b.id FROM books b WHERE {where} ORDER BY {order}', params)
+        return [row[0] for row in rows]
+
+    def has_tag(self, name):
+        return f"EXISTS (SELECT 1 FROM book_tags bt JOIN tags t ON t.id = bt.tag_id WHERE bt.book_id = b.id AND t.name = '{name}')"
+
+    def test_combined_filters(self):
+        result = self.index.query(tags=['标签1', '标签2'], limit=10000)
+        self.assertEqual(result['ids'], self.sql_ids(f"{self.has_tag('标签1')} AND {self.has_tag('标签2')}"))
+
+        result = self.index.query(tags=['标签3'], ranges={'rating': (5, 8), 'words': (None, 200000)}, limit=10000)
+        expected = self.sql_ids(f"{self.has_tag('标签3')} AND rating_num BETWEEN 5 AND 8 AND word_count_num <= 200000")
+        self.assertEqual(result['ids'], expected)
+        self.assertEqual(result['total'], len(expected))
+
+        result = self.index.query(authors=['作者3', '作者4'], limit=10000)
+        self.assertEqual(result['ids'], self.sql_ids("author IN ('作者3', '作者4')"))
+
+        self.assertEqual(self.index.query(tags=['不存在的标签'])['total'], 0)
+
+    def test_sort_and_page(self):
+        result = self.index.query(ranges={'clicks': (100000, None)}, sort='clicks', limit=20, offset=40)
+        expected = self.sql_ids('monthly_clicks_num >= 100000', order='monthly_clicks_num DESC, b.id DESC')
+        self.assertEqual(result['ids'], expected[40:60])
+
+        result = self.index.query(sort='rating', limit=10000)
+        self.assertEqual(result['ids'][-1], self.sql_ids('rating_num IS NULL')[0])
+
+    def test_facet_counts(self):
+        # 选中少于一半和多于一半时分别走两种计数方式
+        for ranges in ({'rating': (2, 3)}, {'rating': (1, None)}):
+            facets = self.index.query(ranges=ranges, facet_size=500)['facets']
+            low, high = ranges['rating']
+            where = f"b.rating_num >= {low}" + (f" AND b.rating_num <= {high}" if high is not None else '')
+            tags = dict(self.pipeline.conn.execute(f'''
+                SELECT t.name, COUNT(*) FROM books b JOIN book_tags bt ON bt.book_id = b.id
+                JOIN tags t ON t.id = bt.tag_id WHERE {where} GROUP BY t.name
+            ''').fetchall())
+            self.assertEqual({tag['name']: tag['count'] for tag in facets['tags']}, tags)
+            top_author = self.pipeline.conn.execute(
+                f'SELECT COUNT(*) FROM books b WHERE {where} GROUP BY author ORDER BY 1 DESC LIMIT 1'
+            ).fetchone()[0]
+            self.assertEqual(facets['authors'][0]['count'], top_author)
+            self.assertEqual(sum(bucket['book_count'] for bucket in facets['ratings']), len(self.sql_ids(where)))
+
+    def test_histogram(self):
+        everything = self.index.filter()
+        result = self.index.histogram(everything, 'clicks', 'rating', bins=(10, 5))
+        self.assertEqual(result['mode'], 'bins')
+        self.assertEqual(len(result['x_edges']), 11)
+        self.assertLessEqual(len(result['cells']), 50)
+        # 没有评分的书籍不计入
+        self.assertEqual(result['total'], len(self.sql_ids('rating_num IS NOT NULL AND monthly_clicks_num IS NOT NULL')))
+        self.assertEqual(sum(cell[2] for cell in result['cells']), result['total'])
+
+        # 对数分箱的边界换算回点击量，第一个格子的书籍数与SQL一致
+        result = self.index.histogram(everything, 'clicks', 'rating', bins=(10, 5), log_x=True)
+        high = result['x_edges'][1]
+        expected = len(self.sql_ids(f'rating_num IS NOT NULL AND monthly_clicks_num < {high}'))
+        self.assertEqual(sum(cell[2] for cell in result['cells'] if cell[0] == 0), expected)
+
+        # 放大后范围内的书籍较少时返回每本书
+        ranges = {'clicks': (0, 100000), 'rating': (9, 10)}
+        result = self.index.histogram(self.index.filter(ranges=ranges), ranges=ranges, max_points=1000)
+        self.assertEqual(result['mode'], 'points')
+        self.assertEqual(
+            [point[0] for point in result['points']],
+            self.sql_ids('monthly_clicks_num BETWEEN 0 AND 100000 AND rating_num BETWEEN 9 AND 10')
+        )
+
+    def test_refresh_on_data_version(self):
+        live = LiveFacetIndex(lambda: sqlite3.connect(self.db_path), dialect='sqlite', check_interval=0)
+        first = live.get()
+        self.assertIs(live.get(), first)
+        while live.refreshing:
+            time.sleep(0.01)
+        self.assertIs(live.index, first)
+
+        data_version.bump(self.pipeline.cursor)
+        self.pipeline.conn.commit()
+        live.get()
+        for _ in range(100):
+            if live.index is not first:
+                break
+            time.sleep(0.05)
+        self.assertEqual(live.index.version, first.version + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
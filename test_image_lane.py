@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 图片下载通道测试
+
+检查封面请求在图片通道中排队、通道并发受全局并发和HTML保留数限制、
+已下载的封面立即归还令牌，以及下载通道利用率统计按槽位区分HTML和图片。
+
+使用方法：
+    python test_image_lane.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from collections import deque
+
+from scrapy import Request, Spider
+from scrapy.utils.test import get_crawler
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.extensions import FeiluLaneStats
+from Feilu.items import FeiluItem
+from Feilu.pipelines import FeiluImagesPipeline, ImageDownloadLane
+
+
+class ImageDownloadLaneTest(unittest.TestCase):
+
+    def test_queue(self):
+        lane = ImageDownloadLane(2)
+        acquired = []
+        for i in range(4):
+            lane.acquire().addCallback(lambda _, i=i: acquired.append(i))
+        self.assertEqual(acquired, [0, 1])
+        self.assertEqual((lane.active, lane.waiting, lane.max_waiting), (2, 2, 2))
+
+        lane.release()
+        self.assertEqual(acquired, [0, 1, 2])
+        for _ in range(3):
+            lane.release()
+        self.assertEqual(acquired, [0, 1, 2, 3])
+        self.assertEqual((lane.active, lane.max_active, lane.completed), (0, 2, 4))
+
+
+class FeiluImagesPipelineLaneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def open_pipeline(self, **settings):
+        settings.setdefault('IMAGES_STORE', self.tmpdir.name)
+        crawler = get_crawler(Spider, settings)
+        spider = crawler._create_spider('books')
+        pipeline = FeiluImagesPipeline.from_crawler(crawler)
+        pipeline.open_spider(spider)
+        return pipeline
+
+    def test_concurrency(self):
+        # 通道并发不超过全局并发减去为HTML保留的数量，至少为1
+        pipeline = self.open_pipeline(CONCURRENT_REQUESTS=16, IMAGES_LANE_CONCURRENCY=4, IMAGES_LANE_HTML_RESERVE=4)
+        self.assertEqual(pipeline.lane.concurrency, 4)
+        pipeline = self.open_pipeline(CONCURRENT_REQUESTS=6, IMAGES_LANE_CONCURRENCY=4, IMAGES_LANE_HTML_RESERVE=4)
+        self.assertEqual(pipeline.lane.concurrency, 2)
+        pipeline = self.open_pipeline(CONCURRENT_REQUESTS=4, IMAGES_LANE_CONCURRENCY=4, IMAGES_LANE_HTML_RESERVE=4)
+        self.assertEqual(pipeline.lane.concurrency, 1)
+
+    def test_requests(self):
+        pipeline = self.open_pipeline(IMAGES_LANE_SLOT='covers', IMAGES_LANE_TIMEOUT=12)
+        item = FeiluItem(title='测试小说', book_url='https://b.faloo.com/1.html',
+                         image_urls=['//img.faloo.com/1.jpg', ''])
+        requests = list(pipeline.get_media_requests(item, pipeline.spiderinfo))
+        self.assertEqual([request.url for request in requests], ['https://img.faloo.com/1.jpg'])
+        self.assertEqual(requests[0].meta['download_slot'], 'covers')
+        self.assertEqual(requests[0].meta['download_timeout'], 12)
+        self.assertEqual(requests[0].meta['book_url'], 'https://b.faloo.com/1.html')
+
+    def test_cached_cover_releases_token(self):
+        pipeline = self.open_pipeline(IMAGES_LANE_CONCURRENCY=1)
+        info = pipeline.spiderinfo
+
+        # 需要下载的封面一直占用令牌，直到下载结束
+        results = []
+        pipeline.media_to_download(Request('https://img.faloo.com/1.jpg'), info).addCallback(results.append)
+        self.assertEqual(results, [None])
+        self.assertEqual(pipeline.lane.active, 1)
+
+        # 已下载的封面在拿到令牌后立即归还
+        with open(os.path.join(self.tmpdir.name, 'full', '2.jpg'), 'wb') as f:
+            f.write(b'jpg')
+        results = []
+        pipeline.media_to_download(Request('https://img.faloo.com/2.jpg'), info).addCallback(results.append)
+        self.assertEqual(results, [])
+        self.assertEqual(pipeline.lane.waiting, 1)
+
+        pipeline.lane.release()
+        self.assertEqual(results[0]['status'], 'uptodate')
+        self.assertEqual((pipeline.lane.active, pipeline.lane.completed), (0, 2))
+
+
+class FeiluLaneStatsTest(unittest.TestCase):
+
+    def test_utilisation(self):
+        crawler = get_crawler(Spider)
+        spider = crawler._create_spider('books')
+        ext = FeiluLaneStats(crawler, 5, 'images')
+
+        def slot(concurrency, transferring, queued):
+            return type('Slot', (), {
+                'concurrency': concurrency,
+                'transferring': set(range(transferring)),
+                'queue': deque(range(queued)),
+            })()
+
+        downloader = type('Downloader', (), {'slots': {}})()
+        crawler.engine = type('Engine', (), {'downloader': downloader})()
+        downloader.slots = {'b.faloo.com': slot(8, 8, 3), 'images': slot(4, 1, 10)}
+        ext.sample()
+        downloader.slots = {'b.faloo.com': slot(8, 4, 0), 'images': slot(4, 3, 2)}
+        ext.sample()
+        ext.spider_closed(spider, 'finished')
+
+        stats = crawler.stats
+        self.assertEqual(stats.get_value('lanes/html/utilisation'), 75.0)
+        self.assertEqual(stats.get_value('lanes/html/active_max'), 8)
+        self.assertEqual(stats.get_value('lanes/html/queued_max'), 3)
+        self.assertEqual(stats.get_value('lanes/images/utilisation'), 50.0)
+        self.assertEqual(stats.get_value('lanes/images/queued_max'), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - JSON响应测试
+
+检查orjson和标准库json的输出一致、按Accept-Encoding压缩、压缩后ETag带编码后缀且重新验证仍然得到304，
+以及列式格式。
+
+使用方法：
+    python test_json_response.py
+"""
+
+import gzip
+import json
+import os
+import sys
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from flask import Flask, jsonify
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import json_response
+from json_response import compress_response, dumps, json_response as make_json, rows_payload
+from response_cache import ResponseCache
+
+ROWS = [(i, f'测试小说{i}', Decimal('8.50'), datetime(2024, 1, 1, 12, 0, 0)) for i in range(100)]
+COLUMNS = ['id', 'title', 'rating', 'created_at']
+
+
+def make_app():
+    app = Flask(__name__)
+    app.after_request(compress_response)
+    cache = ResponseCache(lambda: 7, version_interval=0)
+
+    @app.route('/api/books')
+    @cache.cached
+    def books():
+        return make_json({'books': rows_payload(COLUMNS, ROWS)})
+
+    @app.route('/api/small')
+    def small():
+        return make_json({'ok': True})
+
+    return app.test_client()
+
+
+class JSONResponseTest(unittest.TestCase):
+
+    def test_encoders_agree(self):
+        data = {'books': rows_payload(COLUMNS, ROWS), 'total': 100, 'avg': 5.5, 'none': None}
+        fast = dumps(data)
+        orjson, json_response.orjson = json_response.orjson, None
+        try:
+            self.assertEqual(dumps(data), fast)
+        finally:
+            json_response.orjson = orjson
+        self.assertIn('"rating":8.5,"created_at":"Mon, 01 Jan 2024 12:00:00 GMT"', fast.decode('utf-8'))
+
+    def test_dates_match_jsonify(self):
+        # 时间字段与改用json_response之前flask.jsonify的输出一致
+        app = Flask(__name__)
+        value = {'created_at': datetime(2024, 1, 1, 12, 0, 0), 'day': ROWS[0][3].date()}
+        with app.app_context():
+            expected = json.loads(jsonify(value).get_data())
+        self.assertEqual(json.loads(dumps(value)), expected)
+
+    def test_columnar(self):
+        payload = rows_payload(COLUMNS, ROWS[:2], columnar=True)
+        self.assertEqual(payload['columns'], COLUMNS)
+        self.assertEqual(payload['data'][1][:2], [1, '测试小说1'])
+        self.assertLess(len(dumps(payload)), len(dumps(rows_payload(COLUMNS, ROWS[:2]))))
+
+    def test_compression(self):
+        client = make_app()
+        plain = client.get('/api/books')
+        self.assertNotIn('Content-Encoding', plain.headers)
+        self.assertEqual(plain.headers['ETag'], '"v7"')
+
+        compressed = client.get('/api/books', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(compressed.headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(compressed.get_data()), plain.get_data())
+        self.assertEqual(compressed.headers['ETag'], '"v7-gzip"')
+
+        # 带编码后缀的ETag重新验证时同样得到304
+        response = client.get('/api/books', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '"v7-gzip"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], '"v7-gzip"')
+
+        if json_response.brotli is not None:
+            response = client.get('/api/books', headers={'Accept-Encoding': 'gzip, br'})
+            self.assertEqual(response.headers['Content-Encoding'], 'br')
+            self.assertEqual(json_response.brotli.decompress(response.get_data()), plain.get_data())
+
+        # 很小的响应不压缩
+        response = client.get('/api/small', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 指标历史测试
+
+通过SQLite数据库管道模拟多次爬取，检查book_metrics只记录变化、
+标签增量累加后与books表一致，以及合并旧分区后每个周期末的值不变。
+
+使用方法：
+    python test_metrics.py
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from testing_utils import SQLitePipelineTestCase, make_items
+
+
+class MetricsHistoryTest(SQLitePipelineTestCase):
+    db_name = 'metrics.db'
+
+    def setUp(self):
+        super().setUp()
+        self.rng = random.Random(3)
+
+    def crawl(self, items, started_at):
+        # 模拟一次爬取，started_at为爬取开始时间
+        pipeline = self.pipeline
+        pipeline.crawl_id = pipeline.metrics.start_crawl(pipeline.cursor)
+        pipeline.cursor.execute('UPDATE crawls SET started_at = ? WHERE id = ?', (started_at, pipeline.crawl_id))
+        for i in range(0, len(items), 200):
+            pipeline.write_items(items[i:i + 200])
+        pipeline.metrics.finish_crawl(pipeline.cursor, pipeline.crawl_id)
+        pipeline.conn.commit()
+        return pipeline.crawl_id
+
+    def change_clicks(self, items, count):
+        changed = self.rng.sample(items, count)
+        for item in changed:
+            item['monthly_clicks'] = f'月点击：{self.rng.randint(0, 2000000)}'
+        return changed
+
+    def query(self, sql, params=()):
+        return self.pipeline.cursor.execute(sql, params).fetchall()
+
+    def tag_totals_from_history(self):
+        rows = self.query('SELECT tag_id, SUM(monthly_clicks), SUM(book_count) FROM tag_metric_deltas GROUP BY tag_id')
+        return {tag_id: (clicks, count) for tag_id, clicks, count in rows if count}
+
+    def tag_totals_from_books(self):
+        rows = self.query('''
+            SELECT bt.tag_id, COALESCE(SUM(b.monthly_clicks_num), 0), COUNT(*)
+            FROM book_tags bt JOIN books b ON b.id = bt.book_id GROUP BY bt.tag_id
+        ''')
+        return {tag_id: (clicks, count) for tag_id, clicks, count in rows}
+
+    def test_only_changes_are_recorded(self):
+        items = make_items(1000)
+        first = self.crawl(items, '2026-01-01 00:00:00')
+        self.change_clicks(items, 50)
+        second = self.crawl(items, '2026-01-02 00:00:00')
+        third = self.crawl(items, '2026-01-03 00:00:00')
+
+        counts = dict(self.query('SELECT crawl_id, COUNT(*) FROM book_metrics GROUP BY crawl_id'))
+        self.assertEqual(counts.get(first), 1000)
+        self.assertLessEqual(counts.get(second), 50)
+        self.assertIsNone(counts.get(third))
+
+    def test_tag_history_matches_books(self):
+        items = make_items(1000)
+        self.crawl(items, '2026-01-01 00:00:00')
+        self.change_clicks(items, 200)
+        for item in self.rng.sample(items, 100):
+            item['tags'] = item['tags'] + [f'新标签{self.rng.randint(1, 10)}']
+        self.crawl(items, '2026-01-02 00:00:00')
+        self.assertEqual(self.tag_totals_from_history(), self.tag_totals_from_books())
+
+    def test_downsample_keeps_period_end_values(self):
+        items = make_items(300)
+        for day in range(1, 11):
+            self.change_clicks(items, 30)
+            self.crawl(items, f'2026-01-{day:02d} 00:00:00')
+        self.change_clicks(items, 30)
+        self.crawl(items, '2026-02-01 00:00:00')
+
+        def latest_values(before):
+            return self.query('''
+                SELECT m.book_id, m.monthly_clicks FROM book_metrics m
+                WHERE m.crawl_id = (SELECT MAX(crawl_id) FROM book_metrics
+                                    WHERE book_id = m.book_id AND crawl_id <= ?)
+                ORDER BY m.book_id
+            ''', (before,))
+
+        last_january = self.query("SELECT MAX(id) FROM crawls WHERE started_at < '2026-02-01'")[0][0]
+        end_of_january = latest_values(last_january)
+        totals = self.tag_totals_from_history()
+
+        removed = self.pipeline.metrics.downsample(self.pipeline.cursor, '2026-02-01 00:00:00', 'month')
+        self.assertEqual(removed, 9)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM crawls')[0][0], 2)
+        self.assertEqual(latest_values(last_january), end_of_january)
+        self.assertEqual(self.tag_totals_from_history(), totals)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - MySQL批量写入测试
+
+检查书籍的upsert语句能被pymysql的executemany合并成一条多行INSERT、更新部分每个值只绑定一次，
+以及批量导入模式写出的临时文件能按LOAD DATA的转义规则还原成原来的行，导入后删除。
+不需要MySQL服务。
+
+使用方法：
+    python test_mysql_bulk.py
+"""
+
+import os
+import re
+import sys
+import unittest
+
+from pymysql.cursors import RE_INSERT_VALUES
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.mysql_pipeline import FeiluMySQLPipeline
+from Feilu.storage import WRITE_COLUMNS, BookRecord
+from testing_utils import make_items
+
+# LOAD DATA默认转义规则的逆变换
+UNESCAPE = {'N': None, '\\': '\\', 't': '\t', 'n': '\n', 'r': '\r', '0': '\0'}
+
+
+def parse_load_value(text):
+    if text == '\\N':
+        return None
+    return re.sub(r'\\(.)', lambda match: UNESCAPE[match.group(1)], text)
+
+
+class RecordingTransaction:
+    """
+    记录执行的SQL，LOAD DATA时读取临时文件的内容
+    """
+    def __init__(self):
+        self.statements = []
+        self.loaded = None
+        self.load_path = None
+
+    def execute(self, sql, args=None):
+        self.statements.append(' '.join(sql.split()))
+        if sql.startswith('LOAD DATA'):
+            self.load_path = args[0]
+            with open(self.load_path, encoding='utf-8', newline='') as f:
+                self.loaded = f.read()
+
+    def executemany(self, sql, rows):
+        self.statements.append(' '.join(sql.split()))
+
+
+class MySQLBulkWriteTest(unittest.TestCase):
+
+    def pipeline(self, bulk_load):
+        return FeiluMySQLPipeline('localhost', 3306, 'feilu_books', 'root', '', 'utf8mb4', bulk_load=bulk_load)
+
+    def test_multi_row_upsert(self):
+        txn = RecordingTransaction()
+        self.pipeline(False).upsert_books(txn, [BookRecord(item).row for item in make_items(3)])
+        [sql] = txn.statements
+        # pymysql只会把匹配RE_INSERT_VALUES的语句合并成多行INSERT
+        match = RE_INSERT_VALUES.match(sql)
+        self.assertIsNotNone(match)
+        self.assertEqual(match.group(2).count('%s'), len(WRITE_COLUMNS))
+        # 更新部分引用新值，不再绑定参数
+        self.assertNotIn('%s', match.group(3))
+        self.assertIn('`content_hash` = VALUES(`content_hash`)', match.group(3))
+        self.assertNotIn('`book_url` =', match.group(3))
+
+    def test_escape_load_value(self):
+        for value in ('普通文本', 'a\tb', '第一行\n第二行\r\n', 'C:\\path\\N', '\0', '\\N'):
+            self.assertEqual(parse_load_value(FeiluMySQLPipeline._escape_load_value(value)), value)
+        self.assertEqual(FeiluMySQLPipeline._escape_load_value(None), '\\N')
+        self.assertEqual(FeiluMySQLPipeline._escape_load_value(9.5), '9.5')
+
+    def test_load_books(self):
+        items = make_items(5)
+        items[0]['summary'] = '简介\t带制表符\n和换行\\'
+        items[1]['rating'] = None
+        rows = [BookRecord(item).row for item in items]
+        txn = RecordingTransaction()
+        self.pipeline(True).upsert_books(txn, rows)
+
+        loaded = [
+            tuple(parse_load_value(value) for value in line.split('\t'))
+            for line in txn.loaded.split('\n') if line
+        ]
+        expected = [tuple(None if value is None else str(value) for value in row) for row in rows]
+        self.assertEqual(loaded, expected)
+        self.assertFalse(os.path.exists(txn.load_path))
+
+        self.assertTrue(txn.statements[0].startswith('CREATE TEMPORARY TABLE IF NOT EXISTS `books_stage`'))
+        self.assertEqual(txn.statements[1], 'DELETE FROM `books_stage`')
+        self.assertTrue(txn.statements[2].startswith('LOAD DATA LOCAL INFILE %s INTO TABLE `books_stage`'))
+        self.assertTrue(txn.statements[3].startswith('INSERT INTO `books`'))
+        self.assertIn('SELECT', txn.statements[3])
+        self.assertIn('ON DUPLICATE KEY UPDATE', txn.statements[3])
+
+    def test_load_file_removed_on_error(self):
+        class FailingTransaction(RecordingTransaction):
+            def execute(self, sql, args=None):
+                super().execute(sql, args)
+                if sql.startswith('LOAD DATA'):
+                    raise RuntimeError('local_infile未开启')
+
+        txn = FailingTransaction()
+        with self.assertRaises(RuntimeError):
+            self.pipeline(True).upsert_books(txn, [BookRecord(item).row for item in make_items(2)])
+        self.assertFalse(os.path.exists(txn.load_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - MySQL连接池写入测试
+
+检查MySQL存储后端的写入在连接池线程中执行、不占用reactor线程，事务成功时提交、出错时回滚（标签缓存随之回滚），
+多个批次可以同时写入，以及连接池相关设置的读取。
+连接池换成sqlite3驱动，不需要MySQL服务。
+
+使用方法：
+    python test_mysql_pool.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+
+from scrapy.settings import Settings
+from twisted.enterprise import adbapi
+from twisted.internet import defer
+from twisted.trial import unittest as trial
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.mysql_pipeline import FeiluMySQLPipeline
+from Feilu.tag_cache import TagCache
+
+
+class ConnectionPoolWriteTest(trial.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'pool.db')
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('CREATE TABLE writes (thread TEXT)')
+        conn.execute('CREATE TABLE tags (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE)')
+        conn.commit()
+        conn.close()
+        self.pipeline = FeiluMySQLPipeline('localhost', 3306, 'feilu_books', 'root', '', 'utf8mb4', pool_size=2)
+        # 换成sqlite3的参数占位符
+        self.pipeline.tag_cache = TagCache()
+        self.pipeline.dbpool = adbapi.ConnectionPool(
+            'sqlite3', self.db_path, check_same_thread=False, cp_min=1, cp_max=self.pipeline.pool_size
+        )
+
+    def tearDown(self):
+        self.pipeline.shutdown()
+        self.tmpdir.cleanup()
+
+    def rows(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return [row[0] for row in conn.execute('SELECT thread FROM writes')]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def write(txn):
+        txn.execute('INSERT INTO writes (thread) VALUES (?)', (threading.current_thread().name,))
+        return 'ok'
+
+    def test_write_off_reactor(self):
+        dfd = self.pipeline.run(self.write)
+
+        def check(result):
+            self.assertEqual(result, 'ok')
+            self.assertEqual(len(self.rows()), 1)
+            self.assertNotEqual(self.rows()[0], threading.current_thread().name)
+        return dfd.addCallback(check)
+
+    def test_rollback(self):
+        def write(txn):
+            self.write(txn)
+            raise ValueError('写入失败')
+
+        dfd = self.assertFailure(self.pipeline.run(write), ValueError)
+        dfd.addCallback(lambda _: self.assertEqual(self.rows(), []))
+        return dfd
+
+    def test_tag_cache(self):
+        # 提交的事务中新增的标签留在缓存中，回滚的事务中新增的标签从缓存中移除
+        def write(txn, name, fail):
+            self.pipeline.tag_cache.resolve(txn, [name])
+            if fail:
+                raise ValueError('写入失败')
+
+        dfd = self.pipeline.run(write, '重生', False)
+        dfd.addCallback(lambda _: self.assertFailure(self.pipeline.run(write, '系统', True), ValueError))
+
+        def check(_):
+            self.assertEqual(list(self.pipeline.tag_cache.ids), ['重生'])
+            self.assertEqual(self.pipeline.tag_cache.pending, set())
+        return dfd.addCallback(check)
+
+    def test_concurrent_batches(self):
+        # 两个批次同时占用连接池中的两个连接，互相等待对方开始后才结束
+        started = [threading.Event(), threading.Event()]
+
+        def write(txn, index):
+            started[index].set()
+            if not started[1 - index].wait(5):
+                raise AssertionError('批次没有同时执行')
+            return self.write(txn)
+
+        dfd = defer.gatherResults([self.pipeline.run(write, 0), self.pipeline.run(write, 1)])
+        dfd.addCallback(lambda _: self.assertEqual(len(set(self.rows())), 2))
+        return dfd
+
+
+class FromSettingsTest(unittest.TestCase):
+
+    def test_settings(self):
+        pipeline = FeiluMySQLPipeline.from_settings(Settings({
+            'MYSQL_POOL_SIZE': 6,
+            'MYSQL_MAX_INFLIGHT': 12,
+            'MYSQL_BATCH_SIZE': 300,
+            'MYSQL_BULK_BATCH_SIZE': 5000,
+            'MYSQL_FLUSH_INTERVAL': 1,
+        }))
+        self.assertEqual((pipeline.pool_size, pipeline.max_inflight), (6, 12))
+        self.assertEqual((pipeline.batch_size, pipeline.flush_interval, pipeline.bulk_load), (300, 1, False))
+        self.assertIsNone(pipeline.dbpool)
+
+        pipeline = FeiluMySQLPipeline.from_settings(Settings({
+            'MYSQL_BULK_LOAD': True,
+            'MYSQL_BULK_BATCH_SIZE': 5000,
+        }))
+        self.assertEqual((pipeline.batch_size, pipeline.bulk_load), (5000, True))
+
+        with self.assertRaises(ValueError):
+            FeiluMySQLPipeline.from_settings(Settings({'MYSQL_FLUSH_INTERVAL': -1}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 数值列转换测试
+
+检查页面上的数量和评分文本转换为数值（带单位、千分位、前缀文字、无法识别的文本），
+写入书籍时同时保存原始文本和数值列，以及旧版本数据库升级后回填数值列。
+
+使用方法：
+    python test_normalize.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from decimal import Decimal
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.items import FeiluItem
+from Feilu.normalize import NUMERIC_COLUMNS, numeric_values, parse_count, parse_rating
+from testing_utils import SQLitePipelineTestCase, open_sqlite_pipeline
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_parse_count(self):
+        cases = {
+            '月点击：1068178': 1068178,
+            '字数：144万': 1440000,
+            '116.3万': 1163000,
+            '2.5 亿': 250000000,
+            '3千': 3000,
+            '1,234': 1234,
+            '0': 0,
+            '暂无': None,
+            '': None,
+            None: None,
+        }
+        for text, expected in cases.items():
+            self.assertEqual(parse_count(text), expected, text)
+        self.assertEqual(parse_count(12.7), 12)
+        self.assertEqual(parse_count(Decimal('5')), 5)
+
+    def test_parse_rating(self):
+        cases = {
+            '9.7': 9.7,
+            '评分：8.25分': 8.25,
+            '10': 10.0,
+            '暂无评分': None,
+            None: None,
+        }
+        for text, expected in cases.items():
+            self.assertEqual(parse_rating(text), expected, text)
+        self.assertEqual(parse_rating(Decimal('7.456')), 7.46)
+
+    def test_numeric_values(self):
+        item = {'monthly_clicks': '月点击：100', 'word_count': '1.5万', 'flowers': '暂无', 'rating': '9.1'}
+        self.assertEqual(numeric_values(item), (100, 15000, None, 9.1, None))
+
+
+class NumericColumnsTest(SQLitePipelineTestCase):
+    db_name = 'numeric.db'
+
+    def test_write(self):
+        self.pipeline.write_items([FeiluItem(
+            title='测试小说', author='作者', book_url='https://b.faloo.com/1.html',
+            monthly_clicks='月点击：1068178', word_count='字数：144万', flowers='520',
+            rating='9.7', rewards='暂无',
+        )])
+        row = self.pipeline.cursor.execute(
+            'SELECT monthly_clicks, monthly_clicks_num, word_count_num, flowers_num, rating_num, rewards_num '
+            'FROM books'
+        ).fetchone()
+        self.assertEqual(row, ('月点击：1068178', 1068178, 1440000, 520, 9.7, None))
+
+
+class MigrateTest(unittest.TestCase):
+
+    def test_backfill_old_database(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'old.db')
+            # 旧版本的books表只有原始文本列
+            conn = sqlite3.connect(db_path)
+            conn.execute('''
+            CREATE TABLE books (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, author TEXT,
+                monthly_clicks TEXT, word_count TEXT, summary TEXT, book_url TEXT UNIQUE,
+                flowers TEXT, rating TEXT, rewards TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+            conn.execute(
+                "INSERT INTO books (title, book_url, monthly_clicks, word_count, flowers, rating, rewards) "
+                "VALUES ('旧书', 'https://b.faloo.com/old.html', '月点击：2000', '116.3万', '12', '8.5', '3')"
+            )
+            conn.commit()
+            conn.close()
+
+            pipeline = open_sqlite_pipeline(db_path)
+            try:
+                columns = {row[1] for row in pipeline.cursor.execute('PRAGMA table_info(books)')}
+                self.assertLessEqual({column for column, _ in NUMERIC_COLUMNS.values()}, columns)
+                self.assertEqual(pipeline.backfill_numeric(), 1)
+                row = pipeline.cursor.execute(
+                    f"SELECT {', '.join(column for column, _ in NUMERIC_COLUMNS.values())} FROM books"
+                ).fetchone()
+                self.assertEqual(row, (2000, 1163000, 12, 8.5, 3))
+            finally:
+                pipeline.conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
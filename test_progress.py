@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 爬取进度通道测试
+
+检查爬虫发布的进度事件经过一个订阅转发给所有客户端、读取慢的客户端只丢弃旧事件、
+新客户端先收到最近一次事件，以及进度扩展根据爬虫统计计算的速度、成功率和写入延迟。
+
+使用方法：
+    python test_progress.py
+"""
+
+import json
+import os
+import sys
+import time
+import unittest
+
+from scrapy.http import Request, TextResponse
+from scrapy.utils.test import get_crawler
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.extensions import FeiluProgressStats
+from Feilu.progress import ProgressBroker, ProgressPublisher
+
+
+class ProgressChannelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.broker = ProgressBroker('127.0.0.1', 0, queue_size=4)
+        self.first = self.broker.subscribe()
+        self.publisher = ProgressPublisher(*self.broker.address)
+
+    def tearDown(self):
+        self.publisher.close()
+
+    def test_fan_out(self):
+        second = self.broker.subscribe()
+        self.assertTrue(self.publisher.publish({'pages': 1, 'spider': '书籍'}))
+        for client in (self.first, second):
+            self.assertEqual(json.loads(client.get(timeout=5)), {'pages': 1, 'spider': '书籍'})
+
+        # 新客户端先收到最近一次事件，过期的不再重放
+        third = self.broker.subscribe()
+        self.assertEqual(json.loads(third.get_nowait())['pages'], 1)
+        self.broker.replay_age = 0
+        self.assertTrue(self.broker.subscribe().empty())
+        self.assertEqual(self.broker.stats()['clients'], 4)
+
+    def test_slow_client(self):
+        # 队列满时丢弃最旧的事件，保留最新的
+        for pages in range(10):
+            self.broker.publish(json.dumps({'pages': pages}))
+        events = [json.loads(self.first.get_nowait())['pages'] for _ in range(self.first.qsize())]
+        self.assertEqual(events, [6, 7, 8, 9])
+
+    def test_stream(self):
+        stream = self.broker.stream(heartbeat=0.05)
+        self.assertEqual(next(stream), 'retry: 5000\n\n')
+        self.assertEqual(next(stream), ': keep-alive\n\n')
+        self.broker.publish('{"pages":2}')
+        self.assertEqual(next(stream), 'event: progress\ndata: {"pages":2}\n\n')
+        clients = self.broker.stats()['clients']
+        stream.close()
+        self.assertEqual(self.broker.stats()['clients'], clients - 1)
+
+
+class ProgressStatsTest(unittest.TestCase):
+
+    def test_event(self):
+        crawler = get_crawler(settings_dict={'PROGRESS_PORT': 9})
+        ext = FeiluProgressStats.from_crawler(crawler)
+        spider = type('Spider', (), {'name': 'books'})()
+        ext.started = ext.last['time'] = time.time() - 2
+        stats = crawler.stats
+        stats.set_value('item_scraped_count', 40)
+        stats.set_value('images/downloaded', 9)
+        stats.set_value('images/failed', 1)
+        stats.set_value('storage/mysql/lag_sum', 3.0)
+        stats.set_value('storage/mysql/lag_count', 10)
+        ext.pages = 5
+
+        event = ext.event(spider, 'running')
+        self.assertEqual(event['pages'], 5)
+        self.assertAlmostEqual(event['items_per_sec'], 20, delta=1)
+        self.assertEqual(event['images']['success_rate'], 0.9)
+        self.assertEqual(event['storage']['mysql']['lag'], 0.3)
+
+        # 延迟只计算上一次发布之后提交的记录
+        stats.set_value('storage/mysql/lag_sum', 4.0)
+        stats.set_value('storage/mysql/lag_count', 20)
+        self.assertEqual(ext.event(spider, 'running')['storage']['mysql']['lag'], 0.1)
+        self.assertIsNone(ext.event(spider, 'running')['storage']['mysql']['lag'])
+        ext.publisher.close()
+
+    def test_pages(self):
+        crawler = get_crawler(settings_dict={'PROGRESS_PORT': 9})
+        ext = FeiluProgressStats.from_crawler(crawler)
+        spider = type('Spider', (), {'name': 'covers'})()
+        for request in (
+            Request('https://b.faloo.com/y_0_1.html'),
+            Request('https://b.faloo.com/1234.html'),
+            Request('https://img.faloo.com/1234.jpg', meta={'download_slot': 'images'}),
+            Request('data:,'),
+        ):
+            ext.response_received(TextResponse(request.url, request=request), request, spider)
+        self.assertEqual(ext.pages, 2)
+        ext.publisher.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
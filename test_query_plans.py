@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 仪表盘查询计划回归测试
+
+在随机生成的大数据集上对dashboard_queries.py中的每条查询执行EXPLAIN，
+如果某条查询在书籍、标签或汇总表上退化为全表扫描（没有用上索引）则测试失败。
+
+默认只测试SQLite；设置环境变量PLAN_TEST_MYSQL=1后，同时在MySQL的
+单独测试库（feilu_books_plan）中测试，连接参数取自settings.py。
+
+使用方法：
+    python test_query_plans.py
+    PLAN_TEST_BOOKS=200000 PLAN_TEST_MYSQL=1 python test_query_plans.py
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from dashboard_queries import ALLOWED_SCANS, DASHBOARD_QUERIES, get_query, id_list_param
+from Feilu.db_pipeline import FeiluDatabasePipeline
+from Feilu.mysql_pipeline import FeiluMySQLPipeline
+from Feilu.search import match_query
+from testing_utils import make_items
+
+# 测试数据行数
+BOOKS = int(os.environ.get('PLAN_TEST_BOOKS', 50000))
+# 查询参数
+PARAMS = {
+    'books_page': (0, 100),
+    'books_by_rating': (20,),
+    'books_by_rating_after': (8.0, 8.0, 100, 20),
+    'books_by_rating_missing': (0, 20),
+    'books_by_clicks': (20,),
+    'books_by_clicks_after': (1000000, 1000000, 100, 20),
+    'books_by_clicks_missing': (0, 20),
+    'books_by_words': (20,),
+    'books_by_words_after': (200000, 200000, 100, 20),
+    'books_by_words_missing': (0, 20),
+    'book_history': (1,),
+    'tag_history': ('标签1',),
+    'search': {'query': '测试小说 12', 'limit': 20, 'offset': 0},
+    'search_count': {'query': '测试小说 12'},
+    'books_by_ids': ([1, 2, 3],),
+    'similar_books': (1,),
+    'books_export_since': {'since': '2000-01-01 00:00:00'},
+    'books_export_tag': {'tag': '标签1'},
+    'books_export_since_tag': {'since': '2000-01-01 00:00:00', 'tag': '标签1'},
+}
+# SQL中的表别名
+ALIASES = {
+    't': 'tags', 'bt': 'book_tags', 'b': 'books', 's': 'tag_stats',
+    'm': 'book_metrics', 'd': 'tag_metric_deltas', 'c': 'crawls', 'f': 'books_fts',
+    'sb': 'similar_books',
+}
+# 行数随书籍数量增长、不允许全表扫描的表
+LARGE_TABLES = {
+    'books', 'tags', 'book_tags', 'images', 'tag_stats', 'author_stats', 'book_metrics', 'tag_metric_deltas',
+    'similar_books',
+}
+
+SIMILAR_ROWS = 'INSERT INTO similar_books (book_id, similar_id, score) SELECT 1, id, 1.0 / id FROM books WHERE id BETWEEN 2 AND 11'
+# 少量书籍没有数值指标（页面改版时解析失败），书籍列表按数值排序时排在最后
+MISSING_ROWS = 'UPDATE books SET rating_num = NULL, monthly_clicks_num = NULL, word_count_num = NULL WHERE id % 100 = 0'
+
+
+def query_params(name, dialect):
+    # 全文检索的关键词需要先转换为对应数据库的检索表达式
+    params = PARAMS.get(name, ())
+    if isinstance(params, dict) and 'query' in params:
+        params = dict(params, query=match_query(params['query'], dialect))
+    if name == 'books_by_ids':
+        params = (id_list_param(params[0], dialect),)
+    return params
+
+
+class SQLiteQueryPlanTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        pipeline = FeiluDatabasePipeline(os.path.join(cls.tmpdir.name, 'plan.db'))
+        pipeline.conn = sqlite3.connect(pipeline.db_path)
+        pipeline.cursor = pipeline.conn.cursor()
+        pipeline.create_tables()
+        pipeline.migrate_tables()
+        pipeline.crawl_id = pipeline.metrics.start_crawl(pipeline.cursor)
+
+        items = make_items(BOOKS)
+        for i in range(0, len(items), pipeline.CHUNK_SIZE):
+            pipeline.write_items(items[i:i + pipeline.CHUNK_SIZE])
+        # 相似书籍由manage_db.py单独计算，这里只为第一本书写入几行
+        pipeline.cursor.execute(SIMILAR_ROWS)
+        pipeline.cursor.execute(MISSING_ROWS)
+        pipeline.cursor.execute('ANALYZE')
+        pipeline.conn.commit()
+        cls.conn = pipeline.conn
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cls.tmpdir.cleanup()
+
+    def full_scans(self, name):
+        # 返回查询计划中做全表扫描的表，"SCAN x USING (COVERING) INDEX"是索引扫描，不计入
+        cursor = self.conn.execute(f'EXPLAIN QUERY PLAN {get_query(name, "sqlite")}', query_params(name, 'sqlite'))
+        scans = set()
+        for row in cursor.fetchall():
+            detail = row[-1]
+            match = re.match(r'SCAN (?:TABLE )?(\w+)', detail)
+            if match and 'INDEX' not in detail:
+                scans.add(ALIASES.get(match.group(1), match.group(1)))
+        return scans & LARGE_TABLES
+
+    def test_dashboard_queries_use_indexes(self):
+        for name in DASHBOARD_QUERIES:
+            with self.subTest(query=name):
+                scans = self.full_scans(name) - ALLOWED_SCANS.get(name, set())
+                self.assertFalse(scans, f'{name} 退化为全表扫描: {", ".join(sorted(scans))}')
+
+    def test_dashboard_queries_run(self):
+        for name in DASHBOARD_QUERIES:
+            with self.subTest(query=name):
+                rows = self.conn.execute(get_query(name, 'sqlite'), query_params(name, 'sqlite')).fetchall()
+                self.assertTrue(rows)
+
+
+@unittest.skipUnless(os.environ.get('PLAN_TEST_MYSQL'), '设置PLAN_TEST_MYSQL=1以测试MySQL')
+class MySQLQueryPlanTest(unittest.TestCase):
+    DATABASE = 'feilu_books_plan'
+
+    @classmethod
+    def setUpClass(cls):
+        import pymysql
+        from bench_mysql import get_mysql_config, reset_database
+
+        config = get_mysql_config()
+        pipeline = FeiluMySQLPipeline(
+            config['host'], config['port'], cls.DATABASE, config['user'], config['password'], config['charset']
+        )
+        pipeline.conn, pipeline.cursor = reset_database(config, cls.DATABASE, local_infile=False)
+        pipeline.create_tables()
+        pipeline.migrate_tables()
+        pipeline.crawl_id = pipeline.metrics.start_crawl(pipeline.cursor)
+
+        items = make_items(BOOKS)
+        for i in range(0, len(items), pipeline.CHUNK_SIZE):
+            pending = set()
+            pipeline.write_items(items[i:i + pipeline.CHUNK_SIZE], pending)
+            pipeline.conn.commit()
+            pipeline.tag_cache.commit(pending)
+        pipeline.cursor.execute(SIMILAR_ROWS)
+        pipeline.cursor.execute(MISSING_ROWS)
+        pipeline.conn.commit()
+        for table in ('books', 'tags', 'book_tags'):
+            pipeline.cursor.execute(f'ANALYZE TABLE `{table}`')
+            pipeline.cursor.fetchall()
+        cls.conn = pipeline.conn
+        cls.cursor = pipeline.conn.cursor(pymysql.cursors.DictCursor)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.cursor.execute(f'DROP DATABASE `{cls.DATABASE}`')
+        cls.conn.close()
+
+    def full_scans(self, name):
+        # type为ALL表示全表扫描；index是索引扫描，range/ref等是索引查找
+        self.cursor.execute(f'EXPLAIN {get_query(name)}', query_params(name, 'mysql'))
+        return {
+            ALIASES.get(row['table'], row['table'])
+            for row in self.cursor.fetchall() if row['type'] == 'ALL'
+        } & LARGE_TABLES
+
+    def test_dashboard_queries_use_indexes(self):
+        for name in DASHBOARD_QUERIES:
+            with self.subTest(query=name):
+                scans = self.full_scans(name) - ALLOWED_SCANS.get(name, set())
+                self.assertFalse(scans, f'{name} 退化为全表扫描: {", ".join(sorted(scans))}')
+
+
+if __name__ == '__main__':
+    unittest.main()
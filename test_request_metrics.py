@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 接口耗时统计测试
+
+用SQLite数据库和计时游标检查每个接口的请求数、数据库时间、读取行数和响应大小，
+慢查询日志记录SQL、参数和接口，以及Prometheus文本格式的输出。
+
+使用方法：
+    python test_request_metrics.py
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+import unittest
+
+from flask import Flask, Response
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from json_response import compress_response, json_response
+from request_metrics import RequestMetrics, prometheus_gauges
+
+
+def make_app(metrics):
+    app = Flask(__name__)
+    app.after_request(compress_response)
+    metrics.init_app(app)
+    cursor_class = metrics.cursor_class(sqlite3.Cursor)
+    conn = sqlite3.connect(':memory:', check_same_thread=False)
+    conn.create_function('sleep', 1, lambda seconds: time.sleep(seconds) or 0)
+    conn.execute('CREATE TABLE books (id INTEGER PRIMARY KEY, title TEXT)')
+    conn.executemany('INSERT INTO books (title) VALUES (?)', [(f'测试小说{i}',) for i in range(500)])
+
+    @app.route('/api/books/<int:limit>')
+    def books(limit):
+        cursor = conn.cursor(cursor_class)
+        cursor.execute('SELECT id, title FROM books ORDER BY id LIMIT ?', (limit,))
+        rows = cursor.fetchall()
+        cursor.execute('SELECT COUNT(*) FROM books')
+        total = cursor.fetchone()[0]
+        return json_response({'books': rows, 'total': total})
+
+    @app.route('/api/slow')
+    def slow():
+        cursor = conn.cursor(cursor_class)
+        cursor.execute('SELECT sleep(?), id FROM books WHERE title = ?', (0.05, '测试小说1'))
+        return json_response(cursor.fetchall())
+
+    @app.route('/api/error')
+    def error():
+        raise ValueError('测试错误')
+
+    return app.test_client()
+
+
+class RequestMetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = RequestMetrics(slow_query_seconds=0.04, slow_log_size=2)
+        self.client = make_app(self.metrics)
+
+    def test_endpoint_stats(self):
+        sizes = [len(self.client.get(f'/api/books/{limit}', headers={'Accept-Encoding': 'gzip'}).get_data())
+                 for limit in (10, 100)]
+        stats = self.metrics.endpoints['/api/books/<int:limit>']
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.queries, 4)
+        self.assertEqual(stats.rows, 112)
+        self.assertGreater(stats.db_time, 0)
+        self.assertLessEqual(stats.db_time, stats.latency)
+        # 统计的是压缩前的大小
+        self.assertGreater(stats.bytes, sum(sizes))
+        self.assertEqual(stats.statuses, {200: 2})
+
+        self.client.application.testing = False
+        with self.assertLogs(self.client.application.logger, 'ERROR'):
+            self.assertEqual(self.client.get('/api/error').status_code, 500)
+        self.assertEqual(self.metrics.endpoints['/api/error'].statuses, {500: 1})
+        self.client.get('/not-found')
+        self.assertEqual(self.metrics.endpoints['unmatched'].statuses, {404: 1})
+
+    def test_slow_queries(self):
+        with self.assertLogs('request_metrics', 'WARNING') as logs:
+            for _ in range(3):
+                self.client.get('/api/slow')
+            self.client.get('/api/books/10')
+        self.assertEqual(len(logs.records), 3)
+        slow = self.metrics.slow_queries()
+        self.assertEqual(len(slow), 2)
+        self.assertEqual(self.metrics.slow_count, 3)
+        self.assertEqual(slow[0]['endpoint'], '/api/slow')
+        self.assertEqual(slow[0]['sql'], 'SELECT sleep(?), id FROM books WHERE title = ?')
+        self.assertEqual(json.loads(json.dumps(slow[0]['params'])), [0.05, '测试小说1'])
+
+        # 不在请求中的查询只记录慢查询
+        conn = sqlite3.connect(':memory:')
+        conn.create_function('sleep', 1, lambda seconds: time.sleep(seconds) or 0)
+        with self.assertLogs('request_metrics', 'WARNING'):
+            conn.cursor(self.metrics.cursor_class(sqlite3.Cursor)).execute('SELECT sleep(0.05)')
+        self.assertIsNone(self.metrics.slow_queries()[0]['endpoint'])
+
+    def test_nested_fetch(self):
+        # pymysql的SSCursor.fetchall()通过fetchone()逐行读取，行数只统计一次
+        class StreamingCursor:
+            def __init__(self):
+                self.rows = iter(range(5))
+            def execute(self, query, args=None):
+                pass
+            def fetchone(self):
+                return next(self.rows, None)
+            def fetchmany(self, size=None):
+                return [row for row in iter(self.fetchone, None)][:size]
+            def fetchall(self):
+                return list(iter(self.fetchone, None))
+
+        cursor = self.metrics.cursor_class(StreamingCursor)()
+        self.metrics._before_request()
+        cursor.execute('SELECT 1')
+        self.assertEqual(cursor.fetchall(), [0, 1, 2, 3, 4])
+        self.assertEqual(self.metrics.local.current['rows'], 5)
+
+    def test_prometheus(self):
+        self.client.get('/api/books/10')
+        text = self.metrics.prometheus()
+        self.assertIn('# TYPE feilu_http_request_duration_seconds histogram', text)
+        self.assertIn('feilu_http_requests_total{endpoint="/api/books/<int:limit>",status="200"} 1', text)
+        self.assertIn('feilu_http_request_duration_seconds_bucket{endpoint="/api/books/<int:limit>",le="+Inf"} 1', text)
+        self.assertIn('feilu_db_rows_total{endpoint="/api/books/<int:limit>"} 11', text)
+        self.assertIn('feilu_slow_queries_total 0', text)
+        for line in text.splitlines():
+            if not line.startswith('#'):
+                float(line.rsplit(' ', 1)[1])
+
+        gauges = prometheus_gauges('feilu', 'db_pool', '数据库连接池', {'in_use': 2, 'wait_avg_ms': 1.5, 'error': None})
+        self.assertEqual(gauges.splitlines()[2], 'feilu_db_pool_in_use 2')
+        self.assertNotIn('error', gauges)
+
+    def test_overhead(self):
+        # 每个请求的额外开销远小于1毫秒
+        app = Flask(__name__)
+        app.route('/ping')(lambda: Response('ok'))
+        plain = app.test_client()
+        timed_app = Flask(__name__)
+        self.metrics.init_app(timed_app)
+        timed_app.route('/ping')(lambda: Response('ok'))
+        timed = timed_app.test_client()
+
+        def run(client):
+            started = time.perf_counter()
+            for _ in range(500):
+                client.get('/ping')
+            return (time.perf_counter() - started) / 500
+
+        run(plain), run(timed)
+        overhead = min(run(timed) for _ in range(3)) - min(run(plain) for _ in range(3))
+        self.assertLess(overhead, 0.0005)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说数据可视化分析系统 - 接口响应缓存测试
+
+检查缓存命中、数据版本变化后失效、错误响应不缓存、LRU淘汰，以及多个进程通过共享缓存复用结果。
+
+使用方法：
+    python test_response_cache.py
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+from flask import Flask, jsonify, request
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from response_cache import LRUCache, ResponseCache
+
+
+def make_app(cache, calls):
+    app = Flask(__name__)
+
+    @app.route('/api/tags')
+    @cache.cached
+    def tags():
+        calls.append(request.args.get('limit'))
+        if request.args.get('fail'):
+            return jsonify({'error': 'x'}), 500
+        response = jsonify({'calls': len(calls)})
+        if request.args.get('nostore'):
+            response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    return app.test_client()
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.version = 1
+        self.calls = []
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_cache(self, **kwargs):
+        return ResponseCache(lambda: self.version, version_interval=0, **kwargs)
+
+    def test_hit_until_version_changes(self):
+        client = make_app(self.make_cache(), self.calls)
+        first = client.get('/api/tags?limit=5&b=1')
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        # 查询参数顺序不同也命中同一个缓存
+        second = client.get('/api/tags?b=1&limit=5')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(second.get_json(), first.get_json())
+        self.assertEqual(second.mimetype, 'application/json')
+        self.assertEqual(len(self.calls), 1)
+
+        self.version = 2
+        self.assertEqual(client.get('/api/tags?limit=5&b=1').headers['X-Cache'], 'MISS')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_errors_are_not_cached(self):
+        client = make_app(self.make_cache(), self.calls)
+        client.get('/api/tags?fail=1')
+        response = client.get('/api/tags?fail=1')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_no_store_is_not_cached(self):
+        client = make_app(self.make_cache(), self.calls)
+        client.get('/api/tags?nostore=1')
+        response = client.get('/api/tags?nostore=1')
+        self.assertEqual(response.headers['X-Cache'], 'MISS')
+        self.assertNotIn('ETag', response.headers)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_ttl(self):
+        client = make_app(self.make_cache(ttl=0), self.calls)
+        client.get('/api/tags')
+        client.get('/api/tags')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_etag(self):
+        client = make_app(self.make_cache(), self.calls)
+        first = client.get('/api/tags')
+        etag = first.headers['ETag']
+        self.assertEqual(etag, '"v1"')
+        response = client.get('/api/tags', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.get_data(), b'')
+        self.assertEqual(response.headers['ETag'], etag)
+
+        # 数据版本变化后ETag不再匹配，返回新的正文
+        self.version = 2
+        response = client.get('/api/tags', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], '"v2"')
+        self.assertEqual(len(self.calls), 2)
+
+        # 错误响应不带ETag
+        self.assertNotIn('ETag', client.get('/api/tags?fail=1').headers)
+
+    def test_value(self):
+        cache = self.make_cache()
+        compute = lambda: self.calls.append(1) or len(self.calls)
+        self.assertEqual(cache.value('books_count', compute), 1)
+        self.assertEqual(cache.value('books_count', compute), 1)
+        self.version = 2
+        self.assertEqual(cache.value('books_count', compute), 2)
+
+    def test_lru_eviction(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1, b'a', float('inf'))
+        cache.set('b', 1, b'b', float('inf'))
+        cache.get('a', 1)
+        cache.set('c', 1, b'c', float('inf'))
+        self.assertEqual(list(cache.entries), ['a', 'c'])
+
+    def test_shared_cache(self):
+        path = os.path.join(self.tmpdir.name, 'cache.db')
+        first = make_app(self.make_cache(shared_path=path), self.calls)
+        second = make_app(self.make_cache(shared_path=path), self.calls)
+        first.get('/api/tags')
+        response = second.get('/api/tags')
+        self.assertEqual(response.headers['X-Cache'], 'HIT')
+        self.assertEqual(len(self.calls), 1)
+
+        self.version = 2
+        self.assertEqual(second.get('/api/tags').headers['X-Cache'], 'MISS')
+        self.assertEqual(first.get('/api/tags').headers['X-Cache'], 'HIT')
+
+
+if __name__ == '__main__':
+    unittest.main()
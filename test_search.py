@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 全文检索测试
+
+检查中文切分和检索表达式，SQLite数据库管道重复爬取时全文索引随书籍内容更新，
+以及MySQL没有ngram解析器时改用默认解析器建立全文索引。
+
+使用方法：
+    python test_search.py
+"""
+
+import os
+import sys
+import unittest
+
+import pymysql
+from pymysql.constants import ER
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from dashboard_queries import get_query
+from Feilu.mysql_pipeline import FeiluMySQLPipeline
+from Feilu.search import match_query, tokenize
+from testing_utils import SQLitePipelineTestCase, make_items
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('重生之都市 Hello,World'), ['重生', '生之', '之都', '都市', 'hello', 'world'])
+        self.assertEqual(tokenize('仙'), ['仙'])
+
+    def test_match_query(self):
+        self.assertEqual(match_query('都市修仙 系', 'sqlite'), '"都市 市修 修仙" AND "系"*')
+        self.assertEqual(match_query('都市修仙 系', 'mysql'), '+"都市修仙" +系*')
+        self.assertIsNone(match_query(' ，。 ', 'sqlite'))
+
+
+class SearchIndexTest(SQLitePipelineTestCase):
+    db_name = 'search.db'
+
+    def search(self, query):
+        params = {'query': match_query(query, 'sqlite'), 'limit': 20, 'offset': 0}
+        return [row[1] for row in self.pipeline.cursor.execute(get_query('search', 'sqlite'), params)]
+
+    def test_index_follows_recrawl(self):
+        items = make_items(200)
+        items[7]['summary'] = '一个关于星际舰队的故事'
+        self.pipeline.write_items(items)
+        self.assertEqual(self.search('星际 舰队'), ['测试小说7'])
+
+        items[7]['summary'] = '一个关于修仙门派的故事'
+        items[8]['title'] = '星际舰队'
+        self.pipeline.write_items(items)
+        self.assertEqual(self.search('修仙'), ['测试小说7'])
+        self.assertEqual(self.search('星际舰队'), ['星际舰队'])
+
+    def test_title_ranks_first(self):
+        items = make_items(50)
+        items[3]['summary'] = '简介' * 50 + '龙王'
+        items[40]['title'] = '龙王传说'
+        self.pipeline.write_items(items)
+        self.assertEqual(self.search('龙王'), ['龙王传说', '测试小说3'])
+
+    def test_rebuild_matches_incremental(self):
+        self.pipeline.write_items(make_items(300))
+        query = 'SELECT rowid, title, author, summary FROM books_fts ORDER BY rowid'
+        incremental = self.pipeline.cursor.execute(query).fetchall()
+        self.pipeline.rebuild_search_index()
+        self.assertEqual(incremental, self.pipeline.cursor.execute(query).fetchall())
+
+
+class MySQLFulltextIndexTest(unittest.TestCase):
+    """
+    MySQL没有ngram解析器（如MariaDB）时改用默认解析器建立全文索引，其他错误照常抛出
+    """
+    class Cursor:
+        def __init__(self, error):
+            self.error = error
+            self.statements = []
+
+        def execute(self, sql):
+            self.statements.append(sql)
+            if self.error is not None and sql.endswith('WITH PARSER ngram'):
+                raise self.error
+
+    def add_index(self, error=None):
+        pipeline = FeiluMySQLPipeline('localhost', 3306, 'feilu_books', 'root', '', 'utf8mb4')
+        pipeline.cursor = self.Cursor(error)
+        return pipeline.add_fulltext_index(), pipeline.cursor.statements
+
+    def test_ngram(self):
+        self.assertEqual(self.add_index(), (True, [
+            'ALTER TABLE `books` ADD FULLTEXT INDEX `ft_books_text` (`title`, `author`, `summary`) WITH PARSER ngram'
+        ]))
+
+    def test_without_ngram(self):
+        error = pymysql.err.OperationalError(ER.FUNCTION_NOT_DEFINED, "Function 'ngram' is not defined")
+        used_ngram, statements = self.add_index(error)
+        self.assertFalse(used_ngram)
+        self.assertEqual(statements[-1], 'ALTER TABLE `books` ADD FULLTEXT INDEX `ft_books_text` (`title`, `author`, `summary`)')
+
+    def test_other_error(self):
+        error = pymysql.err.OperationalError(2013, 'Lost connection to MySQL server during query')
+        with self.assertRaises(pymysql.err.OperationalError):
+            self.add_index(error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 相似书籍测试
+
+检查相似度的计算，以及只为新书增量计算的结果与全量重新计算基本一致
+（IDF随书籍数量变化，已有书籍的分数不会重新计算，允许少量差异）。
+
+使用方法：
+    python test_similarity.py
+"""
+
+import os
+import random
+import sys
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.similarity import SimilarBooks
+from testing_utils import SQLitePipelineTestCase, make_items
+
+WORDS = ['修仙', '都市', '重生', '系统', '穿越', '玄幻', '末世', '武侠', '科幻', '历史', '游戏', '灵异']
+
+
+def make_books(count, seed):
+    # 简介由少量题材词随机组成，使书籍之间有不同程度的相似
+    rng = random.Random(seed)
+    items = make_items(count, seed)
+    for item in items:
+        item['book_url'] = item['book_url'].replace('.html', f'_{seed}.html')
+        item['summary'] = ''.join(rng.choice(WORDS) for _ in range(rng.randint(5, 30)))
+    return items
+
+
+class SimilarBooksTest(SQLitePipelineTestCase):
+    db_name = 'similar.db'
+
+    def setUp(self):
+        super().setUp()
+        self.engine = SimilarBooks(k=10)
+
+    def neighbours(self):
+        result = {}
+        for book_id, similar_id, score in self.pipeline.cursor.execute('SELECT * FROM similar_books'):
+            result.setdefault(book_id, {})[similar_id] = score
+        return result
+
+    def test_scores(self):
+        items = make_books(3, 1)
+        items[0].update(tags=['都市', '系统'], summary='都市修仙')
+        items[1].update(tags=['都市', '系统'], summary='都市修仙')
+        items[2].update(tags=['科幻'], summary='星际舰队')
+        self.pipeline.write_items(items)
+        self.engine.rebuild(self.pipeline.cursor)
+        neighbours = self.neighbours()
+        self.assertAlmostEqual(neighbours[1][2], 1.0, places=3)
+        self.assertNotIn(3, neighbours[1])
+        self.assertNotIn(1, neighbours[1])
+
+    def test_update_matches_rebuild(self):
+        self.pipeline.write_items(make_books(2000, 1))
+        self.engine.rebuild(self.pipeline.cursor)
+        self.pipeline.write_items(make_books(300, 2))
+        self.assertEqual(self.engine.update(self.pipeline.cursor), 300)
+        self.assertEqual(self.engine.update(self.pipeline.cursor), 0)
+        incremental = self.neighbours()
+
+        self.engine.rebuild(self.pipeline.cursor)
+        full = self.neighbours()
+        self.assertEqual(set(incremental), set(full))
+        same = sum(len(set(incremental[book_id]) & set(full[book_id])) for book_id in full)
+        self.assertGreater(same / sum(len(books) for books in full.values()), 0.95)
+        # 新书也会进入已有书籍的列表
+        self.assertTrue(any(similar_id > 2000 for book_id in range(1, 2001) for similar_id in incremental[book_id]))
+
+
+if __name__ == '__main__':
+    unittest.main()
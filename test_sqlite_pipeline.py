@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - SQLite写入测试
+
+检查SQLite存储后端打开时设置WAL日志模式等连接参数、建表并开始一次爬取，
+写入线程中的事务成功时提交、出错时整体回滚（标签缓存随之回滚），以及关闭时停止写入线程并关闭连接。
+
+使用方法：
+    python test_sqlite_pipeline.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+from scrapy import Spider
+from scrapy.settings import Settings
+from twisted.trial import unittest as trial
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.db_pipeline import FeiluDatabasePipeline
+from Feilu.storage import prepare
+from testing_utils import make_items
+
+
+class SQLitePipelineTest(trial.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.pipeline = FeiluDatabasePipeline(os.path.join(self.tmpdir.name, 'books.db'))
+        self.pipeline.open(Spider('books'))
+
+    def tearDown(self):
+        self.pipeline.shutdown()
+        self.tmpdir.cleanup()
+
+    def count(self, table):
+        # 用另一个连接读取，只能看到已提交的数据
+        conn = sqlite3.connect(self.pipeline.db_path)
+        try:
+            return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_open(self):
+        cursor = self.pipeline.cursor
+        self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        # NORMAL
+        self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone()[0], 1)
+        self.assertIsNotNone(self.pipeline.crawl_id)
+        self.assertEqual(self.count('crawls'), 1)
+        self.assertTrue(self.pipeline.threadpool.started)
+
+    def test_shutdown(self):
+        conn, threadpool = self.pipeline.conn, self.pipeline.threadpool
+        self.pipeline.shutdown()
+        self.assertFalse(threadpool.started)
+        self.assertIsNone(self.pipeline.conn)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+        # 重复关闭没有影响
+        self.pipeline.shutdown()
+
+    def test_batch_committed(self):
+        records = [prepare(item) for item in make_items(50)]
+        dfd = self.pipeline.run(self.pipeline.write_batch, records)
+
+        def check(unchanged):
+            self.assertEqual(unchanged, 0)
+            self.assertEqual(self.count('books'), 50)
+            self.assertEqual(self.count('images'), 50)
+        return dfd.addCallback(check)
+
+    def test_failed_batch_rolled_back(self):
+        def write(cursor):
+            self.pipeline.write_batch(cursor, [prepare(item) for item in make_items(10)])
+            raise ValueError('写入失败')
+
+        dfd = self.assertFailure(self.pipeline.run(write), ValueError)
+
+        def check(_):
+            self.assertEqual(self.count('books'), 0)
+            self.assertEqual(self.count('book_tags'), 0)
+            # 回滚的事务中插入的标签不再留在缓存中
+            self.assertEqual(len(self.pipeline.tag_cache), 0)
+            # 写入线程的连接可以继续使用
+            return self.pipeline.run(self.pipeline.write_batch, [prepare(item) for item in make_items(5)])
+        dfd.addCallback(check)
+
+        def check_written(_):
+            self.assertEqual(self.count('books'), 5)
+            tag_ids = {row[0] for row in self.pipeline.conn.execute('SELECT id FROM tags')}
+            self.assertEqual(set(self.pipeline.tag_cache.ids.values()), tag_ids)
+            linked = {row[0] for row in self.pipeline.conn.execute('SELECT tag_id FROM book_tags')}
+            self.assertLessEqual(linked, tag_ids)
+        return dfd.addCallback(check_written)
+
+
+class FromSettingsTest(unittest.TestCase):
+
+    def test_settings(self):
+        pipeline = FeiluDatabasePipeline.from_settings(Settings({
+            'DATABASE_PATH': 'books.db',
+            'DATABASE_BATCH_SIZE': 100,
+            'DATABASE_FLUSH_INTERVAL': 0.5,
+            'DATABASE_MAX_INFLIGHT': 3,
+        }))
+        self.assertEqual(pipeline.db_path, 'books.db')
+        self.assertEqual((pipeline.batch_size, pipeline.flush_interval, pipeline.max_inflight), (100, 0.5, 3))
+        with self.assertRaises(ValueError):
+            FeiluDatabasePipeline.from_settings(Settings({'DATABASE_FLUSH_INTERVAL': 0}))
+
+
+if __name__ == '__main__':
+    unittest.main()
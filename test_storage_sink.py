@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 存储写入队列测试
+
+用会按设定出错的SQLite存储后端驱动写入队列，检查按批写入、暂时性错误整批重试、
+重试用完或其他错误时改为逐条写入、逐条仍然失败的记录写入死信文件；
+用由测试控制完成时机的存储后端检查同一本书的写入顺序和写入名额用完时的背压。
+
+使用方法：
+    python test_storage_sink.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+from twisted.trial import unittest as trial
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.db_pipeline import FeiluDatabasePipeline
+from Feilu.dead_letter import DeadLetterStore
+from Feilu.items import FeiluItem
+from Feilu.storage import SQLITE, FeiluStoragePipeline, StorageBackend, StorageSink, prepare
+from testing_utils import make_items
+
+
+class FlakyBackend(FeiluDatabasePipeline):
+    """
+    SQLite存储后端，前transient_failures个批次遇到暂时性错误，包含bad_urls中书籍的批次写入失败
+    """
+    def __init__(self, db_path, transient_failures=0, bad_urls=(), **kwargs):
+        super().__init__(db_path, **kwargs)
+        self.transient_failures = transient_failures
+        self.bad_urls = set(bad_urls)
+        self.batches = []
+
+    def write_batch(self, cursor, records):
+        self.batches.append(len(records))
+        if self.transient_failures:
+            self.transient_failures -= 1
+            raise sqlite3.OperationalError('database is locked')
+        for record in records:
+            if record.book_url in self.bad_urls:
+                raise ValueError(f'无效的书籍: {record.book_url}')
+        return super().write_batch(cursor, records)
+
+
+class StorageSinkTest(trial.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.db_path = os.path.join(self.tmpdir.name, 'sink.db')
+        self.crawler = get_crawler(Spider)
+        self.spider = Spider('books')
+        self.dead_letters = DeadLetterStore(os.path.join(self.tmpdir.name, 'dead_letters.jsonl'))
+        self.items = make_items(7)
+
+    def open_sink(self, retry_times=2, **kwargs):
+        backend = FlakyBackend(self.db_path, batch_size=3, flush_interval=60, **kwargs)
+        sink = StorageSink(backend, stats=self.crawler.stats, retry_times=retry_times, retry_delay=0.01,
+                           dead_letters=self.dead_letters)
+        sink.open(self.spider)
+        return sink
+
+    def write(self, sink, items):
+        # 放入写入队列后立即关闭（写入缓冲区中剩余的记录），返回每条记录的Deferred的结果
+        written = defer.gatherResults([sink.enqueue(prepare(item), self.spider) for item in items])
+        dfd = defer.gatherResults([written, sink.close(self.spider)])
+        dfd.addCallback(lambda results: results[0])
+        return dfd
+
+    def book_urls(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return {row[0] for row in conn.execute('SELECT book_url FROM books')}
+        finally:
+            conn.close()
+
+    def stat(self, name):
+        return self.crawler.stats.get_value(f'storage/sqlite/{name}')
+
+    @defer.inlineCallbacks
+    def test_batches(self):
+        sink = self.open_sink()
+        records = yield self.write(sink, self.items)
+        self.assertEqual([record.book_url for record in records], [item['book_url'] for item in self.items])
+        # 每满3条一个批次，关闭时写入剩下的1条
+        self.assertEqual(sink.backend.batches, [3, 3, 1])
+        self.assertEqual((sink.success_count, sink.batch_count, sink.failed_count), (7, 3, 0))
+        self.assertEqual(self.book_urls(), {item['book_url'] for item in self.items})
+        self.assertEqual(self.stat('lag_count'), 7)
+        self.assertIsNone(sink.backend.conn)
+
+    @defer.inlineCallbacks
+    def test_transient_retry(self):
+        # 前两次暂时性错误整批重试，第三次成功
+        sink = self.open_sink(transient_failures=2)
+        yield self.write(sink, self.items[:3])
+        self.assertEqual(sink.backend.batches, [3, 3, 3])
+        self.assertEqual((sink.retry_count, sink.batch_count, sink.success_count), (2, 1, 3))
+        self.assertEqual(self.stat('retry_count'), 2)
+        self.assertEqual(self.dead_letters.read(), [])
+
+    @defer.inlineCallbacks
+    def test_retries_exhausted(self):
+        # 重试次数用完后改为逐条写入
+        sink = self.open_sink(retry_times=1, transient_failures=2)
+        yield self.write(sink, self.items[:3])
+        self.assertEqual(sink.backend.batches, [3, 3, 1, 1, 1])
+        self.assertEqual((sink.retry_count, sink.batch_count, sink.success_count), (1, 0, 3))
+        self.assertEqual(len(self.book_urls()), 3)
+
+    @defer.inlineCallbacks
+    def test_fallback_and_dead_letter(self):
+        # 其他错误不整批重试，逐条写入后只有出错的一条写入死信文件
+        bad_url = self.items[1]['book_url']
+        sink = self.open_sink(bad_urls=[bad_url])
+        records = yield self.write(sink, self.items[:3])
+        self.assertEqual(len(records), 3)
+        self.assertEqual(sink.backend.batches, [3, 1, 1, 1])
+        self.assertEqual((sink.retry_count, sink.success_count, sink.failed_count), (0, 2, 1))
+        self.assertEqual(self.book_urls(), {self.items[0]['book_url'], self.items[2]['book_url']})
+
+        [entry] = self.dead_letters.read()
+        self.assertEqual((entry['backend'], entry['error']), ('sqlite', 'ValueError'))
+        self.assertEqual(entry['item']['book_url'], bad_url)
+        self.assertEqual(entry['crawl'], sink.backend.crawl_id)
+        self.assertEqual((sink.dead_letter_count, self.stat('dead_letters')), (1, 1))
+
+    @defer.inlineCallbacks
+    def test_without_dead_letters(self):
+        sink = self.open_sink(bad_urls=[self.items[0]['book_url']])
+        sink.dead_letters = None
+        yield self.write(sink, self.items[:3])
+        self.assertEqual((sink.success_count, sink.failed_count, sink.dead_letter_count), (2, 1, 0))
+        self.assertFalse(os.path.exists(self.dead_letters.path))
+
+
+class ManualBackend(StorageBackend):
+    """
+    run()返回的Deferred由测试调用complete()完成
+    """
+    dialect = SQLITE
+    batch_size = 1
+    flush_interval = 60
+
+    def __init__(self, max_inflight):
+        super().__init__()
+        self.max_inflight = max_inflight
+        self.calls = []
+
+    def open(self, spider):
+        pass
+
+    def run(self, fn, *args):
+        dfd = defer.Deferred()
+        self.calls.append(([record.book_url for record in args[0]], dfd))
+        return dfd
+
+    def started(self):
+        return [book_urls for book_urls, _ in self.calls]
+
+    def complete(self, index):
+        self.calls[index][1].callback(0)
+
+
+class WriteOrderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.spider = Spider('books')
+        self.items = make_items(3)
+
+    def test_same_book_in_order(self):
+        backend = ManualBackend(max_inflight=2)
+        sink = StorageSink(backend)
+        first, second = [item['book_url'] for item in self.items[:2]]
+        sink.enqueue(prepare(self.items[0]), self.spider)
+        sink.enqueue(prepare(self.items[1]), self.spider)
+        self.assertTrue(sink.saturated)
+
+        # 同一本书的第二次写入等第一次完成，另一本书的批次完成空出名额也不会提前开始
+        sink.enqueue(prepare(FeiluItem(self.items[0], rating='0.1')), self.spider)
+        backend.complete(1)
+        self.assertEqual(backend.started(), [[first], [second]])
+        backend.complete(0)
+        self.assertEqual(backend.started(), [[first], [second], [first]])
+        backend.complete(2)
+        self.assertEqual((sink.inflight, sink.book_writes, sink.success_count), (0, {}, 3))
+
+    def test_backpressure(self):
+        backend = ManualBackend(max_inflight=1)
+        pipeline = FeiluStoragePipeline([StorageSink(backend)])
+
+        # 唯一的写入名额被占用，item等到名额空出
+        result = pipeline.process_item(self.items[0], self.spider)
+        self.assertIsInstance(result, defer.Deferred)
+        done = []
+        result.addCallback(done.append)
+        self.assertEqual(done, [])
+        backend.complete(0)
+        self.assertEqual(done, [self.items[0]])
+
+    def test_no_backpressure_below_limit(self):
+        backend = ManualBackend(max_inflight=1)
+        backend.batch_size = 2
+        pipeline = FeiluStoragePipeline([StorageSink(backend)])
+        self.assertIs(pipeline.process_item(self.items[0], self.spider), self.items[0])
+        self.assertEqual(backend.started(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
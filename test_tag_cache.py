@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 标签ID缓存测试
+
+检查缓存中已有的标签不访问数据库、新标签按批插入和查询，
+以及事务回滚后只丢弃该事务新增的标签ID，重新解析时会再次插入，没有传入pending集合时按线程区分。
+
+使用方法：
+    python test_tag_cache.py
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.tag_cache import TagCache
+
+
+class TagCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.execute('CREATE TABLE tags (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE)')
+        self.conn.executemany('INSERT INTO tags (name) VALUES (?)', [('修仙',), ('都市',)])
+        self.conn.commit()
+        self.cursor = self.conn.cursor()
+        self.cache = TagCache()
+        self.cache.load(self.cursor)
+        self.statements = []
+        self.conn.set_trace_callback(self.statements.append)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def tag_ids(self):
+        return {name: tag_id for tag_id, name in self.conn.execute('SELECT id, name FROM tags')}
+
+    def test_cached_tags(self):
+        self.assertEqual(len(self.cache), 2)
+        ids = self.cache.resolve(self.cursor, ['修仙', '都市', '', None])
+        self.assertEqual(self.statements, [])
+        self.assertEqual(ids, self.tag_ids())
+
+    def test_new_tags(self):
+        self.cache.CHUNK_SIZE = 2
+        pending = set()
+        names = ['修仙', '重生', '系统', '穿越', '重生']
+        ids = self.cache.resolve(self.cursor, names, pending)
+        # 三个新标签：一次executemany插入，分两批查询
+        self.assertEqual(sum(statement.startswith('SELECT') for statement in self.statements), 2)
+        self.assertEqual(ids, {name: self.tag_ids()[name] for name in names})
+        self.assertEqual(pending, {'重生', '系统', '穿越'})
+
+        self.conn.commit()
+        self.cache.commit(pending)
+        self.assertEqual(pending, set())
+        self.assertEqual(len(self.cache), 5)
+
+    def test_rollback(self):
+        committed, rolled_back = set(), set()
+        self.cache.resolve(self.cursor, ['重生'], committed)
+        self.conn.commit()
+        self.cache.commit(committed)
+
+        self.cache.resolve(self.cursor, ['系统'], rolled_back)
+        self.conn.rollback()
+        self.cache.rollback(rolled_back)
+        self.assertNotIn('系统', self.tag_ids())
+        self.assertIn('重生', self.cache.ids)
+        self.assertNotIn('系统', self.cache.ids)
+
+        # 回滚的标签再次出现时重新插入，得到的是数据库中真实存在的ID
+        ids = self.cache.resolve(self.cursor, ['系统'])
+        self.assertEqual(ids['系统'], self.tag_ids()['系统'])
+
+    def test_concurrent_transactions(self):
+        # 每个事务只回滚自己新增的标签
+        first, second = set(), set()
+        self.cache.resolve(self.cursor, ['重生'], first)
+        self.cache.resolve(self.cursor, ['系统', '重生'], second)
+        self.assertEqual((first, second), ({'重生'}, {'系统'}))
+        self.cache.rollback(second)
+        self.assertIn('重生', self.cache.ids)
+        self.assertNotIn('系统', self.cache.ids)
+
+    def test_load_resets_pending(self):
+        self.cache.resolve(self.cursor, ['重生'])
+        self.assertEqual(self.cache.pending, {'重生'})
+        self.conn.commit()
+        self.cache.load(self.cursor)
+        self.assertEqual(self.cache.pending, set())
+        self.assertEqual(len(self.cache), 3)
+
+    def test_pending_per_thread(self):
+        # 没有传入pending集合时每个线程使用自己的集合
+        self.cache.resolve(self.cursor, ['重生'])
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.cache.pending))
+        thread.start()
+        thread.join()
+        self.assertEqual((self.cache.pending, other), ({'重生'}, [set()]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+飞卢小说爬虫 - 测试和性能测试共用的工具
+
+- make_items: 生成随机书籍数据
+- open_sqlite_pipeline / SQLitePipelineTestCase: 在临时SQLite数据库上测试数据库管道
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from Feilu.db_pipeline import FeiluDatabasePipeline
+from Feilu.items import FeiluItem
+
+
+def make_items(count, seed=42):
+    """
+    生成随机书籍数据，字段格式与爬虫采集的一致
+    """
+    rng = random.Random(seed)
+    tags = [f'标签{i}' for i in range(200)]
+    items = []
+    for i in range(count):
+        items.append(FeiluItem(
+            title=f'测试小说{i}',
+            author=f'作者{rng.randint(1, count // 5 + 1)}',
+            monthly_clicks=f'月点击：{rng.randint(0, 2000000)}',
+            word_count=f'{rng.randint(1, 500) / 10}万',
+            summary='简介' * rng.randint(20, 200),
+            book_url=f'https://b.faloo.com/bench_{i}.html',
+            flowers=str(rng.randint(0, 50000)),
+            rating=f'{rng.uniform(0, 10):.1f}',
+            rewards=str(rng.randint(0, 5000)),
+            tags=rng.sample(tags, rng.randint(1, 6)),
+            image_urls=[f'https://img.faloo.com/bench/{i}.jpg'],
+        ))
+    return items
+
+
+def open_sqlite_pipeline(db_path):
+    """
+    打开测试用的SQLite数据库管道并建好所有表，不启动写入线程，直接在当前线程中写入
+    """
+    pipeline = FeiluDatabasePipeline(db_path)
+    pipeline.conn = sqlite3.connect(db_path)
+    pipeline.cursor = pipeline.conn.cursor()
+    pipeline.create_tables()
+    pipeline.migrate_tables()
+    return pipeline
+
+
+class SQLitePipelineTestCase(unittest.TestCase):
+    """
+    各测试共用的夹具：每个测试在临时目录中新建SQLite数据库（self.pipeline），测试结束后删除
+    """
+    db_name = 'test.db'
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.pipeline = open_sqlite_pipeline(os.path.join(self.tmpdir.name, self.db_name))
+
+    def tearDown(self):
+        self.pipeline.conn.close()
+        self.tmpdir.cleanup()